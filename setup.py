@@ -28,6 +28,7 @@ setup(
     url="https://github.com/impredicative/urltitle/",
     packages=find_packages(exclude=["scripts"]),
     install_requires=parse_requirements("requirements/install.in"),
+    extras_require={"brotli": parse_requirements("requirements/brotli.in"), "toml": parse_requirements("requirements/toml.in")},
     python_requires=">=3.7",
     classifiers=[  # https://pypi.org/classifiers/
         "Programming Language :: Python :: 3.7",
@@ -0,0 +1,113 @@
+"""Benchmark `URLTitleReader.title` offline against a local replay server.
+
+Each round reads the title of each URL of the corpus using a new reader, and so with cold caches. The reported metrics are
+titles per second, the p50 and p99 latencies, the bytes read per title, and the CPU time per title of the reading thread,
+which is mostly that of parsing. The synthetic corpus is used unless a recorded corpus is given. The log level of the
+package defaults to WARNING, as is typical in production.
+
+To benchmark, and to fail if any metric regresses by over 10% relative to a saved baseline, run:
+
+    python -m tests.benchmark --json baseline.json
+    python -m tests.benchmark --baseline baseline.json --max-regression 0.1
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from tests.replay import ReadCounter, ReplayCorpus, ReplayServer, proxied, replay_url, synthetic_corpus
+from urltitle import URLTitleError, URLTitleReader, config
+
+_HIGHER_IS_BETTER = {"titles_per_sec"}
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[round(fraction * (len(values) - 1))]
+
+
+def _read_titles(corpus: ReplayCorpus, rounds: int) -> Tuple[List[float], float, int]:
+    # Returns: Latency of each title, total CPU time, and number of unexpected titles.
+    latencies: List[float] = []
+    cpu_time = 0.0
+    num_mismatches = 0
+    for _ in range(rounds):
+        reader = URLTitleReader()
+        for url, expected_title in corpus.titles.items():
+            start_time, start_cpu_time = time.perf_counter(), time.thread_time()
+            try:
+                title = reader.title(replay_url(url))
+            except URLTitleError:
+                title = None
+            cpu_time += time.thread_time() - start_cpu_time
+            latencies.append(time.perf_counter() - start_time)
+            num_mismatches += title != expected_title
+        reader.close()
+    return latencies, cpu_time, num_mismatches
+
+
+def benchmark(corpus: ReplayCorpus, *, rounds: int = 5, latency: float = 0.0, bandwidth: Optional[float] = None) -> Dict[str, float]:
+    """Return the metrics of reading the titles of the corpus."""
+    with ReplayServer(corpus, latency=latency, bandwidth=bandwidth) as server, proxied(server), ReadCounter(server) as counter:
+        start_time = time.perf_counter()
+        latencies, cpu_time, num_mismatches = _read_titles(corpus, rounds)
+        duration = time.perf_counter() - start_time
+    return {
+        "titles_per_sec": len(latencies) / duration,
+        "latency_p50_ms": _percentile(latencies, 0.5) * 1000,
+        "latency_p99_ms": _percentile(latencies, 0.99) * 1000,
+        "bytes_read_per_title": counter.num_bytes_read / len(latencies),
+        "cpu_ms_per_title": cpu_time / len(latencies) * 1000,
+        "mismatches": num_mismatches,
+    }
+
+
+def regressions(metrics: Dict[str, float], baseline: Dict[str, float], max_regression: float) -> List[str]:
+    """Return a description of each metric which regressed by more than the given fraction relative to the baseline."""
+    descriptions = []
+    for name, value in metrics.items():
+        baseline_value = baseline.get(name)
+        if baseline_value is None:
+            continue
+        if name in _HIGHER_IS_BETTER:
+            is_regressed = value < baseline_value * (1 - max_regression)
+        else:
+            is_regressed = value > baseline_value * (1 + max_regression) if baseline_value else value > 0
+        if is_regressed:
+            descriptions.append(f"{name} regressed from {baseline_value:.3f} to {value:.3f}")
+    return descriptions
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, help="Directory of a recorded corpus. The synthetic corpus is used otherwise.")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay in seconds before each response.")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Max rate in bytes per second of each response body.")
+    parser.add_argument("--log-level", default="WARNING", choices=("DEBUG", "INFO", "WARNING", "ERROR"), help="Log level of the package.")
+    parser.add_argument("--json", type=Path, help="File to write the metrics to.")
+    parser.add_argument("--baseline", type=Path, help="File of the baseline metrics to compare to.")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="Max fraction by which a metric can regress relative to the baseline.")
+    args = parser.parse_args()
+
+    logging.getLogger(config.PACKAGE_NAME).setLevel(args.log_level)
+    corpus = ReplayCorpus(args.corpus) if args.corpus else synthetic_corpus()
+    metrics = benchmark(corpus, rounds=args.rounds, latency=args.latency, bandwidth=args.bandwidth)
+    for name, value in metrics.items():
+        print(f"{name}: {value:.3f}")
+    if args.json:
+        args.json.write_text(json.dumps(metrics, indent=1) + "\n")
+    if args.baseline:
+        descriptions = regressions(metrics, json.loads(args.baseline.read_text()), args.max_regression)
+        for description in descriptions:
+            print(description, file=sys.stderr)
+        if descriptions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""Local replay HTTP server of a corpus of recorded responses.
+
+The server is a HTTP forward proxy which serves each response from the corpus instead of from its site. A reader is pointed
+at it using the `http_proxy` environment variable, with the https scheme of each URL replaced by http as by `replay_url`.
+The responses are served with a configurable latency and bandwidth, and a conditional request is answered with Not Modified
+if its validators match those of the response. In recording mode, a response which is missing from the
+corpus is instead fetched from its site, trying https before http, and is added to the corpus.
+
+To record a corpus of the sites in `tests.test_urls.TEST_CASES` and `config.NETLOC_OVERRIDES`, run:
+
+    python -m tests.replay record ./corpus
+
+To serve a corpus, run:
+
+    python -m tests.replay serve ./corpus --latency 0.05
+"""
+import argparse
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import re
+import socket
+import ssl
+import threading
+import time
+from email.message import Message
+from http.client import HTTPException
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from urllib.request import HTTPRedirectHandler, HTTPSHandler, Request, build_opener
+
+from urltitle import URLTitleError, URLTitleReader, config
+
+_HOP_BY_HOP_HEADERS = {"connection", "content-length", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"}
+_UNFORWARDED_HEADERS = _HOP_BY_HOP_HEADERS | {"host", "if-modified-since", "if-none-match", "range"}
+_MAX_RECORDED_BODY_SIZE = 16 * config.MiB
+_WRITE_SIZE = 16 * config.KiB
+_RANGE_PATTERN = re.compile(r"bytes=(?P<start>\d+)-(?P<end>\d*)")
+
+
+class ReplayResponse(NamedTuple):
+    """Recorded response."""
+
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+
+    def header(self, name: str) -> Optional[str]:
+        """Return the value of the given header if it is present, otherwise None."""
+        name = name.casefold()
+        return next((value for key, value in self.headers if key.casefold() == name), None)
+
+
+def replay_url(url: str) -> str:
+    """Return the URL to request from the replay server for the given URL."""
+    url = url.strip()
+    return f"http://{url[len('https://'):]}" if url.startswith("https://") else url
+
+
+class ReplayCorpus:
+    """Corpus of recorded responses keyed by their URL without its scheme, along with the expected titles of some URLs.
+
+    It is stored in a directory as an `index.json` file and a file for each distinct body.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self.responses: Dict[str, ReplayResponse] = {}
+        self.titles: Dict[str, str] = {}  # URL to its expected title.
+        self._lock = threading.Lock()
+        if path is not None:
+            path = Path(path)
+            index = json.loads((path / "index.json").read_text())
+            for key, response in index["responses"].items():
+                body = (path / "bodies" / response["body"]).read_bytes()
+                self.responses[key] = ReplayResponse(response["status"], [tuple(header) for header in response["headers"]], body)
+            self.titles = index["titles"]
+
+    @staticmethod
+    def key(url: str) -> str:
+        """Return the key of the given URL."""
+        parse_result = urlsplit(url.strip())
+        return parse_result.netloc.casefold() + (parse_result.path or "/") + (f"?{parse_result.query}" if parse_result.query else "")
+
+    def get(self, url: str) -> Optional[ReplayResponse]:
+        """Return the response for the given URL if it is in the corpus, otherwise None."""
+        return self.responses.get(self.key(url))
+
+    def add(self, url: str, response: ReplayResponse) -> None:
+        """Add the response for the given URL."""
+        with self._lock:
+            self.responses[self.key(url)] = response
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Save the corpus to the given directory."""
+        path = Path(path)
+        (path / "bodies").mkdir(parents=True, exist_ok=True)
+        responses = {}
+        with self._lock:
+            for key, response in sorted(self.responses.items()):
+                body_name = hashlib.sha256(response.body).hexdigest()
+                (path / "bodies" / body_name).write_bytes(response.body)
+                responses[key] = {"status": response.status, "headers": response.headers, "body": body_name}
+        (path / "index.json").write_text(json.dumps({"responses": responses, "titles": self.titles}, indent=1, ensure_ascii=False) + "\n")
+
+
+class _NoRedirectHandler(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):  # pylint: disable=unused-argument
+        return None  # The redirection is recorded as is.
+
+
+def _fetch(key: str, headers: Dict[str, str]) -> Optional[ReplayResponse]:
+    opener = build_opener(_NoRedirectHandler(), HTTPSHandler(context=ssl.create_default_context()))
+    for scheme in ("https", "http"):
+        try:
+            response = opener.open(Request(f"{scheme}://{key}", headers=headers), timeout=config.REQUEST_TIMEOUT)
+        except HTTPError as exc:
+            response = exc
+        except (URLError, HTTPException, OSError):
+            continue
+        with response:
+            body = response.read(_MAX_RECORDED_BODY_SIZE)
+        return ReplayResponse(response.code, [(name, value) for name, value in response.headers.items() if name.casefold() not in _HOP_BY_HOP_HEADERS], body)
+    return None
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "ReplayServer"
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Serve the response for the requested URL."""
+        url = self.path if "://" in self.path else f"http://{self.headers['Host']}{self.path}"
+        response = self.server.response(url, self.headers)
+        time.sleep(self.server.latency)
+        if response is None:
+            self._send(502, [("Content-Type", "text/plain")], b"Not in replay corpus")
+            return
+        status, headers, body = response
+        if (status == 200) and self._is_not_modified(response):
+            self._send(304, [(name, value) for name, value in headers if name.casefold() in ("etag", "last-modified")], b"")
+            return
+        headers = [(name, value.replace("https://", "http://", 1) if name.casefold() in ("location", "uri") else value) for name, value in headers]
+        range_match = _RANGE_PATTERN.fullmatch(self.headers.get("Range", ""))
+        if range_match and (status == 200) and (response.header("Accept-Ranges") == "bytes") and not response.header("Content-Encoding"):
+            start, end = int(range_match["start"]), min(len(body), int(range_match["end"] or len(body) - 1) + 1)
+            status, headers, body = 206, headers + [("Content-Range", f"bytes {start}-{end - 1}/{len(body)}")], body[start:end]
+        self._send(status, headers, body)
+
+    def _is_not_modified(self, response: ReplayResponse) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            etag = response.header("ETag")
+            return (etag is not None) and (etag in (tag.strip() for tag in if_none_match.split(",")))
+        if_modified_since = self.headers.get("If-Modified-Since")
+        return (if_modified_since is not None) and (response.header("Last-Modified") == if_modified_since)
+
+    def _send(self, status: int, headers: List[Tuple[str, str]], body: bytes) -> None:
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            for start in range(0, len(body), _WRITE_SIZE):
+                chunk = body[start : start + _WRITE_SIZE]
+                self.wfile.write(chunk)
+                if self.server.bandwidth:
+                    time.sleep(len(chunk) / self.server.bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # The reader stopped reading early.
+
+    def log_message(self, format: str, *args: object) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Replay server of the given corpus.
+
+    It serves in a background thread while it is used as a context manager. `latency` is the delay in seconds before each
+    response, and `bandwidth` is the max rate in bytes per second at which each response body is sent.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, corpus: ReplayCorpus, *, latency: float = 0.0, bandwidth: Optional[float] = None, record: bool = False, port: int = 0):
+        super().__init__(("127.0.0.1", port), _ReplayHandler)
+        self.corpus = corpus
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.record = record
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Return the URL of the server, as is used for the `http_proxy` environment variable."""
+        host, port = self.socket.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def handle_error(self, request: object, client_address: object) -> None:
+        pass  # A reader which stops reading early resets its connection.
+
+    def response(self, url: str, headers: Message) -> Optional[ReplayResponse]:
+        """Return the response for the given URL, recording it if it is missing and if recording."""
+        response = self.corpus.get(url)
+        if (response is None) and self.record:
+            response = _fetch(self.corpus.key(url), {name: value for name, value in headers.items() if name.casefold() not in _UNFORWARDED_HEADERS})
+            if response is not None:
+                self.corpus.add(url, response)
+        return response
+
+    def __enter__(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self.serve_forever, name=self.__class__.__qualname__, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+@contextlib.contextmanager
+def proxied(server: ReplayServer) -> Iterator[None]:
+    """Direct the http requests of new readers to the given server while in the context."""
+    original = {name: os.environ.get(name) for name in ("http_proxy", "no_proxy")}
+    os.environ.update(http_proxy=server.url, no_proxy="")
+    try:
+        yield
+    finally:
+        for name, value in original.items():
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+
+
+class ReadCounter:
+    """Counter of the bytes received from the given server while in the context, including any received before a response is closed early."""
+
+    def __init__(self, server: ReplayServer) -> None:
+        self.num_bytes_read = 0
+        self._address = server.socket.getsockname()[:2]
+        self._recv_into = socket.socket.recv_into
+
+    def __enter__(self) -> "ReadCounter":
+        counter, address, recv_into, lock = self, self._address, self._recv_into, threading.Lock()
+
+        def count_recv_into(sock: socket.socket, *args: Any, **kwargs: Any) -> int:
+            num_bytes = recv_into(sock, *args, **kwargs)
+            if sock.getpeername()[:2] == address:
+                with lock:
+                    counter.num_bytes_read += num_bytes
+            return num_bytes
+
+        socket.socket.recv_into = count_recv_into  # type: ignore
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        socket.socket.recv_into = self._recv_into  # type: ignore
+
+
+def _pdf(title: str, size: int) -> bytes:
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"<< /Type /Pages /Kids [] /Count 0 >>", b"<< /Title (" + title.encode() + b") >>"]
+    content = b"%PDF-1.4\n%" + b"\x00" * max(0, size - 256) + b"\n"  # Padding comment.
+    offsets = []
+    for num, obj in enumerate(objects, 1):
+        offsets.append(len(content))
+        content += b"%d 0 obj\n%s\nendobj\n" % (num, obj)
+    xref_offset = len(content)
+    content += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    content += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    content += b"trailer\n<< /Size %d /Root 1 0 R /Info 3 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return content
+
+
+def synthetic_corpus() -> ReplayCorpus:
+    """Return a small corpus of generated responses covering the content types and encodings which are handled."""
+    corpus = ReplayCorpus()
+    html_headers = [("Content-Type", "text/html; charset=utf-8")]
+    filler = b"<script>" + b"var x = 1;\n" * 30_000 + b"</script>"  # Approximately 330 KiB.
+    cells = [{"cell_type": "code", "source": ["print(1)\n"] * 100}] * 500
+    notebook = {"cells": cells, "metadata": {"colab": {"name": "Notebook.ipynb"}, "kernelspec": {"display_name": "Python 3"}}}
+    responses = {
+        "https://example.com/": ("Example Domain", ReplayResponse(200, html_headers, b"<html><head><title>Example Domain</title></head><body></body></html>")),
+        "https://example.com/late-title": ("Late Title", ReplayResponse(200, html_headers, b"<html><head>" + filler + b"<title>Late Title</title></head></html>")),
+        "https://example.com/gzip": (
+            "Compressed Title",
+            ReplayResponse(200, html_headers + [("Content-Encoding", "gzip")], gzip.compress(b"<html><head>" + filler + b"<title>Compressed Title</title></head></html>")),
+        ),
+        "https://example.com/og-title": (
+            "Open Graph Title",
+            ReplayResponse(200, html_headers, b'<html><head><meta property="og:title" content="Open Graph Title"></head><body>' + filler),
+        ),
+        "https://example.com/redirect": ("Example Domain", ReplayResponse(301, [("Location", "https://example.com/")], b"")),
+        "https://example.org/paper.pdf": (
+            "Paper Title",
+            ReplayResponse(200, [("Content-Type", "application/pdf"), ("Accept-Ranges", "bytes")], _pdf("Paper Title", 2 * config.MiB)),
+        ),
+        "https://example.org/notebook.ipynb": (
+            "Notebook.ipynb (Python 3)",
+            ReplayResponse(200, [("Content-Type", "text/plain; charset=utf-8"), ("Content-Encoding", "gzip")], gzip.compress(json.dumps(notebook).encode())),
+        ),
+        "https://example.org/image.jpg": ("(image/jpeg) (54K)", ReplayResponse(200, [("Content-Type", "image/jpeg")], b"\xff" * 54 * config.KiB)),
+    }
+    for url, (title, response) in responses.items():
+        corpus.add(url, response)
+        corpus.titles[url] = title
+    return corpus
+
+
+def _record(path: Path) -> None:
+    from tests.test_urls import TEST_CASES  # pylint: disable=import-outside-toplevel
+
+    corpus = ReplayCorpus(path) if (path / "index.json").exists() else ReplayCorpus()
+    urls = {url.strip(): title for url, title in TEST_CASES.items()}
+    urls.update({f"https://{netloc}/": "" for netloc in config.NETLOC_OVERRIDES if not netloc.startswith("*.") and (f"https://{netloc}/" not in urls)})
+    with ReplayServer(corpus, record=True) as server, proxied(server):
+        reader = URLTitleReader()
+        for url, expected_title in urls.items():
+            try:
+                title = reader.title(replay_url(url))
+            except URLTitleError:
+                continue
+            corpus.titles[url] = expected_title or title
+            print(f"Recorded {url}: {title}")
+        reader.close()
+    corpus.save(path)
+
+
+def main() -> None:
+    """Record or serve a corpus."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("record", "serve"))
+    parser.add_argument("corpus", type=Path, help="Directory of the corpus.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay in seconds before each response.")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Max rate in bytes per second of each response body.")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    if args.command == "record":
+        _record(args.corpus)
+        return
+    with ReplayServer(ReplayCorpus(args.corpus), latency=args.latency, bandwidth=args.bandwidth, port=args.port) as server:
+        print(f"Serving {args.corpus} at {server.url}. Use it as the http_proxy.")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
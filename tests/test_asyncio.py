@@ -0,0 +1,162 @@
+"""Test the asyncio utilities."""
+import asyncio
+import io
+import ssl
+import unittest
+from http.client import HTTPMessage, parse_headers
+from http.cookiejar import CookieJar
+from socket import timeout as SocketTimeoutError
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.request import Request
+
+from urltitle.util.asyncio import AsyncHTTPResponse, AsyncKeyedSemaphore, open_url
+
+_RESPONSES = {
+    "/length": b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhello",
+    "/chunked": b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5;ext=1\r\nhello\r\n6\r\n world\r\n0\r\nTrailer: 1\r\n\r\n",
+    "/no-content": b"HTTP/1.1 204 No Content\r\n\r\n",
+    "/not-modified": b'HTTP/1.1 304 Not Modified\r\nETag: "v1"\r\n\r\n',
+    "/relative": b"HTTP/1.1 302 Found\r\nLocation: length\r\nContent-Length: 0\r\n\r\n",
+    "/ftp": b"HTTP/1.1 302 Found\r\nLocation: ftp://example.com/\r\nContent-Length: 0\r\n\r\n",
+    "/loop": b"HTTP/1.1 302 Found\r\nLocation: /loop\r\nContent-Length: 0\r\n\r\n",
+    "/login": b"HTTP/1.1 302 Found\r\nSet-Cookie: session=abc; Path=/\r\nLocation: /length\r\nContent-Length: 0\r\n\r\n",
+    "/slow-body": b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhel",
+}
+
+
+class _Server:
+    """Local HTTP server which serves the raw response for each path, and otherwise never responds.
+
+    Each connection is kept open until the client closes it, and so a body is read only as far as its framing says.
+    """
+
+    def __init__(self) -> None:
+        self.requests: List[Tuple[str, HTTPMessage]] = []
+        self._server: Optional[asyncio.Server] = None
+
+    def url(self, path: str) -> str:
+        """Return the URL of the given path."""
+        assert self._server is not None
+        return f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}{path}"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        head = await reader.readuntil(b"\r\n\r\n")
+        request_line, _, header_text = head.decode("iso-8859-1").partition("\r\n")
+        path = request_line.split()[1]
+        self.requests.append((path, parse_headers(io.BytesIO(header_text.encode("iso-8859-1")))))
+        response = _RESPONSES.get(path)
+        if response is not None:
+            writer.write(response)
+            await writer.drain()
+        await reader.read()
+        writer.close()
+
+    async def __aenter__(self) -> "_Server":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        assert self._server is not None
+        self._server.close()
+        await self._server.wait_closed()
+
+
+async def _open_url(url: str, *, timeout: float = 5, cookie_jar: Optional[CookieJar] = None, headers: Optional[Dict[str, str]] = None) -> AsyncHTTPResponse:
+    return await open_url(Request(url, headers=headers or {}), timeout=timeout, ssl_context=ssl.create_default_context(), cookie_jar=cookie_jar, max_redirections=3)
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestAsyncKeyedSemaphore(unittest.TestCase):
+    def test_acquire(self):
+        async def main() -> None:
+            semaphore = AsyncKeyedSemaphore(1)
+            order: List[int] = []
+
+            async def hold(name: int, key: str) -> None:
+                await semaphore.acquire(key)
+                order.append(name)
+                await asyncio.sleep(0.05)
+                semaphore.release(key)
+
+            await asyncio.gather(hold(1, "a"), hold(2, "a"), hold(3, "b"))
+            self.assertEqual([1, 3, 2], order)
+
+            await semaphore.acquire("a")
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(semaphore.acquire("a"), 0.05)
+            semaphore.release("a")
+            self.assertEqual({}, semaphore._counts)  # pylint: disable=protected-access
+            self.assertEqual({}, semaphore._waiters)  # pylint: disable=protected-access
+
+        asyncio.run(main())
+
+
+class TestOpenURL(unittest.TestCase):
+    @staticmethod
+    def _run(test: Callable[[_Server], Awaitable[None]]) -> _Server:
+        server = _Server()
+
+        async def main() -> None:
+            async with server:
+                await asyncio.wait_for(test(server), 10)
+
+        asyncio.run(main())
+        return server
+
+    def test_bodies(self):
+        async def test(server: _Server) -> None:
+            response = await _open_url(server.url("/length"))
+            self.assertEqual(b"hello", await response.read())  # The open connection is not read beyond the length.
+            response.close()
+            response = await _open_url(server.url("/chunked"))
+            buffer = bytearray(8)
+            self.assertEqual(8, await response.readinto(memoryview(buffer)))
+            self.assertEqual((b"hello wo", b"rld", b""), (bytes(buffer), await response.read(), await response.read()))
+            response.close()
+
+        self._run(test)
+
+    def test_bodiless_statuses(self):
+        async def test(server: _Server) -> None:
+            response = await _open_url(server.url("/no-content"))
+            self.assertEqual((204, b""), (response.status, await response.read()))
+            response.close()
+            with self.assertRaises(HTTPError) as context:
+                await _open_url(server.url("/not-modified"), headers={"If-None-Match": '"v1"'})
+            self.assertEqual((304, '"v1"'), (context.exception.code, context.exception.headers["ETag"]))
+
+        self._run(test)
+
+    def test_redirects(self):
+        async def test(server: _Server) -> None:
+            response = await _open_url(server.url("/relative"))
+            self.assertEqual((server.url("/length"), b"hello"), (response.url, await response.read()))
+            response.close()
+            with self.assertRaisesRegex(HTTPError, "not allowed"):
+                await _open_url(server.url("/ftp"))
+            with self.assertRaisesRegex(HTTPError, "infinite loop"):
+                await _open_url(server.url("/loop"))
+
+        server = self._run(test)
+        self.assertEqual(["/relative", "/length", "/ftp"] + ["/loop"] * 4, [path for path, _ in server.requests])
+
+    def test_redirect_cookies(self):
+        async def test(server: _Server) -> None:
+            response = await _open_url(server.url("/login"), cookie_jar=CookieJar())
+            self.assertEqual(b"hello", await response.read())
+            response.close()
+
+        server = self._run(test)
+        self.assertEqual([None, "session=abc"], [headers["Cookie"] for _, headers in server.requests])
+
+    def test_timeouts(self):
+        async def test(server: _Server) -> None:
+            with self.assertRaises(SocketTimeoutError):
+                await _open_url(server.url("/unanswered"), timeout=0.1)
+            response = await _open_url(server.url("/slow-body"), timeout=0.1)
+            with self.assertRaises(SocketTimeoutError):
+                await response.read()
+            response.close()
+
+        self._run(test)
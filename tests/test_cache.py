@@ -0,0 +1,167 @@
+"""Test the title caches."""
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from urltitle.cache import CachedTitle, MemoryTitleCache, SharedTitleCache, SQLiteTitleCache, TitleValidators
+from urltitle.overrides import NetlocOverrides, _AffectedURLs
+
+
+def _set_shared_title(address, authkey, url, title):
+    SharedTitleCache(address, authkey=authkey).set(url, title)
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestMemoryTitleCache(unittest.TestCase):
+    def test_get_set_delete(self):
+        cache = MemoryTitleCache(max_size=8, ttl=60)
+        self.assertIsNone(cache.get("https://example.com/"))
+        cache.set("https://example.com/", "Example")
+        self.assertEqual("Example", cache.get("https://example.com/"))
+        cache.delete("https://example.com/")
+        self.assertIsNone(cache.get("https://example.com/"))
+
+    def test_expiry(self):
+        cache = MemoryTitleCache(max_size=8, ttl=60)
+        cache.set("https://example.com/", "Example", ttl=0.05)
+        cache.set("https://example.org/", "Example")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("https://example.com/"))
+        self.assertEqual("Example", cache.get("https://example.org/"))
+
+    def test_stale(self):
+        cache = MemoryTitleCache(max_size=8, ttl=60, stale_ttl=60)
+        validators = TitleValidators('"v1"', "Mon, 05 Oct 2026 00:00:00 GMT", 2048)
+        cache.set_entry("https://example.com/", "Example", validators, ttl=0.05)
+        self.assertEqual(CachedTitle("Example", validators), cache.get_entry("https://example.com/"))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("https://example.com/"))
+        self.assertEqual(CachedTitle("Example", validators, is_stale=True), cache.get_entry("https://example.com/"))
+        cache = MemoryTitleCache(max_size=8, ttl=60, stale_ttl=0)
+        cache.set("https://example.com/", "Example", ttl=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get_entry("https://example.com/"))
+
+    def test_max_size(self):
+        cache = MemoryTitleCache(max_size=2, ttl=60)
+        for num in range(3):
+            cache.set(f"https://example.com/{num}", str(num))
+        self.assertIsNone(cache.get("https://example.com/0"))
+        self.assertEqual("2", cache.get("https://example.com/2"))
+
+    def test_delete_matching(self):
+        cache = MemoryTitleCache(max_size=8, ttl=60)
+        for url in ("https://example.com/", "https://example.org/"):
+            cache.set(url, "Example")
+        cache.delete_matching(lambda url: "example.com" in url)
+        self.assertIsNone(cache.get("https://example.com/"))
+        self.assertEqual("Example", cache.get("https://example.org/"))
+
+
+class TestSQLiteTitleCache(unittest.TestCase):
+    def setUp(self):
+        self._tempdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = Path(self._tempdir.name) / "titles.sqlite3"
+
+    def tearDown(self):
+        self._tempdir.cleanup()
+
+    def test_persistence(self):
+        cache = SQLiteTitleCache(self.path, max_size=8, ttl=60)
+        cache.set("https://example.com/", "Example")
+        cache.close()
+        cache = SQLiteTitleCache(self.path, max_size=8, ttl=60)
+        self.assertEqual("Example", cache.get("https://example.com/"))
+        cache.delete("https://example.com/")
+        self.assertIsNone(cache.get("https://example.com/"))
+        cache.close()
+
+    def test_expiry(self):
+        cache = SQLiteTitleCache(self.path, max_size=8, ttl=60)
+        cache.set("https://example.com/", "Example", ttl=0.05)
+        self.assertEqual(1, len(cache))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("https://example.com/"))
+        self.assertEqual(0, len(cache))
+        cache.close()
+
+    def test_stale(self):
+        cache = SQLiteTitleCache(self.path, max_size=8, ttl=60, stale_ttl=60)
+        validators = TitleValidators('"v1"', None, 2048)
+        cache.set_entry("https://example.com/", "Example", validators, ttl=0.05)
+        self.assertEqual(CachedTitle("Example", validators), cache.get_entry("https://example.com/"))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("https://example.com/"))
+        self.assertEqual(CachedTitle("Example", validators, is_stale=True), cache.get_entry("https://example.com/"))
+        cache.close()
+        cache = SQLiteTitleCache(self.path, max_size=8, ttl=60, stale_ttl=0)
+        self.assertIsNone(cache.get_entry("https://example.com/"))
+        cache.close()
+
+    def test_upgrade(self):
+        connection = sqlite3.connect(str(self.path))
+        connection.execute("CREATE TABLE titles (url TEXT PRIMARY KEY, title TEXT NOT NULL, expiry REAL NOT NULL)")
+        connection.execute("INSERT INTO titles VALUES (?, ?, ?)", ("https://example.com/", "Example", time.time() + 60))
+        connection.commit()
+        connection.close()
+        cache = SQLiteTitleCache(self.path, max_size=8, ttl=60)
+        self.assertEqual(CachedTitle("Example"), cache.get_entry("https://example.com/"))
+        cache.set_entry("https://example.org/", "Example", TitleValidators(None, "Mon, 05 Oct 2026 00:00:00 GMT"))
+        cached = cache.get_entry("https://example.org/")
+        assert cached is not None
+        self.assertEqual("Mon, 05 Oct 2026 00:00:00 GMT", cached.validators.last_modified)
+        cache.close()
+
+    def test_max_size(self):
+        cache = SQLiteTitleCache(self.path, max_size=16, ttl=60)
+        for num in range(100):
+            cache.set(f"https://example.com/{num}", str(num))
+        self.assertLessEqual(len(cache), 16)
+        self.assertEqual("99", cache.get("https://example.com/99"))
+        cache.close()
+
+    def test_delete_matching(self):
+        cache = SQLiteTitleCache(self.path, max_size=8, ttl=60)
+        for url in ("https://example.com/", "https://example.org/"):
+            cache.set(url, "Example")
+        cache.delete_matching(lambda url: "example.com" in url)
+        self.assertIsNone(cache.get("https://example.com/"))
+        self.assertEqual("Example", cache.get("https://example.org/"))
+        cache.close()
+
+    def test_shared(self):
+        cache1 = SQLiteTitleCache(self.path, max_size=8, ttl=60)
+        cache2 = SQLiteTitleCache(self.path, max_size=8, ttl=60)
+        cache1.set("https://example.com/", "Example")
+        self.assertEqual("Example", cache2.get("https://example.com/"))
+        cache1.close()
+        cache2.close()
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "requires fork")
+class TestSharedTitleCache(unittest.TestCase):
+    def test_shared_across_processes(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            address, authkey = os.path.join(tempdir, "titles.sock"), b"test"
+            manager = SharedTitleCache.start_server(address, authkey=authkey, max_size=8, ttl=60)
+            try:
+                process = multiprocessing.get_context("fork").Process(target=_set_shared_title, args=(address, authkey, "https://example.com/", "Example"))
+                process.start()
+                process.join()
+                cache = SharedTitleCache(address, authkey=authkey)
+                self.assertEqual("Example", cache.get("https://example.com/"))
+                cache.delete("https://example.com/")
+                self.assertIsNone(cache.get("https://example.com/"))
+                cache.set("https://example.com/", "Example")
+                cache.set("https://example.org/", "Example")
+                cache.delete_matching(_AffectedURLs(NetlocOverrides({}), NetlocOverrides({"example.org": {"user_agent": "Test"}})))
+                self.assertEqual("Example", cache.get("https://example.com/"))
+                self.assertIsNone(cache.get("https://example.org/"))
+            finally:
+                manager.shutdown()
+            self.assertIsNone(cache.get("https://example.com/"))  # Unreachable server is a miss.
+            cache.clear()  # Unreachable server is logged.
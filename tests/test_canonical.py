@@ -0,0 +1,58 @@
+"""Test the canonicalization of URLs into the keys of their cached titles."""
+import unittest
+from typing import List
+
+from tests.replay import ReplayServer, proxied, replay_url, synthetic_corpus
+from urltitle import TitleTrace, URLCanonicalizer, URLTitleReader, config
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestURLCanonicalizer(unittest.TestCase):
+    def test_canonical(self):
+        canonicalizer = URLCanonicalizer()
+        for url, canonical_url in {
+            "https://example.com/": "https://example.com/",
+            " HTTPS://WWW.Example.COM ": "https://example.com/",
+            "https://example.com:443/a#section": "https://example.com/a",
+            "http://example.com:8080/a": "http://example.com:8080/a",
+            "https://user@example.com/a": "https://user@example.com/a",
+            "https://[::1]:443/a": "https://[::1]/a",
+            "https://example.com/%7euser/%2f%e2%82%ac": "https://example.com/~user/%2F%E2%82%AC",
+            "https://example.com/a?b=2&a=1&b=1": "https://example.com/a?a=1&b=2&b=1",
+            "https://example.com/a?utm_source=x&id=1&fbclid=y&utm_medium=z": "https://example.com/a?id=1",
+            "https://example.com/a?utm_source=x": "https://example.com/a",
+            "https://example.com/a?q=a+b&empty=": "https://example.com/a?empty=&q=a+b",
+            "Example.com/a?gclid=x": "example.com/a",
+            "https://example.com:bad/a": "https://example.com:bad/a",
+        }.items():
+            with self.subTest(url=url):
+                self.assertEqual(canonical_url, canonicalizer(url))
+
+    def test_kept_params(self):
+        canonicalizer = URLCanonicalizer()
+        url = "https://twitter.com/a?ref_src=twsrc&utm_source=x"
+        self.assertEqual("https://twitter.com/a?ref_src=twsrc", canonicalizer(url, kept_params={"ref_src"}))
+        self.assertEqual("https://twitter.com/a", canonicalizer(url))
+
+    def test_custom(self):
+        canonicalizer = URLCanonicalizer(tracking_params=["src", "x_*"], strip_www=False)
+        self.assertEqual("https://www.example.com/?utm_source=a", canonicalizer("https://www.example.com/?src=a&x_y=b&utm_source=a"))
+
+
+class TestReaderCanonicalURLs(unittest.TestCase):
+    def test_shared_title(self):
+        traces: List[TitleTrace] = []
+        urls = [replay_url("https://example.com"), replay_url("https://example.com/?utm_source=a"), replay_url("https://WWW.example.com/?fbclid=b#top")]
+        with ReplayServer(synthetic_corpus()) as server, proxied(server):
+            reader = URLTitleReader(trace_hook=traces.append)
+            self.assertEqual(["Example Domain"] * 3, [reader.title(url) for url in urls])
+            reader.close()
+        self.assertEqual([False, True, True], [trace.cache_hit for trace in traces])
+
+    def test_overrides(self):
+        reader = URLTitleReader()
+        url = "https://example.com/a?ref_src=twsrc"
+        self.assertEqual("https://example.com/a", reader._canonical_url(url))  # pylint: disable=protected-access
+        reader.reload_overrides({**config.NETLOC_OVERRIDES, "example.com": {"query_params:keep": ["ref_src"]}})
+        self.assertEqual(url, reader._canonical_url(url))  # pylint: disable=protected-access
+        reader.close()
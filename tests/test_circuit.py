@@ -0,0 +1,82 @@
+"""Test the circuit breakers of the requests made to each netloc."""
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from tests.replay import ReplayResponse, ReplayServer, proxied, replay_url, synthetic_corpus
+from urltitle import CircuitBreaker, URLTitleError, URLTitleReader, config
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestCircuitBreaker(unittest.TestCase):
+    def test_error_rate(self):
+        circuits = CircuitBreaker(window=4, min_samples=4, max_error_rate=0.5, open_duration=0.2)
+        for is_error in (False, True, False):
+            circuits.record("example.com", is_error=is_error, latency=0.1)
+        self.assertTrue(circuits.allow("example.com"))
+        circuits.record("example.com", is_error=True, latency=0.1)
+        self.assertFalse(circuits.allow("example.com"))
+        self.assertTrue(circuits.allow("example.org"))
+        self.assertEqual(("open", 4, 0.5, 0.1), circuits.stats()["example.com"])
+
+    def test_latency(self):
+        circuits = CircuitBreaker(min_samples=3, max_latency=1)
+        for latency in (0.5, 2, 3):
+            circuits.record("example.com", is_error=False, latency=latency)
+        self.assertFalse(circuits.allow("example.com"))
+
+    def test_half_open(self):
+        circuits = CircuitBreaker(min_samples=1, open_duration=0.2)
+        circuits.record("example.com", is_error=True, latency=0.1)
+        self.assertFalse(circuits.allow("example.com"))
+        time.sleep(0.2)
+        self.assertTrue(circuits.allow("example.com"))  # The probe.
+        self.assertFalse(circuits.allow("example.com"))
+        circuits.record("example.com", is_error=True, latency=0.1)
+        self.assertFalse(circuits.allow("example.com"))
+        time.sleep(0.2)
+        self.assertTrue(circuits.allow("example.com"))
+        circuits.record("example.com", is_error=False, latency=0.1)
+        self.assertEqual("closed", circuits.stats()["example.com"].state)
+        self.assertTrue(circuits.allow("example.com"))
+
+    def test_max_keys(self):
+        circuits = CircuitBreaker(max_keys=2)
+        for num in range(3):
+            circuits.record(f"example{num}.com", is_error=False, latency=0.1)
+        self.assertEqual(2, len(circuits))
+
+
+class TestReaderAdmission(unittest.TestCase):
+    def setUp(self):
+        self.corpus = synthetic_corpus()
+        for num in range(2):
+            self.corpus.add(f"https://example.com/unavailable{num}", ReplayResponse(503, [("Content-Type", "text/html")], b""))
+
+    def test_fail_fast(self):
+        with ReplayServer(self.corpus) as server, proxied(server), patch.object(config, "REQUEST_BACKOFF_BASE", 0.01):
+            reader = URLTitleReader()
+            reader.circuits = CircuitBreaker(min_samples=config.MAX_REQUEST_ATTEMPTS, open_duration=0.5)
+            with self.assertRaises(URLTitleError) as context:
+                reader.title(replay_url("https://example.com/unavailable0"))
+            self.assertNotEqual("unavailable", context.exception.category)
+            with self.assertRaises(URLTitleError) as context:
+                reader.title(replay_url("https://example.com/unavailable1"))
+            self.assertEqual("unavailable", context.exception.category)
+            time.sleep(0.5)
+            self.assertEqual("Example Domain", reader.title(replay_url("https://example.com/")))  # The probe.
+            self.assertEqual("closed", reader.circuits.stats()["example.com"].state)
+            reader.close()
+
+    def test_max_in_flight(self):
+        latency = 0.3
+        urls = [replay_url(url) for url in ("https://example.com/", "https://example.com/late-title", "https://example.com/og-title")]
+        with ReplayServer(self.corpus, latency=latency) as server, proxied(server), patch.object(config, "MAX_IN_FLIGHT_PER_HOST", 1):
+            reader = URLTitleReader()
+            start_time = time.monotonic()
+            with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+                titles = list(executor.map(reader.title, urls))
+            self.assertGreaterEqual(time.monotonic() - start_time, latency * len(urls))
+            self.assertEqual(["Example Domain", "Late Title", "Open Graph Title"], titles)
+            reader.close()
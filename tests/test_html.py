@@ -0,0 +1,47 @@
+"""Test the incremental HTML title scanner."""
+import unittest
+from typing import Any, Dict, Optional
+
+from urltitle import config
+from urltitle.util.html import HTMLTitleScanner
+
+
+def _scan(*chunks: bytes, strainers: Optional[Dict[str, Dict[str, Any]]] = None, encoding: Optional[str] = None) -> HTMLTitleScanner:
+    scanner = HTMLTitleScanner(strainers or config.STRAINERS, encoding=encoding)
+    for chunk in chunks:
+        scanner.feed_bytes(chunk)
+    return scanner
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestHTMLTitleScanner(unittest.TestCase):
+    def test_title_split_across_chunks(self):
+        scanner = _scan(b"<html><head><ti", b"tle>Hello &am", b"p; W\xc3", b"\xb6rld</title>")
+        self.assertEqual(("Hello & Wörld", "title"), scanner.title())
+
+    def test_incomplete_title(self):
+        scanner = _scan(b'<head><meta property="og:title" content="Fallback"><title>Hello')
+        self.assertEqual((None, None), scanner.title())
+        scanner.feed_bytes(b" World</title>")
+        self.assertEqual(("Hello World", "title"), scanner.title())
+
+    def test_meta_fallbacks(self):
+        self.assertEqual(("OG", "og:title"), _scan(b'<head><meta property="og:title" content="OG">').title())
+        self.assertEqual(("TW", "twitter:title"), _scan(b'<head><meta name="twitter:title" content="TW"/>').title())
+
+    def test_custom_strainer_priority(self):
+        strainers = {"twitter:title": config.STRAINERS["twitter:title"], **config.STRAINERS}
+        scanner = _scan(b'<head><title>Title</title><meta name="twitter:title" content="TW">', strainers=strainers)
+        self.assertEqual(("TW", "twitter:title"), scanner.title())
+
+    def test_head_ended(self):
+        scanner = _scan(b"<html><head><script>var s = '</head>';</script>")
+        self.assertFalse(scanner.head_ended)
+        scanner.feed_bytes(b"</head><body>")
+        self.assertTrue(scanner.head_ended)
+        self.assertEqual((None, None), scanner.title())
+
+    def test_encoding(self):
+        self.assertEqual("Café", _scan("<title>Café</title>".encode("latin-1"), encoding="iso-8859-1").title()[0])
+        self.assertEqual("Café", _scan('<meta charset="iso-8859-1"><title>Café</title>'.encode("latin-1")).title()[0])
+        self.assertEqual("Café", _scan("<title>Café</title>".encode("windows-1252")).title()[0])
@@ -0,0 +1,64 @@
+"""Test the incremental JSON scanners."""
+import json
+import unittest
+
+from urltitle.util.json import IPYNBTitleScanner, JSONPathScanner
+
+_NOTEBOOK = {
+    "cells": [
+        {
+            "cell_type": "code",
+            "metadata": {"colab": {"name": "Not the title"}},
+            "outputs": [{"data": {"image/png": "A" * 1000}}],
+            "source": ['print("\\" {[")\n', "x = {'}': [1]}"],
+        }
+    ],
+    "metadata": {
+        "colab": {"name": ' Wörld "Notebook".ipynb ', "provenance": [], "toc_visible": True},
+        "kernelspec": {"display_name": "Python 3", "name": "python3"},
+        "widgets": {"state": [1, 2.5, None, {"a": "b"}]},
+    },
+    "nbformat": 4,
+    "nbformat_minor": 0,
+}
+
+
+def _scan(content: bytes, chunk_size: int) -> IPYNBTitleScanner:
+    scanner = IPYNBTitleScanner()
+    for start in range(0, len(content), chunk_size):
+        scanner.feed_bytes(content[start : start + chunk_size])
+    return scanner
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestIPYNBTitleScanner(unittest.TestCase):
+    def test_title_in_chunks(self):
+        content = json.dumps(_NOTEBOOK, indent=1).encode()
+        for chunk_size in (1, 2, 3, 7, 64, len(content)):
+            scanner = _scan(content, chunk_size)
+            self.assertTrue(scanner.done)
+            self.assertEqual('Wörld "Notebook".ipynb (Python 3)', scanner.title(), chunk_size)
+
+    def test_done_before_end(self):
+        scanner = IPYNBTitleScanner()
+        scanner.feed_bytes(b'{"metadata": {"colab": {"name": "Title"}, "kernelspec": {"display_name": "Python 3"}}, "cells": [')
+        self.assertTrue(scanner.done)
+        self.assertEqual("Title (Python 3)", scanner.title())
+
+    def test_done_after_metadata_ends(self):
+        scanner = IPYNBTitleScanner()
+        scanner.feed_bytes(b'{"cells": [], "metadata": {"kernelspec": {"display_name": "Python 3"}}, "nbformat": 4')
+        self.assertTrue(scanner.done)
+        self.assertEqual("", scanner.title())
+
+    def test_invalid(self):
+        for content in (b"[1, 2]", b'{"metadata": {"colab": {"name": "Tit', b'{"metadata" 1}'):
+            self.assertEqual("", _scan(content, 4).title())
+
+
+class TestJSONPathScanner(unittest.TestCase):
+    def test_values(self):
+        scanner = JSONPathScanner([("a", "b"), ("c",), ("d", "e")])
+        scanner.feed_bytes(b'{"a": {"x": [{"b": "no"}], "b": "yes\\u00e9"}, "c": "\\"c\\"", "d": 1}')
+        self.assertTrue(scanner.done)
+        self.assertEqual({("a", "b"): "yesé", ("c",): '"c"'}, scanner.values)
@@ -0,0 +1,162 @@
+"""Test the compiled index of site-specific overrides, and the watcher of override files."""
+import json
+import pickle
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from typing import Any, List, Mapping
+
+from urltitle import NetlocOverrides, OverridesWatcher, SQLiteTitleCache, URLTitleReader, config
+from urltitle.overrides import TOML_AVAILABLE
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestNetlocOverrides(unittest.TestCase):
+    def test_matching(self):
+        overrides = NetlocOverrides(
+            {
+                "example.com": {"user_agent": "exact"},
+                "*.example.com": {"user_agent": "wildcard"},
+                "*.b.example.com": {"user_agent": "longer wildcard"},
+                "c.b.example.com": {"user_agent": "longer exact"},
+            }
+        )
+        for netloc, user_agent in {
+            "example.com": "exact",
+            "example.com:8080": "exact",
+            "a.example.com": "wildcard",
+            "b.example.com": "wildcard",
+            "a.b.example.com": "longer wildcard",
+            "c.b.example.com": "longer exact",
+            "d.c.b.example.com": "longer wildcard",
+            "example.org": None,
+            "com": None,
+            "notexample.com": None,
+        }.items():
+            with self.subTest(netloc=netloc):
+                self.assertEqual(user_agent, overrides.get(netloc).get("user_agent"))
+
+    def test_compiled(self):
+        aliased = {"url_subs": [(r"/pdf/(?P<id>.+)$", r"/abs/\g<id>")], "extra_headers": {"DNT": 1}}
+        overrides = NetlocOverrides({"a.org": aliased, "b.org": aliased})
+        ((pattern, replacement),) = overrides.get("a.org")["url_subs"]
+        self.assertEqual("https://a.org/abs/1", pattern.sub(replacement, "https://a.org/pdf/1"))
+        self.assertIs(overrides.get("a.org"), overrides.get("b.org"))
+        with self.assertRaises(TypeError):
+            overrides.get("a.org")["extra_headers"]["DNT"] = 0
+
+    def test_invalid(self):
+        invalid_overrides: Mapping[str, Mapping[str, Any]]
+        for invalid_overrides in (
+            {"Example.com": {}},
+            {"www.example.com": {}},
+            {"a.*.example.com": {}},
+            {"example.com": {"unknown": 1}},
+            {"example.com": {"url_subs": [("(", "")]}},
+            {"example.com": {"url_subs": [("a", "b", "c")]}},
+            {"example.com": {"title_search:retry": 1}},
+            {"example.com": {"strainer": "h1"}},
+            {"example.com": {"default_request_size": True}},
+            {"example.com": {"query_params:keep": "ref"}},
+        ):
+            with self.subTest(overrides=invalid_overrides), self.assertRaises(ValueError):
+                NetlocOverrides(invalid_overrides)
+
+    def test_many_sites(self):
+        overrides = NetlocOverrides({f"site{num}.example{num % 10}.com": {"user_agent": str(num)} for num in range(5000)})
+        self.assertEqual(5000, len(overrides))
+        self.assertEqual("1234", overrides.get("site1234.example4.com")["user_agent"])
+
+    def test_pickle(self):
+        overrides = pickle.loads(pickle.dumps(NetlocOverrides({"*.example.com": {"url_subs": [("^http:", "https:")]}})))
+        ((pattern, replacement),) = overrides.get("a.example.com")["url_subs"]
+        self.assertEqual("https://a.example.com/", pattern.sub(replacement, "http://a.example.com/"))
+
+    def test_config(self):
+        self.assertEqual(len(config.NETLOC_OVERRIDES), len(NetlocOverrides(config.NETLOC_OVERRIDES)))
+
+    def test_reload(self):
+        reader = URLTitleReader()
+        with tempfile.TemporaryDirectory() as dir_name:
+            path = Path(dir_name) / "overrides.json"
+            path.write_text(json.dumps({"*.example.com": {"url_subs": [["^http:", "https:"]]}}))
+            reader.reload_overrides(path)
+            self.assertIn("url_subs", reader._overrides("http://a.example.com/"))  # pylint: disable=protected-access
+            path.write_text(json.dumps({"example.com": {"url_subs": "invalid"}}))
+            with self.assertRaises(ValueError):
+                reader.reload_overrides(path)
+            self.assertIn("url_subs", reader._overrides("http://a.example.com/"))  # pylint: disable=protected-access
+        reader.reload_overrides()
+        self.assertEqual("Googlebot-News", reader._overrides("https://m.youtube.com/")["user_agent"])  # pylint: disable=protected-access
+        reader.close()
+
+    def test_reload_invalidates_affected_sites(self):
+        with tempfile.TemporaryDirectory() as dir_name:
+            reader = URLTitleReader(title_cache=SQLiteTitleCache(Path(dir_name) / "titles.sqlite", max_size=10, ttl=60))
+            for url in ("https://a.example.com/", "https://example.org/", "https://m.youtube.com/"):
+                reader._title_cache.set(url, "Title")  # pylint: disable=protected-access
+            reader.reload_overrides({**config.NETLOC_OVERRIDES, "*.example.com": {"user_agent": "Test"}})
+            self.assertIsNone(reader._title_cache.get("https://a.example.com/"))  # pylint: disable=protected-access
+            self.assertEqual("Title", reader._title_cache.get("https://example.org/"))  # pylint: disable=protected-access
+            self.assertEqual("Title", reader._title_cache.get("https://m.youtube.com/"))  # pylint: disable=protected-access
+            reader.close()
+            reader._title_cache.close()  # pylint: disable=protected-access
+
+
+class TestOverridesFiles(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = Path(self._dir.name)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_directory(self):
+        (self.path / "1.json").write_text(json.dumps({"example.com": {"user_agent": "first"}, "example.org": {"user_agent": "first"}}))
+        (self.path / "2.json").write_text(json.dumps({"example.org": {"user_agent": "second"}}))
+        (self.path / "ignored.txt").write_text("ignored")
+        overrides = NetlocOverrides.from_path(self.path, base={"example.net": {"user_agent": "base"}})
+        self.assertEqual(["first", "second", "base"], [overrides.get(netloc)["user_agent"] for netloc in ("example.com", "example.org", "example.net")])
+
+    @unittest.skipUnless(TOML_AVAILABLE, "requires tomllib or tomli")
+    def test_toml(self):
+        path = self.path / "overrides.toml"
+        path.write_text('["*.example.com"]\nurl_subs = [["^http:", "https:"]]\nextra_headers = {DNT = 1}\n')
+        overrides = NetlocOverrides.from_path(path)
+        self.assertEqual(1, overrides.get("a.example.com")["extra_headers"]["DNT"])
+
+    def test_invalid_file(self):
+        path = self.path / "overrides.json"
+        for content in ("[]", '{"example.com": 1}', "{"):
+            path.write_text(content)
+            with self.subTest(content=content), self.assertRaises(ValueError):
+                NetlocOverrides.from_path(path)
+
+    def test_watcher(self):
+        path = self.path / "overrides.json"
+        path.write_text(json.dumps({"example.com": {"user_agent": "first"}}))
+        changes: List[NetlocOverrides] = []
+        changed = threading.Event()
+
+        def on_change(overrides: NetlocOverrides) -> None:
+            changes.append(overrides)
+            changed.set()
+
+        watcher = OverridesWatcher(path, on_change, interval=0.01)
+        path.write_text(json.dumps({"example.com": {"user_agent": "invalid", "unknown": 1}}))
+        path.write_text(json.dumps({"example.com": {"user_agent": "second!"}}))
+        self.assertTrue(changed.wait(5))
+        watcher.stop()
+        self.assertEqual("second!", changes[-1].get("example.com")["user_agent"])
+
+    def test_reader(self):
+        path = self.path / "overrides.json"
+        path.write_text(json.dumps({"example.com": {"user_agent": "first"}}))
+        reader = URLTitleReader(overrides_path=path)
+        self.assertEqual("first", reader._overrides("https://example.com/")["user_agent"])  # pylint: disable=protected-access
+        self.assertEqual("Googlebot-News", reader._overrides("https://m.youtube.com/")["user_agent"])  # pylint: disable=protected-access
+        reader.close()
+        path.write_text(json.dumps({"example.com": {"unknown": 1}}))
+        with self.assertRaises(ValueError):
+            URLTitleReader(overrides_path=path)
@@ -0,0 +1,93 @@
+"""Test the PDF title metadata locator."""
+import io
+import unittest
+from typing import Any, Optional, Tuple
+
+import pikepdf
+
+from urltitle.util.pdf import PDFRangeError, pdf_title_ranges
+
+
+def _pdf(title: Optional[str] = None, xmp_title: Optional[str] = None, num_pages: int = 100, **save_kwargs: Any) -> bytes:
+    pdf = pikepdf.new()
+    for _ in range(num_pages):
+        pdf.add_blank_page()
+    if title is not None:
+        pdf.docinfo["/Title"] = title
+    if xmp_title is not None:
+        with pdf.open_metadata(set_pikepdf_as_editor=False, update_docinfo=False) as metadata:
+            metadata["dc:title"] = xmp_title
+    content = io.BytesIO()
+    pdf.save(content, **save_kwargs)
+    return content.getvalue()
+
+
+def _locate(content: bytes, read_size: int = 1024, max_reads: int = 16, max_stream_size: int = 1024 * 1024) -> Tuple[str, int]:
+    ranges = pdf_title_ranges(len(content), read_size=read_size, max_reads=max_reads, max_stream_size=max_stream_size)
+    num_bytes_read = 0
+    try:
+        byte_range = next(ranges)
+        while True:
+            num_bytes_read += byte_range[1] - byte_range[0]
+            byte_range = ranges.send(content[byte_range[0] : byte_range[1]])
+    except StopIteration as stop:
+        return stop.value, num_bytes_read
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestPDFTitleRanges(unittest.TestCase):
+    def test_xref_table(self):
+        content = _pdf("A  Title", object_stream_mode=pikepdf.ObjectStreamMode.disable)
+        title, num_bytes_read = _locate(content)
+        self.assertEqual("A Title", title)
+        self.assertLess(num_bytes_read, len(content) / 2)
+
+    def test_xref_stream(self):
+        self.assertEqual("Ünïcode ☃", _locate(_pdf("Ünïcode ☃", object_stream_mode=pikepdf.ObjectStreamMode.generate))[0])
+
+    def test_linearized(self):
+        for object_stream_mode in (pikepdf.ObjectStreamMode.disable, pikepdf.ObjectStreamMode.generate):
+            title, num_bytes_read = _locate(_pdf("Linearized", linearize=True, object_stream_mode=object_stream_mode))
+            self.assertEqual("Linearized", title)
+            self.assertLessEqual(num_bytes_read, 6 * 1024)
+
+    def test_incremental_update(self):
+        pdf = pikepdf.open(io.BytesIO(_pdf("Old")))
+        pdf.docinfo["/Title"] = "New"
+        content = io.BytesIO()
+        pdf.save(content)
+        self.assertEqual("New", _locate(content.getvalue())[0])
+
+    def test_xmp_title(self):
+        self.assertEqual("XMP & Title", _locate(_pdf(xmp_title="XMP & Title", object_stream_mode=pikepdf.ObjectStreamMode.generate))[0])
+
+    def test_no_title(self):
+        self.assertEqual("", _locate(_pdf())[0])
+
+    def test_errors(self):
+        with self.assertRaises(PDFRangeError):
+            _locate(b"Not a PDF" * 1000)
+        with self.assertRaises(PDFRangeError):
+            _locate(_pdf("Title", object_stream_mode=pikepdf.ObjectStreamMode.disable), max_reads=1)
+        with self.assertRaises(PDFRangeError):
+            _locate(_pdf("Title", encryption=pikepdf.Encryption(owner="owner", user="")))
+
+    def test_stream_bomb(self):
+        pdf = pikepdf.open(io.BytesIO(_pdf()))
+        pdf.Root.Metadata = pikepdf.Stream(pdf, b" " * (64 * 1024 * 1024))  # Is compressed on save.
+        content = io.BytesIO()
+        pdf.save(content, fix_metadata_version=False)
+        self.assertLess(len(content.getvalue()), 1024 * 1024)
+        with self.assertRaisesRegex(PDFRangeError, "exceeds the max size"):
+            _locate(content.getvalue())
+
+    def test_nesting(self):
+        pdf = pikepdf.open(io.BytesIO(_pdf()))
+        nested = pikepdf.Array()
+        for _ in range(5000):
+            nested = pikepdf.Array([nested])
+        pdf.docinfo["/Nested"] = nested
+        content = io.BytesIO()
+        pdf.save(content, object_stream_mode=pikepdf.ObjectStreamMode.disable)
+        with self.assertRaisesRegex(PDFRangeError, "nesting depth"):
+            _locate(content.getvalue(), read_size=64 * 1024)
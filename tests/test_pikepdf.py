@@ -0,0 +1,85 @@
+"""Test the PDF title utilities."""
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import patch
+
+from urltitle.util import pikepdf
+from urltitle.util.pikepdf import PDFTitlePool
+
+
+def _pdf(title: str) -> bytes:
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"<< /Type /Pages /Kids [] /Count 0 >>", b"<< /Title (" + title.encode() + b") >>"]
+    content = b"%PDF-1.4\n"
+    offsets = []
+    for num, obj in enumerate(objects, 1):
+        offsets.append(len(content))
+        content += b"%d 0 obj\n%s\nendobj\n" % (num, obj)
+    xref_offset = len(content)
+    content += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    content += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    content += b"trailer\n<< /Size %d /Root 1 0 R /Info 3 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return content
+
+
+def _crash(pdf_stream: BytesIO) -> str:  # pylint: disable=unused-argument
+    os._exit(1)  # pylint: disable=protected-access
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestPDFTitlePool(unittest.TestCase):
+    def test_title(self):
+        pool = PDFTitlePool(processes=2, max_tasks_per_process=2, timeout=30)
+        try:
+            titles = [pool.title(_pdf(f"Title  {num}")) for num in range(5)]  # Processes are replaced.
+        finally:
+            pool.close()
+        self.assertEqual([f"Title {num}" for num in range(5)], titles)
+
+    def test_restart_after_close(self):
+        pool = PDFTitlePool(processes=1, max_tasks_per_process=10, timeout=30)
+        try:
+            self.assertEqual("Before", pool.title(_pdf("Before")))
+            pool.close()
+            self.assertEqual("After", pool.title(_pdf("After")))
+        finally:
+            pool.close()
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork", "requires processes which inherit the patch")
+    def test_crash(self):
+        get_pdf_title = pikepdf._get_pdf_title  # pylint: disable=protected-access
+        with tempfile.TemporaryDirectory() as dir_name:
+            crashed_path = Path(dir_name) / "crashed"
+
+            def crash_once(pdf_stream: BytesIO) -> str:
+                if crashed_path.exists():
+                    return get_pdf_title(pdf_stream)
+                crashed_path.touch()
+                return _crash(pdf_stream)
+
+            pool = PDFTitlePool(processes=1, max_tasks_per_process=10, timeout=30)
+            start_time = time.monotonic()
+            try:
+                with patch.object(pikepdf, "_get_pdf_title", crash_once):
+                    self.assertEqual("Retried", pool.title(_pdf("Retried")))
+                pool.close()  # The processes are started again with the patch.
+                with patch.object(pikepdf, "_get_pdf_title", _crash):
+                    self.assertIsNone(pool.title(_pdf("Crashed")))
+                self.assertEqual("After", pool.title(_pdf("After")))
+            finally:
+                pool.close()
+        self.assertLess(time.monotonic() - start_time, 10)  # The crashes are detected without waiting for the timeout.
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork", "requires processes which inherit the patch")
+    def test_timeout(self):
+        pool = PDFTitlePool(processes=1, max_tasks_per_process=10, timeout=0.5)
+        try:
+            with patch.object(pikepdf, "_get_pdf_title", lambda pdf_stream: time.sleep(60)):
+                self.assertIsNone(pool.title(_pdf("Hung")))
+            self.assertEqual("After", pool.title(_pdf("After")))
+        finally:
+            pool.close()
@@ -0,0 +1,70 @@
+"""Test the adaptive estimates of the amount of HTML content to read for a title."""
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.replay import ReplayServer, proxied, replay_url, synthetic_corpus
+from urltitle import ReadSizeEstimator, URLTitleReader, config
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestReadSizeEstimator(unittest.TestCase):
+    def test_estimate(self):
+        estimator = ReadSizeEstimator(default=16 * config.KiB, max_size=64 * config.KiB)
+        self.assertEqual(16 * config.KiB, estimator.estimate("https://example.com/"))
+        for _ in range(8):
+            estimator.observe("https://example.com/", 4 * config.KiB)
+        self.assertEqual(4 * config.KiB, estimator.estimate("https://www.example.com/page"))
+        estimator.observe("https://example.com/", 48 * config.KiB)
+        self.assertEqual(48 * config.KiB, estimator.estimate("https://example.com/"))  # The newest observation weighs the most.
+        for _ in range(8):
+            estimator.observe("https://example.com/", 4 * config.KiB)
+        self.assertEqual(4 * config.KiB, estimator.estimate("https://example.com/"))  # The outlier has decayed.
+        estimator.observe("https://example.com/", 100 * config.KiB)
+        self.assertEqual(64 * config.KiB, estimator.estimate("https://example.com/"))
+        stats = estimator.stats()["example.com"]
+        self.assertEqual((64 * config.KiB, config.READ_SIZE_MAX_SAMPLES, 18), stats[:3])
+        self.assertEqual(16, stats.num_within_estimate)
+
+    def test_path_prefix(self):
+        estimator = ReadSizeEstimator(min_path_samples=2)
+        estimator.observe("https://example.com/", 2 * config.KiB)
+        estimator.observe("https://example.com/news/1", 32 * config.KiB)
+        self.assertEqual(32 * config.KiB, estimator.estimate("https://example.com/news/2"))
+        for _ in range(8):
+            estimator.observe("https://example.com/", 2 * config.KiB)
+        self.assertEqual(2 * config.KiB, estimator.estimate("https://example.com/news/2"))  # The prefix has too few samples.
+        self.assertEqual(2 * config.KiB, estimator.estimate("https://example.com/about"))
+        estimator.observe("https://example.com/news/1", 32 * config.KiB)
+        self.assertEqual(32 * config.KiB, estimator.estimate("https://example.com/news/2"))
+        self.assertEqual({"example.com", "example.com/news"}, set(estimator.stats()))
+
+    def test_max_keys(self):
+        estimator = ReadSizeEstimator(max_keys=2)
+        for num in range(3):
+            estimator.observe(f"https://example{num}.com/", config.KiB)
+        self.assertEqual(2, len(estimator))
+        self.assertEqual(config.DEFAULT_REQUEST_SIZE, estimator.estimate("https://example0.com/"))
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as dir_name:
+            path = Path(dir_name) / "titles.sqlite3"
+            estimator = ReadSizeEstimator(path)
+            estimator.observe("https://example.com/a/b", 3 * config.KiB)
+            estimator.close()
+            estimator = ReadSizeEstimator(path, max_keys=1)
+            self.assertEqual(1, len(estimator))
+            self.assertEqual(3 * config.KiB, estimator.estimate("https://example.com/"))
+            estimator.close()
+
+    def test_reader(self):
+        with tempfile.TemporaryDirectory() as dir_name, ReplayServer(synthetic_corpus()) as server, proxied(server):
+            path = Path(dir_name) / "titles.sqlite3"
+            reader = URLTitleReader(title_cache_path=path)
+            self.assertEqual("Late Title", reader.title(replay_url("https://example.com/late-title")))
+            estimate = reader.read_sizes.estimate(replay_url("https://example.com/"))
+            self.assertGreater(estimate, config.DEFAULT_REQUEST_SIZE)
+            reader.close()
+            reader = URLTitleReader(title_cache_path=path)
+            self.assertEqual(estimate, reader.read_sizes.estimate(replay_url("https://example.com/")))
+            reader.close()
@@ -0,0 +1,79 @@
+"""Test the cache of the final URLs of redirected URLs."""
+import time
+import unittest
+from unittest.mock import patch
+
+from tests.replay import ReplayResponse, ReplayServer, proxied, replay_url, synthetic_corpus
+from urltitle import RedirectCache, URLTitleReader, config
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestRedirectCache(unittest.TestCase):
+    def test_resolve(self):
+        redirects = RedirectCache()
+        redirects.record("https://t.co/a", "http://example.com/a")
+        redirects.record("http://example.com/a", "https://example.com/a")
+        redirects.record("https://example.com/b", "https://example.com/b")
+        self.assertEqual("https://example.com/a", redirects.resolve("https://t.co/a"))
+        self.assertEqual("https://example.com/b", redirects.resolve("https://example.com/b"))
+        redirects.forget("http://example.com/a")
+        self.assertEqual("http://example.com/a", redirects.resolve("https://t.co/a"))
+
+    def test_cycle(self):
+        redirects = RedirectCache()
+        redirects.record("https://example.com/a", "https://example.com/b")
+        redirects.record("https://example.com/b", "https://example.com/a")
+        self.assertEqual("https://example.com/b", redirects.resolve("https://example.com/a"))
+
+    def test_ttl(self):
+        redirects = RedirectCache(ttl=0.1)
+        redirects.record("https://t.co/a", "https://example.com/a")
+        time.sleep(0.1)
+        self.assertEqual("https://t.co/a", redirects.resolve("https://t.co/a"))
+
+
+class TestReaderRedirects(unittest.TestCase):
+    def setUp(self):
+        self.traces = []
+        self.corpus = synthetic_corpus()
+        for num, status in enumerate((301, 302)):
+            self.corpus.add(f"https://example.com/short{num}", ReplayResponse(status, [("Location", "https://example.com/late-title")], b""))
+
+    def test_shared_title(self):
+        short_urls = [replay_url(f"https://example.com/short{num}") for num in range(2)]
+        with ReplayServer(self.corpus) as server, proxied(server):
+            reader = URLTitleReader(trace_hook=self.traces.append)
+            for url in (*short_urls, short_urls[0]):
+                self.assertEqual("Late Title", reader.title(url))
+            reader.close()
+        final_url = replay_url("https://example.com/late-title")
+        self.assertEqual([final_url, final_url], [reader.redirects.resolve(url) for url in short_urls])
+        self.assertIsNone(reader._title_cache.get(short_urls[0]))  # pylint: disable=protected-access
+        self.assertGreater(self.traces[0].num_bytes_read, 300 * config.KiB)
+        self.assertEqual(0, self.traces[1].num_bytes_read)  # The title of the final URL was cached.
+        self.assertTrue(self.traces[2].cache_hit)
+
+    def test_unshared_title(self):
+        self.corpus.add("https://example.org/short", ReplayResponse(301, [("Location", "https://example.com/late-title")], b""))
+        url, final_url = replay_url("https://example.org/short"), replay_url("https://example.com/late-title")
+        overrides = {"example.org": {"title_subs": [("^Late ", "Early ")]}, "example.com": {"title_subs": [("^Late ", "Final ")]}}
+        with ReplayServer(self.corpus) as server, proxied(server):
+            reader = URLTitleReader(trace_hook=self.traces.append)
+            reader.reload_overrides({**config.NETLOC_OVERRIDES, **overrides})
+            self.assertEqual(["Final Title", "Early Title"], [reader.title(final_url), reader.title(url)])
+            reader._title_cache.clear()  # pylint: disable=protected-access
+            self.assertEqual("Early Title", reader.title(url))  # The cached redirect is not followed because the overrides differ.
+            self.assertEqual("Final Title", reader.title(final_url))
+            reader.close()
+        self.assertEqual(final_url, reader.redirects.resolve(url))
+        self.assertGreater(self.traces[1].num_bytes_read, 300 * config.KiB)  # The cached title of the final URL is not used.
+        self.assertFalse(self.traces[3].cache_hit)
+
+    def test_failed_redirect(self):
+        url = replay_url("https://example.com/")
+        with ReplayServer(self.corpus) as server, proxied(server), patch.object(config, "REQUEST_BACKOFF_BASE", 0.01):
+            reader = URLTitleReader()
+            reader.redirects.record(url, replay_url("https://example.com/missing"))
+            self.assertEqual("Example Domain", reader.title(url))
+            reader.close()
+        self.assertEqual(url, reader.redirects.resolve(url))
@@ -0,0 +1,39 @@
+"""Test reading titles offline from a local replay server."""
+import time
+import unittest
+
+from tests.replay import ReadCounter, ReplayServer, proxied, replay_url, synthetic_corpus
+from urltitle import URLTitleReader
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.corpus = synthetic_corpus()
+
+    def test_titles(self):
+        with ReplayServer(self.corpus) as server, proxied(server):
+            reader = URLTitleReader()
+            for url, expected_title in self.corpus.titles.items():
+                with self.subTest(url=url):
+                    self.assertEqual(expected_title, reader.title(replay_url(url)))
+            reader.close()
+
+    def test_bytes_read(self):
+        url = "https://example.org/paper.pdf"
+        with ReplayServer(self.corpus) as server, proxied(server), ReadCounter(server) as counter:
+            reader = URLTitleReader()
+            self.assertEqual(self.corpus.titles[url], reader.title(replay_url(url)))
+            reader.close()
+        response = self.corpus.get(url)
+        assert response is not None
+        self.assertGreater(counter.num_bytes_read, 0)
+        self.assertLess(counter.num_bytes_read, len(response.body) / 4)
+
+    def test_latency(self):
+        with ReplayServer(self.corpus, latency=0.1) as server, proxied(server):
+            reader = URLTitleReader()
+            start_time = time.monotonic()
+            reader.title(replay_url("https://example.com/"))
+            self.assertGreaterEqual(time.monotonic() - start_time, 0.1)
+            reader.close()
@@ -0,0 +1,152 @@
+"""Test the revalidation of stale cached titles."""
+import asyncio
+import time
+import unittest
+from typing import Union
+from unittest.mock import patch
+
+from tests.replay import ReadCounter, ReplayResponse, ReplayServer, proxied, replay_url, synthetic_corpus
+from urltitle import AsyncURLTitleReader, CachedTitle, MemoryTitleCache, URLTitleReader, config
+
+_FILLER = b"<script>" + b"var x = 1;\n" * 30_000 + b"</script>"  # Approximately 330 KiB.
+
+
+def _page(title: str, etag: str) -> ReplayResponse:
+    return ReplayResponse(200, [("Content-Type", "text/html; charset=utf-8"), ("ETag", etag)], b"<html><head>" + _FILLER + f"<title>{title}</title></head></html>".encode())
+
+
+def _cached(reader: Union[URLTitleReader, AsyncURLTitleReader], url: str) -> CachedTitle:
+    cached = reader._title_cache.get_entry(reader._title_key(url))  # pylint: disable=protected-access
+    assert cached is not None
+    return cached
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring,protected-access
+class TestRevalidation(unittest.TestCase):
+    def setUp(self):
+        self.corpus = synthetic_corpus()
+        self.corpus.add("https://example.com/page", _page("Old Title", '"v1"'))
+        self.url = replay_url("https://example.com/page")
+        self.traces = []
+
+    def _wait_until_fresh(self, reader: URLTitleReader) -> None:
+        key = reader._title_key(self.url)
+        deadline = time.monotonic() + 10
+        while reader._title_cache.get(key) is None:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.02)
+
+    def test_not_modified(self):
+        with ReplayServer(self.corpus) as server, proxied(server):
+            reader = URLTitleReader(title_cache_ttl=0.2, trace_hook=self.traces.append)
+            self.assertEqual("Old Title", reader.title(self.url))
+            offset = _cached(reader, self.url).validators.offset
+            assert offset is not None
+            self.assertGreater(offset, 300 * config.KiB)
+            time.sleep(0.3)
+            with ReadCounter(server) as counter:
+                self.assertEqual("Old Title", reader.title(self.url))  # The stale title is returned without waiting.
+                self._wait_until_fresh(reader)
+            reader.close()
+        self.assertTrue(self.traces[1].cache_hit)
+        self.assertLess(counter.num_bytes_read, config.KiB)  # Only the headers of the Not Modified response were read.
+        cached = _cached(reader, self.url)
+        self.assertEqual(('"v1"', offset), (cached.validators.etag, cached.validators.offset))
+
+    def test_modified(self):
+        with ReplayServer(self.corpus) as server, proxied(server):
+            reader = URLTitleReader(title_cache_ttl=0.2)
+            self.assertEqual("Old Title", reader.title(self.url))
+            self.corpus.add("https://example.com/page", _page("New Title", '"v2"'))
+            time.sleep(0.3)
+            self.assertEqual("Old Title", reader.title(self.url))
+            self._wait_until_fresh(reader)
+            self.assertEqual("New Title", reader.title(self.url))
+            reader.close()
+        self.assertEqual('"v2"', _cached(reader, self.url).validators.etag)
+
+    def test_failed_revalidation(self):
+        with ReplayServer(self.corpus) as server, proxied(server), patch.object(config, "REQUEST_BACKOFF_BASE", 0.01):
+            reader = URLTitleReader(title_cache_ttl=0.2)
+            self.assertEqual("Old Title", reader.title(self.url))
+            self.corpus.responses.clear()
+            time.sleep(0.3)
+            self.assertEqual("Old Title", reader.title(self.url))
+            reader._revalidation_executor.shutdown(wait=True)
+            reader.close()
+        self.assertTrue(_cached(reader, self.url).is_stale)
+
+    def test_close(self):
+        self.corpus.add("https://example.com/other", _page("Other Title", '"v1"'))
+        other_url = replay_url("https://example.com/other")
+        with ReplayServer(self.corpus) as server, proxied(server), patch.object(config, "REVALIDATION_MAX_WORKERS", 1):
+            reader = URLTitleReader(title_cache_ttl=0.2)
+            self.assertEqual(["Old Title", "Other Title"], [reader.title(self.url), reader.title(other_url)])
+            time.sleep(0.3)
+            server.latency = 0.5
+            self.assertEqual(["Old Title", "Other Title"], [reader.title(self.url), reader.title(other_url)])
+            running, pending = reader._revalidations[reader._title_key(self.url)], reader._revalidations[reader._title_key(other_url)]
+            reader.close()
+            self.assertTrue(running.done() and not running.cancelled())
+            self.assertTrue(pending.cancelled())
+            reader._revalidate_in_background(self.url, reader._title_key(self.url), _cached(reader, self.url))  # Is ignored once closed.
+            self.assertNotIn(reader._title_key(self.url), reader._revalidations)
+        self.assertFalse(_cached(reader, self.url).is_stale)
+        self.assertTrue(_cached(reader, other_url).is_stale)
+
+    def test_async(self):
+        async def revalidate(url: str, title_cache: MemoryTitleCache) -> str:
+            reader = AsyncURLTitleReader(title_cache=title_cache)
+            title = await reader.title(url)
+            await asyncio.sleep(0.05)  # The revalidation starts, and waits for its response.
+            await reader.aclose()  # The running revalidation is waited for.
+            return title
+
+        async def main(url: str) -> None:
+            title_cache = MemoryTitleCache(max_size=8, ttl=0.2)
+            self.assertEqual("Old Title", await revalidate(url, title_cache))
+            self.corpus.add(url, _page("New Title", '"v1"'))  # The unchanged ETag is trusted.
+            await asyncio.sleep(0.3)
+            self.assertEqual("Old Title", await revalidate(url, title_cache))
+            cached = title_cache.get_entry(url)
+            assert cached is not None
+            self.assertEqual(("Old Title", False), (cached.title, cached.is_stale))
+            self.corpus.add(url, _page("New Title", '"v2"'))
+            await asyncio.sleep(0.3)
+            self.assertEqual("Old Title", await revalidate(url, title_cache))
+            self.assertEqual("New Title", await revalidate(url, title_cache))
+
+        with ReplayServer(self.corpus) as server:
+            url = f"{server.url}/page"
+            self.corpus.add(url, _page("Old Title", '"v1"'))
+            server.latency = 0.2  # The revalidation is still running when the reader is closed.
+            asyncio.run(main(url))
+
+    def test_async_close(self):
+        async def main(url: str) -> None:
+            reader = AsyncURLTitleReader(title_cache_ttl=0.2)
+            self.assertEqual("Old Title", await reader.title(url))
+            await asyncio.sleep(0.3)
+            self.assertEqual("Old Title", await reader.title(url))
+            await reader.aclose()  # The pending revalidation is cancelled.
+            self.assertTrue(_cached(reader, url).is_stale)
+
+        async def fail(*_args: object) -> str:
+            raise RuntimeError("Test")
+
+        async def fail_revalidation(url: str) -> None:
+            reader = AsyncURLTitleReader(title_cache_ttl=0.2)
+            await reader.title(url)
+            await asyncio.sleep(0.3)
+            with patch.object(reader, "_title_outer_uncached", fail):
+                self.assertEqual("Old Title", await reader.title(url))
+                await asyncio.sleep(0)
+                await reader.aclose()
+
+        with ReplayServer(self.corpus) as server:
+            url = f"{server.url}/page"
+            self.corpus.add(url, _page("Old Title", '"v1"'))
+            asyncio.run(main(url))
+            with self.assertLogs("urltitle.asyncurltitle", "ERROR") as logs:
+                asyncio.run(fail_revalidation(url))
+        self.assertIn("Error revalidating stale cached title", logs.output[0])
@@ -0,0 +1,48 @@
+"""Test the memory bound of the incremental searches of response content for a title."""
+import asyncio
+import tracemalloc
+import unittest
+import zlib
+from typing import Callable
+
+from tests.replay import ReplayCorpus, ReplayResponse, ReplayServer, proxied
+from urltitle import AsyncURLTitleReader, URLTitleReader, config
+
+
+def _gzip_bomb(size: int) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    chunk = b" " * config.MiB
+    content = compressor.compress(b"<html><head><script>") + b"".join(compressor.compress(chunk) for _ in range(size // len(chunk)))
+    return content + compressor.flush()
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestHTMLTitleSearchMemory(unittest.TestCase):
+    def setUp(self):
+        self.corpus = ReplayCorpus()
+        self.body = _gzip_bomb(256 * config.MiB)
+        self.assertLess(len(self.body), config.MiB)
+
+    def _traced_peak(self, server: ReplayServer, read_title: Callable[[str], object]) -> int:
+        url = f"{server.url}/bomb"
+        self.corpus.add(url, ReplayResponse(200, [("Content-Type", "text/html"), ("Content-Encoding", "gzip")], self.body))
+        tracemalloc.start()
+        try:
+            read_title(url)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_sync(self):
+        with ReplayServer(self.corpus) as server, proxied(server):
+            reader = URLTitleReader()
+            peak = self._traced_peak(server, reader.title)
+            reader.close()
+        self.assertLess(peak, 8 * config.MAX_REQUEST_SIZES["html"])  # The decompressed content is 256 times that.
+
+    def test_async(self):
+        with ReplayServer(self.corpus) as server:
+            reader = AsyncURLTitleReader()
+            peak = self._traced_peak(server, lambda url: asyncio.run(reader.title(url)))
+            reader.close()
+        self.assertLess(peak, 8 * config.MAX_REQUEST_SIZES["html"])  # The decompressed content is 256 times that.
@@ -0,0 +1,91 @@
+"""Test the threading utilities."""
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+
+from urltitle.util.threading import KeyedSemaphore, SingleFlight
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestSingleFlight(unittest.TestCase):
+    def test_coalescing(self):
+        flights: SingleFlight[int] = SingleFlight()
+        num_calls = 0
+
+        def func():
+            nonlocal num_calls
+            num_calls += 1
+            time.sleep(0.1)
+            return 42
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: flights.call("key", func), range(8)))
+        self.assertEqual([42] * 8, results)
+        self.assertEqual(1, num_calls)
+
+    def test_exception_is_shared(self):
+        flights: SingleFlight[int] = SingleFlight()
+        error = ValueError("failed")
+
+        def func() -> int:
+            time.sleep(0.1)
+            raise error
+
+        def call() -> Union[int, ValueError]:
+            try:
+                return flights.call("key", func)
+            except ValueError as exc:
+                return exc
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: call(), range(4)))
+        self.assertTrue(all(result is error for result in results))
+
+    def test_reentrant_call(self):
+        flights: SingleFlight[int] = SingleFlight()
+        self.assertEqual(1, flights.call("key", lambda: flights.call("key", lambda: 1)))
+
+    def test_cyclic_calls(self):
+        flights: SingleFlight[str] = SingleFlight()
+        barrier = threading.Barrier(2)
+
+        def func(key, other_key):
+            barrier.wait()
+            return flights.call(other_key, lambda: key)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(flights.call, "a", func, "a", "b"), executor.submit(flights.call, "b", func, "b", "a")]
+            results = [future.result(timeout=5) for future in futures]  # Would time out if deadlocked.
+        self.assertLessEqual(set(results), {"a", "b"})
+
+    def test_timeout(self):
+        flights: SingleFlight[int] = SingleFlight()
+        started = threading.Event()
+
+        def func():
+            started.set()
+            time.sleep(0.5)
+            return 42
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(flights.call, "key", func)
+            started.wait()
+            with self.assertRaises(TimeoutError):
+                flights.call("key", func, timeout=0.1)
+            self.assertEqual(42, future.result())
+
+
+class TestKeyedSemaphore(unittest.TestCase):
+    def test_acquire(self):
+        semaphore = KeyedSemaphore(2)
+        self.assertTrue(semaphore.acquire("a"))
+        self.assertTrue(semaphore.acquire("a"))
+        self.assertFalse(semaphore.acquire("a", timeout=0.1))
+        self.assertTrue(semaphore.acquire("b", timeout=0.1))
+        threading.Timer(0.1, semaphore.release, ("a",)).start()
+        self.assertTrue(semaphore.acquire("a", timeout=5))
+        for key in ("a", "a", "b"):
+            semaphore.release(key)
+        self.assertEqual({}, semaphore._counts)  # pylint: disable=protected-access
@@ -0,0 +1,80 @@
+"""Test the traces and aggregate metrics of title requests."""
+import unittest
+
+from tests.replay import ReplayServer, proxied, replay_url, synthetic_corpus
+from urltitle import TitleMetrics, TitleTrace, URLTitleError, URLTitleReader
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestTitleTrace(unittest.TestCase):
+    def setUp(self):
+        self.traces = []
+        self.corpus = synthetic_corpus()
+
+    def _titles(self, *urls: str) -> URLTitleReader:
+        with ReplayServer(self.corpus) as server, proxied(server):
+            reader = URLTitleReader(trace_hook=self.traces.append)
+            for url in urls:
+                try:
+                    reader.title(replay_url(url))
+                except URLTitleError:
+                    pass
+            reader.close()
+        return reader
+
+    def test_html(self):
+        self._titles("https://example.com/late-title", "https://example.com/late-title")
+        self.assertEqual(2, len(self.traces))
+        miss, hit = self.traces[0], self.traces[1]
+        self.assertEqual("Late Title", miss.title)
+        self.assertFalse(miss.cache_hit)
+        self.assertEqual(1, miss.num_attempts)
+        self.assertGreater(miss.num_reads, 1)
+        self.assertGreater(miss.num_bytes_read, 300 * 1024)
+        self.assertEqual({"strainer": "title"}, miss.stage_events("html_title")[0].details)
+        self.assertEqual([event.time for event in miss.events], sorted(event.time for event in miss.events))
+        self.assertLessEqual(miss.events[-1].time, miss.duration)
+        self.assertTrue(hit.cache_hit)
+        self.assertEqual(0, hit.num_bytes_read)
+
+    def test_redirect_and_ranges(self):
+        self._titles("https://example.com/redirect", "https://example.org/paper.pdf")
+        self.assertEqual(2, len(self.traces))
+        redirect, pdf = self.traces[0], self.traces[1]
+        self.assertEqual("Example Domain", redirect.title)
+        self.assertEqual("Paper Title", pdf.title)
+        self.assertTrue(pdf.stage_events("read"))
+        self.assertTrue(all("byte_range" in event.details for event in pdf.stage_events("read")))
+        self.assertLess(pdf.num_bytes_read, 64 * 1024)
+
+    def test_error(self):
+        self._titles("https://example.com/missing")
+        self.assertEqual(1, len(self.traces))
+        trace = self.traces[0]
+        self.assertIsInstance(trace.error, URLTitleError)
+        self.assertEqual(3, trace.num_attempts)
+
+    def test_metrics(self):
+        reader = self._titles("https://example.com/", "https://example.com/", "https://example.com/missing", "https://example.org/image.jpg")
+        text = reader.metrics.prometheus_text()
+        self.assertIn('urltitle_titles_total{netloc="example.com",outcome="hit"} 1\n', text)
+        self.assertIn('urltitle_titles_total{netloc="example.com",outcome="miss"} 1\n', text)
+        self.assertIn('urltitle_titles_total{netloc="example.com",outcome="error"} 1\n', text)
+        self.assertIn('urltitle_request_attempts_total{netloc="example.com"} 4\n', text)
+        self.assertIn('urltitle_title_duration_seconds_bucket{netloc="example.org",le="+Inf"} 1\n', text)
+        self.assertIn('urltitle_title_duration_seconds_count{netloc="example.com"} 3\n', text)
+
+
+class TestTitleMetrics(unittest.TestCase):
+    def test_max_netlocs(self):
+        metrics = TitleMetrics(duration_buckets=(1, 0.5), max_netlocs=1)
+        for netloc in ("a.com", 'b"\\.com'):
+            trace = TitleTrace(f"https://{netloc}/", netloc)
+            trace.add("read", num_bytes=10)
+            trace.end(title="Title")
+            metrics.observe(trace)
+        text = metrics.prometheus_text(prefix="test")
+        self.assertIn('test_read_bytes_total{netloc="a.com"} 10\n', text)
+        self.assertIn('test_read_bytes_total{netloc="other"} 10\n', text)
+        self.assertIn('test_title_duration_seconds_bucket{netloc="other",le="0.5"} 1\n', text)
+        self.assertIn("# TYPE test_title_duration_seconds histogram\n", text)
@@ -0,0 +1,139 @@
+"""Test the pool of persistent HTTP connections."""
+import shutil
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional
+from urllib.error import URLError
+from urllib.request import build_opener
+
+from urltitle.util.urllib import ConnectionPool, PooledHTTPHandler, PooledHTTPSHandler
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.num_connections += 1
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Serve a body of the size in the path, closing the connection if requested by the query."""
+        path, _, query = self.path.partition("?")
+        body = b"x" * int(path.strip("/"))
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if query == "close":
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, context: Optional[ssl.SSLContext] = None):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        if context is not None:
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.scheme = "https" if context else "http"
+        self.num_connections = 0
+        self.lock = threading.Lock()
+
+    def url(self, path: str) -> str:
+        """Return the URL of the given path."""
+        return f"{self.scheme}://127.0.0.1:{self.server_address[1]}{path}"
+
+    def __enter__(self) -> "_Server":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(max_idle_per_host=2, idle_timeout=30, max_drain_size=1024, max_active_per_host=1)
+        self.opener = build_opener(PooledHTTPHandler(self.pool))
+
+    def tearDown(self):
+        self.pool.close()
+
+    def _read(self, url: str, amount: Optional[int] = None) -> bytes:
+        with self.opener.open(url, timeout=5) as response:
+            return response.read(amount)
+
+    def test_reuse(self):
+        with _Server() as server:
+            self.assertEqual([b"x" * 10] * 3, [self._read(server.url("/10")) for _ in range(3)])
+            self.assertEqual(1, server.num_connections)
+            self._read(server.url("/10?close"))
+            self._read(server.url("/10"))
+            self.assertEqual(2, server.num_connections)
+
+    def test_drain(self):
+        with _Server() as server:
+            self._read(server.url("/1000"), 10)
+            self._read(server.url("/10"))
+            self.assertEqual(1, server.num_connections)  # The unread remainder was drained.
+            self._read(server.url("/5000"), 10)
+            self._read(server.url("/10"))
+            self.assertEqual(2, server.num_connections)  # The unread remainder was too large to drain.
+
+    def test_idle_timeout(self):
+        self.pool = ConnectionPool(max_idle_per_host=2, idle_timeout=0.2)
+        self.opener = build_opener(PooledHTTPHandler(self.pool))
+        with _Server() as server:
+            self._read(server.url("/10"))
+            self._read(server.url("/10"))
+            self.assertEqual(1, server.num_connections)
+            time.sleep(0.3)
+            self._read(server.url("/10"))
+            self.assertEqual(2, server.num_connections)
+
+    def test_max_active_per_host(self):
+        with _Server() as server:
+            response = self.opener.open(server.url("/10"), timeout=5)
+            start_time = time.monotonic()
+            with self.assertRaises(URLError) as context:
+                self.opener.open(server.url("/10"), timeout=0.2)
+            self.assertIsInstance(context.exception.reason, socket.timeout)
+            self.assertGreaterEqual(time.monotonic() - start_time, 0.2)
+            threading.Timer(0.1, response.close).start()
+            self.assertEqual(b"x" * 10, self._read(server.url("/10")))  # The connection is waited for and is reused.
+            self.assertEqual(1, server.num_connections)
+
+    @unittest.skipUnless(shutil.which("openssl"), "requires openssl to create a certificate")
+    def test_tls_session_resumption(self):
+        with tempfile.TemporaryDirectory() as dir_name:
+            cert_path, key_path = Path(dir_name) / "cert.pem", Path(dir_name) / "key.pem"
+            subprocess.run(
+                ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost", "-addext", "subjectAltName=IP:127.0.0.1"]
+                + ["-keyout", str(key_path), "-out", str(cert_path)],
+                check=True,
+                capture_output=True,
+            )
+            server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            server_context.load_cert_chain(cert_path, key_path)
+            client_context = ssl.create_default_context(cafile=str(cert_path))
+        opener = build_opener(PooledHTTPSHandler(self.pool, context=client_context))
+        with _Server(server_context) as server:
+            self.assertEqual(b"x" * 10, opener.open(server.url("/10?close"), timeout=5).read())  # The connection is not reusable.
+            with opener.open(server.url("/10"), timeout=5) as response:
+                self.assertTrue(response.sock.session_reused)
+                response.read()
+        self.assertEqual(2, server.num_connections)
@@ -0,0 +1,268 @@
+"""Test the URL title readers offline."""
+import asyncio
+import threading
+import time
+import unittest
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+from unittest.mock import patch
+from urllib.parse import urlsplit
+
+from tests.replay import ReplayServer, proxied, replay_url, synthetic_corpus
+from urltitle import AsyncURLTitleReader, URLTitleError, URLTitleReader, URLTitleTimeoutError, config
+
+
+def _title(url: str, title: Optional[str]) -> str:
+    if title is None:
+        raise URLTitleError(f"Failed to read title of URL {url}.", "timeout")
+    return title
+
+
+_Outcomes = Dict[str, Tuple[float, Optional[str]]]  # Scheme to its delay and title, or None for an error.
+
+
+class _RacedURLTitleReader(URLTitleReader):
+    def __init__(self, outcomes: _Outcomes):
+        super().__init__()
+        self.outcomes = outcomes
+        self.started: List[str] = []
+        self.max_running = 0  # Max number of concurrent guesses.
+        self._running = 0
+        self._race_lock = threading.Lock()
+
+    def _title_outer(self, url: str) -> str:
+        if "://" not in url:
+            return super()._title_outer(url)
+        with self._race_lock:
+            self.started.append(url)
+            self._running += 1
+            self.max_running = max(self.max_running, self._running)
+        try:
+            delay, title = self.outcomes[url.partition("://")[0]]
+            time.sleep(delay)
+            return _title(url, title)
+        finally:
+            with self._race_lock:
+                self._running -= 1
+
+
+class _RacedAsyncURLTitleReader(AsyncURLTitleReader):
+    def __init__(self, outcomes: _Outcomes):
+        super().__init__()
+        self.outcomes = outcomes
+        self.started: List[str] = []
+        self.cancelled: List[str] = []
+
+    async def _title_outer(self, url: str) -> str:
+        if "://" not in url:
+            return await super()._title_outer(url)
+        self.started.append(url)
+        delay, title = self.outcomes[url.partition("://")[0]]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(url)
+            raise
+        return _title(url, title)
+
+
+class _HoppingURLTitleReader(URLTitleReader):
+    def _title_inner(self, url: str) -> str:
+        time.sleep(0.1)
+        num_hop = int(url.rpartition("/")[2] or 0)
+        return self._title_outer(f"https://example.com/{num_hop + 1}")  # Hops without end.
+
+
+class _HoppingAsyncURLTitleReader(AsyncURLTitleReader):
+    async def _title_inner(self, url: str) -> str:
+        await asyncio.sleep(0.1)
+        num_hop = int(url.rpartition("/")[2] or 0)
+        return await self._title_outer(f"https://example.com/{num_hop + 1}")
+
+
+class _BatchURLTitleReader(URLTitleReader):
+    def __init__(self) -> None:
+        super().__init__()
+        self.read_urls: List[str] = []
+        self.max_running: Dict[str, int] = defaultdict(int)  # Netloc to its max number of concurrent reads.
+        self._running: Dict[str, int] = defaultdict(int)
+        self._batch_lock = threading.Lock()
+
+    def title(self, url: str, *, timeout: Optional[float] = None) -> str:
+        netloc = self.netloc(url)
+        with self._batch_lock:
+            self.read_urls.append(url)
+            self._running[netloc] += 1
+            self.max_running[netloc] = max(self.max_running[netloc], self._running[netloc])
+        try:
+            delay = urlsplit(url).path.strip("/")  # Is the delay of the title in seconds, or otherwise "fail" for an error.
+            if delay == "fail":
+                raise URLTitleError(f"Failed to read title of URL {url}.")
+            time.sleep(float(delay))
+            return url
+        finally:
+            with self._batch_lock:
+                self._running[netloc] -= 1
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestSchemeRace(unittest.TestCase):
+    @staticmethod
+    def _stagger() -> float:
+        stagger = config.URL_SCHEME_RACE_STAGGER
+        assert stagger is not None  # The race is enabled by default.
+        return stagger
+
+    def _race(self, outcomes: _Outcomes) -> Tuple[Union[str, URLTitleError], float, List[str], List[str]]:
+        reader = _RacedURLTitleReader(outcomes)
+        start_time = time.monotonic()
+        title: Union[str, URLTitleError]
+        try:
+            title = reader.title("example.com")
+        except URLTitleError as exc:
+            title = exc
+        duration = time.monotonic() - start_time
+        reader.close()
+
+        async_reader = _RacedAsyncURLTitleReader(outcomes)
+        async_title: Union[str, URLTitleError]
+        try:
+            async_title = asyncio.run(async_reader.title("example.com"))
+        except URLTitleError as exc:
+            async_title = exc
+        async_reader.close()
+        self.assertEqual(type(title), type(async_title))
+        if isinstance(title, str):
+            self.assertEqual(title, async_title)
+        return title, duration, reader.started, async_reader.cancelled
+
+    def test_fast_https(self):
+        title, _, started, _ = self._race({"https": (0.0, "HTTPS"), "http": (0.0, "HTTP")})
+        self.assertEqual("HTTPS", title)
+        self.assertEqual(["https://example.com"], started)
+
+    def test_slow_https(self):
+        title, duration, started, cancelled = self._race({"https": (2.0, "HTTPS"), "http": (0.0, "HTTP")})
+        self.assertEqual("HTTP", title)
+        self.assertEqual(["https://example.com", "http://example.com"], started)
+        self.assertEqual(["https://example.com"], cancelled)
+        self.assertLess(duration, self._stagger() + config.URL_SCHEME_RACE_GRACE + 1)
+
+    def test_https_within_grace(self):
+        delay = self._stagger() + config.URL_SCHEME_RACE_GRACE / 2
+        title, _, _, cancelled = self._race({"https": (delay, "HTTPS"), "http": (0.0, "HTTP")})
+        self.assertEqual("HTTPS", title)
+        self.assertEqual([], cancelled)
+
+    def test_failed_https(self):
+        title, duration, started, _ = self._race({"https": (0.0, None), "http": (0.0, "HTTP")})
+        self.assertEqual("HTTP", title)
+        self.assertEqual(2, len(started))
+        self.assertLess(duration, self._stagger())
+
+    def test_all_failed(self):
+        error, _, _, _ = self._race({"https": (0.0, None), "http": (0.1, None)})
+        assert isinstance(error, URLTitleError)
+        self.assertEqual("timeout", error.category)
+
+    def test_bounded_guesses(self):
+        with patch.object(config, "URL_SCHEME_RACE_MAX_WORKERS", 3):
+            reader = _RacedURLTitleReader({"https": (0.5, "HTTPS"), "http": (0.0, "HTTP")})
+        urls = [f"example{num}.com" for num in range(8)]
+        results = dict(reader.titles(urls, max_workers=8))
+        reader.close()
+        self.assertEqual(set(urls), set(results))
+        self.assertTrue(all(isinstance(title, str) for title in results.values()))
+        self.assertEqual(3, reader.max_running)  # The losing guesses which run in the background are bounded too.
+
+    def test_no_race(self):
+        with patch.object(config, "URL_SCHEME_RACE_STAGGER", None):
+            title, duration, started, _ = self._race({"https": (0.5, "HTTPS"), "http": (0.0, "HTTP")})
+        self.assertEqual("HTTPS", title)
+        self.assertEqual(["https://example.com"], started)
+        self.assertGreaterEqual(duration, 0.5)
+
+
+class TestDeadline(unittest.TestCase):
+    def _assert_timeout(self, title: Callable[[], str], timeout: float) -> None:
+        start_time = time.monotonic()
+        with self.assertRaises(URLTitleTimeoutError) as context:
+            title()
+        self.assertEqual("timeout", context.exception.category)
+        self.assertLess(time.monotonic() - start_time, timeout + 0.5)
+
+    def test_hops(self):
+        reader = _HoppingURLTitleReader()
+        self._assert_timeout(lambda: reader.title("https://example.com/", timeout=0.5), 0.5)
+        self.assertIsNone(reader._error_cache.get("https://example.com/1"))  # pylint: disable=protected-access
+        reader.close()
+
+        async_reader = _HoppingAsyncURLTitleReader()
+        self._assert_timeout(lambda: asyncio.run(async_reader.title("https://example.com/", timeout=0.5)), 0.5)
+        self.assertIsNone(async_reader._error_cache.get("https://example.com/1"))  # pylint: disable=protected-access
+        async_reader.close()
+
+    def test_latency(self):
+        with ReplayServer(synthetic_corpus(), latency=1.0) as server, proxied(server):
+            reader = URLTitleReader()
+            self._assert_timeout(lambda: reader.title(replay_url("https://example.com/"), timeout=0.3), 0.3)
+            self.assertEqual("Example Domain", reader.title(replay_url("https://example.com/")))  # The timeout was not cached.
+            reader.close()
+
+    def test_slow_read(self):
+        with ReplayServer(synthetic_corpus(), bandwidth=64 * config.KiB) as server, proxied(server):
+            reader = URLTitleReader()
+            self._assert_timeout(lambda: reader.title(replay_url("https://example.com/late-title"), timeout=1.0), 1.0)
+            reader.close()
+
+    def test_within_timeout(self):
+        with ReplayServer(synthetic_corpus()) as server, proxied(server):
+            reader = URLTitleReader()
+            self.assertEqual("Example Domain", reader.title(replay_url("https://example.com/redirect"), timeout=5))
+            url = replay_url("https://example.com/")
+            self.assertEqual({url: "Example Domain"}, dict(reader.titles([url], timeout=5)))
+            reader.close()
+
+
+class TestTitles(unittest.TestCase):
+    def setUp(self):
+        self.reader = _BatchURLTitleReader()
+
+    def tearDown(self):
+        self.reader.close()
+
+    def test_duplicates(self):
+        urls = ["https://example.com/0", "https://EXAMPLE.com/0#top", "https://example.com/0?utm_source=feed"]
+        results = list(self.reader.titles(urls))
+        self.assertEqual(sorted(urls), sorted(url for url, _ in results))
+        self.assertEqual({"https://example.com/0"}, {title for _, title in results})
+        self.assertEqual(["https://example.com/0"], self.reader.read_urls)
+
+    def test_per_host_limit(self):
+        urls = [f"https://a.example/0.05?page={num}" for num in range(6)] + [f"https://b.example/0.05?page={num}" for num in range(2)]
+        self.assertEqual(set(urls), {url for url, _ in self.reader.titles(urls, max_workers=8, per_host_limit=2)})
+        self.assertEqual({"a.example": 2, "b.example": 2}, self.reader.max_running)
+
+    def test_max_pending(self):
+        num_consumed = 0
+
+        def urls() -> Iterator[str]:
+            nonlocal num_consumed
+            for num in range(20):
+                num_consumed += 1
+                yield f"https://example{num}.com/0"
+
+        titles = self.reader.titles(urls(), max_workers=1)
+        next(titles)
+        self.assertEqual(4, num_consumed)  # The input is consumed only up to four times the number of workers ahead.
+        self.assertEqual(19, len(list(titles)))
+        self.assertEqual(20, num_consumed)
+
+    def test_completion_order(self):
+        urls = ["https://a.example/0.4", "https://b.example/0", "https://c.example/0.2"]
+        self.assertEqual([urls[1], urls[2], urls[0]], [url for url, _ in self.reader.titles(urls)])
+
+    def test_error(self):
+        results = dict(self.reader.titles(["https://a.example/fail", "https://b.example/0.1", "https://c.example/0"]))
+        self.assertIsInstance(results.pop("https://a.example/fail"), URLTitleError)
+        self.assertEqual({"https://b.example/0.1": "https://b.example/0.1", "https://c.example/0": "https://c.example/0"}, results)
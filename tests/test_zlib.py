@@ -0,0 +1,70 @@
+"""Test the decompression utilities."""
+import gzip
+import unittest
+import zlib
+
+from urltitle.util.zlib import BROTLI_AVAILABLE, DecompressionError, StreamDecompressor, is_negotiated_content_encoding
+
+_CONTENT = b"<html><head><title>Compressed</title></head>" + b"<p>Body</p>" * 1000
+
+
+def _decompress(content_encoding: str, data: bytes, chunk_size: int = 100) -> bytes:
+    decompressor = StreamDecompressor(content_encoding)
+    chunks = [decompressor.decompress(data[i : i + chunk_size]) for i in range(0, len(data), chunk_size)]
+    return b"".join(chunks) + decompressor.flush()
+
+
+def _gzip_bomb(size: int) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    chunk = b" " * (1024 * 1024)
+    return b"".join(compressor.compress(chunk) for _ in range(size // len(chunk))) + compressor.flush()
+
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+class TestStreamDecompressor(unittest.TestCase):
+    def test_gzip(self):
+        self.assertEqual(_CONTENT, _decompress("gzip", gzip.compress(_CONTENT)))
+
+    def test_deflate(self):
+        self.assertEqual(_CONTENT, _decompress("deflate", zlib.compress(_CONTENT)))
+        raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        self.assertEqual(_CONTENT, _decompress("Deflate", raw.compress(_CONTENT) + raw.flush()))
+
+    @unittest.skipUnless(BROTLI_AVAILABLE, "requires brotli")
+    def test_brotli(self):
+        import brotli  # pylint: disable=import-outside-toplevel
+
+        self.assertEqual(_CONTENT, _decompress("br", brotli.compress(_CONTENT)))
+
+    def test_multiple_encodings(self):
+        self.assertEqual(_CONTENT, _decompress("deflate, gzip", gzip.compress(zlib.compress(_CONTENT))))
+        self.assertEqual(_CONTENT, _decompress("identity", _CONTENT))
+
+    def test_max_length(self):
+        for content_encoding, data in (("gzip", gzip.compress(_CONTENT)), ("deflate, gzip", gzip.compress(zlib.compress(_CONTENT)))):
+            decompressor = StreamDecompressor(content_encoding)
+            chunks = [decompressor.decompress(data, 1000)]
+            self.assertTrue(decompressor.is_pending)
+            while decompressor.is_pending:
+                chunks.append(decompressor.decompress(b"", 1000))
+            chunks.append(decompressor.flush(1000))
+            self.assertTrue(all(len(chunk) <= 1000 for chunk in chunks))
+            self.assertEqual(_CONTENT, b"".join(chunks))
+
+    def test_gzip_bomb(self):
+        bomb = _gzip_bomb(64 * 1024 * 1024)
+        self.assertLess(len(bomb), 256 * 1024)
+        decompressor = StreamDecompressor("gzip")
+        self.assertEqual(1024 * 1024, len(decompressor.decompress(bomb, 1024 * 1024)))
+        self.assertTrue(decompressor.is_pending)
+        self.assertLessEqual(len(decompressor.flush(1024 * 1024)), 1024 * 1024)
+
+    def test_errors(self):
+        with self.assertRaises(DecompressionError):
+            StreamDecompressor("compress")
+        with self.assertRaises(DecompressionError):
+            _decompress("gzip", b"not gzip")
+
+    def test_is_negotiated_content_encoding(self):
+        self.assertTrue(is_negotiated_content_encoding("GZIP"))
+        self.assertFalse(is_negotiated_content_encoding("compress"))
@@ -1,2 +1,10 @@
 """Package initialization."""
-from .urltitle import URLTitleError, URLTitleReader
+from .asyncurltitle import AsyncURLTitleReader
+from .cache import CachedTitle, MemoryTitleCache, SharedTitleCache, SQLiteTitleCache, TitleCache, TitleValidators
+from .canonical import URLCanonicalizer
+from .circuit import CircuitBreaker, CircuitStats
+from .overrides import NetlocOverrides, OverridesWatcher
+from .readsize import ReadSizeEstimator, ReadSizeStats
+from .redirects import RedirectCache
+from .trace import TitleMetrics, TitleTrace, TraceEvent
+from .urltitle import URLTitleError, URLTitleReader, URLTitleTimeoutError
@@ -0,0 +1,378 @@
+"""Asynchronous URL title reader."""
+import asyncio
+import functools
+import logging
+import time
+from contextlib import asynccontextmanager
+from http.cookiejar import CookieJar
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Mapping, Optional, Set, Union, cast
+from urllib.parse import urlparse
+
+from . import config
+from .cache import CachedTitle, TitleCache
+from .deadline import _DEADLINE, _deadline, _remaining_time, _request_timeout
+from .errors import URLTitleError, URLTitleTimeoutError
+from .revalidation import _collected_validators, _NotModified, _revalidating
+from .search import _complete_content, _IPYNBTitleSearch, _max_content_size, _ResponseHeaders
+from .trace import _CURRENT_TRACE, TitleTrace, trace_event
+from .urltitle import REQUEST_ERRORS, BaseURLTitleReader, _TitleOutcome
+from .util.asyncio import AsyncHTTPResponse, AsyncKeyedSemaphore, open_url
+from .util.humanize import HumanizedBytes
+from .util.pdf import PDFRangeError
+from .util.urllib import CustomHTTPRedirectHandler
+
+log = logging.getLogger(__name__)
+
+
+class AsyncURLTitleReader(BaseURLTitleReader):
+    """Asynchronous URL title reader.
+
+    Its requests are made using non-blocking asyncio streams. Its methods must be awaited in a single event loop.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        title_cache_max_size: int = config.DEFAULT_CACHE_MAX_SIZE,
+        title_cache_ttl: float = config.DEFAULT_CACHE_TTL,
+        title_cache_stale_ttl: float = config.DEFAULT_CACHE_STALE_TTL,
+        title_cache_path: Optional[Union[str, Path]] = None,
+        title_cache: Optional[TitleCache] = None,
+        verify_ssl: bool = True,
+        trace_hook: Optional[Callable[[TitleTrace], None]] = None,
+        overrides_path: Optional[Union[str, Path]] = None,
+    ):
+        super().__init__(
+            title_cache_max_size=title_cache_max_size,
+            title_cache_ttl=title_cache_ttl,
+            title_cache_stale_ttl=title_cache_stale_ttl,
+            title_cache_path=title_cache_path,
+            title_cache=title_cache,
+            verify_ssl=verify_ssl,
+            trace_hook=trace_hook,
+            overrides_path=overrides_path,
+        )
+        self._netloc_slots = AsyncKeyedSemaphore(config.MAX_IN_FLIGHT_PER_HOST)
+        self._revalidations: Dict[str, "asyncio.Future[None]"] = {}  # Keys of the stale cached titles being revalidated.
+        self._running_revalidations: Set[str] = set()  # Keys of the revalidations which have started and are not cancelled by a close.
+        self._closed = False
+
+    async def _title_inner(self, url: str) -> str:
+        # Can raise: URLTitleError
+        max_attempts = config.MAX_REQUEST_ATTEMPTS
+        url = url.strip()
+        request_desc = f"request for title of URL {url}"
+        log.debug("Received %s with up to %s attempts.", request_desc, max_attempts)
+        overrides = self._overrides(url)
+
+        # Add scheme if missing
+        if urlparse(url).scheme == "":
+            return await self._race_scheme_guesses(url)
+
+        # Substitute URL as configured
+        substituted_url = self._substitute_url(url, overrides)
+        if substituted_url:
+            trace_event("substitute_url", url=url, substituted_url=substituted_url)
+            return await self._title_outer(substituted_url)
+
+        # Read title of any cached redirect which shares the title
+        resolved_url = self._title_url(url)
+        if resolved_url != url:
+            trace_event("redirect_cache", url=url, resolved_url=resolved_url)
+            try:
+                return await self._title_outer(resolved_url)
+            except URLTitleError as exc:
+                log.info("Failed to read title of %s to which URL %s was previously redirected. The URL will be read instead. %s", resolved_url, url, exc)
+                self.redirects.forget(url)
+
+        # Read title
+        self._check_circuit(url)
+        async with self._netloc_slot(url):  # Released before reading any other title because it may be for the same netloc.
+            outcome = await self._title_outcome(url, overrides, request_desc)
+        if outcome.is_redirect:
+            self.redirects.record(url, cast(str, outcome.url))
+        if outcome.url:
+            if outcome.title is None:
+                return await self._title_outer(outcome.url)
+            try:
+                return await self._title_outer(outcome.url)
+            except URLTitleError as exc:
+                log.debug("The Google cache version failed for the PDF URL %s. %s", url, exc)
+        return cast(str, outcome.title)
+
+    async def _title_outcome(self, url: str, overrides: Mapping[str, Any], request_desc: str) -> _TitleOutcome:
+        # Returns: Outcome of the response, or otherwise the URL of a permanent redirect.
+        # Can raise: URLTitleError
+        for num_attempt in range(1, config.MAX_REQUEST_ATTEMPTS + 1):
+            # Request
+            log.debug("Starting attempt %s processing %s", num_attempt, request_desc)
+            if num_attempt > 1:
+                await asyncio.sleep(self._retry_delay(url, num_attempt))
+                self._check_circuit(url)
+            start_time = time.monotonic()
+            try:
+                request = self._title_request(url, overrides)
+                response = await open_url(
+                    request,
+                    timeout=_request_timeout(url),
+                    ssl_context=self._ssl_context,
+                    cookie_jar=CookieJar(),
+                    max_redirections=CustomHTTPRedirectHandler.max_redirections,
+                )
+                time_used = time.monotonic() - start_time
+            except REQUEST_ERRORS as exc:
+                self._record_request(url, exc, time.monotonic() - start_time)
+                self._check_not_modified(url, exc)
+                redirect_url = self._handle_request_error(exc, num_attempt, request_desc)
+                if redirect_url:
+                    return _TitleOutcome(None, redirect_url, is_redirect=True)
+                continue
+            else:
+                self._record_request(url, None, time_used)
+                break
+
+        title = self._redirected_title(url, response.url)
+        if title is not None:
+            response.close()
+            return _TitleOutcome(title)
+        try:
+            outcome = await self._title_from_response(url, response, overrides, num_attempt, time_used)
+        finally:
+            response.close()
+        self._observe_validators(response.url, response.headers, outcome)
+        trace_event("outcome", url=url, title=outcome.title, fallback_url=outcome.url)
+        return outcome
+
+    @asynccontextmanager
+    async def _netloc_slot(self, url: str) -> AsyncIterator[None]:
+        # Note: A slot is held for the duration of the context, limiting the number of concurrent requests to the netloc.
+        # Can raise: URLTitleError
+        netloc = self.netloc(url)
+        timeout = _request_timeout(url)
+        try:
+            await asyncio.wait_for(self._netloc_slots.acquire(netloc), timeout)
+        except asyncio.TimeoutError:
+            msg = f"Timed out after {timeout:.1f}s waiting for one of {config.MAX_IN_FLIGHT_PER_HOST} concurrent requests to {netloc} for URL {url}."
+            raise URLTitleError(msg, "timeout") from None
+        try:
+            yield
+        finally:
+            self._netloc_slots.release(netloc)
+
+    async def _pdf_title_from_ranges(self, url: str, overrides: Mapping[str, Any], headers: _ResponseHeaders) -> Optional[str]:
+        # Returns: PDF title, or otherwise None if it could not be read using byte ranges.
+        ranges = self._pdf_title_ranges(url, headers)
+        try:
+            byte_range = next(ranges)
+            while True:
+                response = await open_url(
+                    self._pdf_range_request(url, overrides, byte_range),
+                    timeout=_request_timeout(url),
+                    ssl_context=self._ssl_context,
+                    cookie_jar=CookieJar(),
+                    max_redirections=CustomHTTPRedirectHandler.max_redirections,
+                )
+                try:
+                    self._check_pdf_range_response(response.status, response.headers, byte_range)
+                    self._shrink_read_timeout(url, response)
+                    content = await response.read(byte_range[1] - byte_range[0])
+                finally:
+                    response.close()
+                trace_event("read", num_bytes=len(content), byte_range=byte_range)
+                byte_range = ranges.send(content)
+        except StopIteration as stop:
+            return stop.value
+        except (PDFRangeError, *REQUEST_ERRORS) as exc:
+            self._handle_pdf_range_error(url, exc)
+            return None
+
+    async def _pdf_title_from_response(self, url: str, response: AsyncHTTPResponse, overrides: Mapping[str, Any], headers: _ResponseHeaders) -> Optional[str]:
+        # Note: The title is read from byte ranges if possible, and otherwise from the complete content if it is not too large.
+        title = (await self._pdf_title_from_ranges(response.url, overrides, headers)) if self._is_pdf_range_readable(response.headers, headers) else None
+        max_request_size = _max_content_size(url, headers, "PDF") if (title is None) else None
+        if max_request_size:
+            self._shrink_read_timeout(url, response)
+            complete_content = _complete_content(url, await response.read(max_request_size), headers, max_request_size, "PDF")
+            if complete_content is not None:
+                title = await asyncio.get_running_loop().run_in_executor(None, functools.partial(self._pdf_title_pool.title, complete_content, timeout=_remaining_time(url)))
+        return title
+
+    async def _title_from_response(self, url: str, response: AsyncHTTPResponse, overrides: Mapping[str, Any], num_attempt: int, time_used: float) -> _TitleOutcome:
+        headers = self._response_headers(response.headers, num_attempt, time_used)
+
+        # Return title from HTML
+        if self._is_html(headers):
+            search = self._html_title_search(url, response.headers, overrides)
+            while search.amount:
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Reading %s in this iteration with a total of %s read so far.", HumanizedBytes(search.amount), HumanizedBytes(search.content_len_read))
+                self._shrink_read_timeout(url, response)
+                start_time = time.monotonic()
+                with search.read_buffer() as buffer:
+                    num_read = await response.readinto(buffer)
+                search.feed(url, num_read, time.monotonic() - start_time)
+            return self._html_outcome(url, search, headers, overrides)
+
+        # Return title from PDF
+        if self._is_pdf(headers):
+            return self._pdf_outcome(url, await self._pdf_title_from_response(url, response, overrides, headers), headers)
+
+        # Return title from IPYNB
+        if self._is_ipynb(url, headers):
+            ipynb_search = _IPYNBTitleSearch(headers)
+            while ipynb_search.amount:
+                self._shrink_read_timeout(url, response)
+                ipynb_search.feed(url, await response.read(ipynb_search.amount))
+            return self._ipynb_outcome(url, ipynb_search.title, headers)
+
+        return self._headers_outcome(url, headers)
+
+    async def _race_scheme_guesses(self, url: str) -> str:
+        # Can raise: URLTitleError
+        race = self._scheme_race(url)
+        tasks: Dict[asyncio.Future, int] = {}
+        try:
+            while True:
+                for index, (_, fixed_url) in race.due():
+                    tasks[asyncio.ensure_future(self._title_outer(fixed_url))] = index
+                title = self._scheme_race_title(url, race)
+                if title is not None:
+                    return title
+                done, _ = await asyncio.wait(tasks, timeout=race.timeout(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = tasks.pop(task)
+                    try:
+                        race.succeed(index, task.result())
+                    except URLTitleError as exc:
+                        self._fail_scheme_guess(url, race, index, exc)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _title_outer(self, url: str) -> str:
+        key = self._title_key(url)
+        cached = self._title_cache.get_entry(key)
+        trace_event("cache", url=url, hit=cached is not None, stale=(cached is not None) and cached.is_stale)
+        if cached is not None:
+            if cached.is_stale:
+                self._revalidate_in_background(url, key, cached)
+            return cached.title
+        self._raise_cached_error(url)
+        try:
+            with _collected_validators() as validators:
+                title = await self._title_outer_uncached(url)
+        except URLTitleError as exc:
+            self._cache_error(url, exc)
+            raise
+        self._cache_title(url, title, validators)
+        return title
+
+    def _revalidate_in_background(self, url: str, key: str, cached: CachedTitle) -> None:
+        if self._closed or (key in self._revalidations):
+            return
+        log.debug("Revalidating stale cached title %r of URL %s in the background.", cached.title, url)
+        self._revalidations[key] = revalidation = asyncio.ensure_future(self._revalidate(url, key, cached))
+        revalidation.add_done_callback(lambda _: self._end_revalidation(key))
+
+    def _end_revalidation(self, key: str) -> None:
+        self._revalidations.pop(key, None)
+        self._running_revalidations.discard(key)
+
+    async def _revalidate(self, url: str, key: str, cached: CachedTitle) -> None:
+        # Note: This runs in a task with a copy of the context of the title, and so its trace and deadline are unset.
+        _CURRENT_TRACE.set(None)
+        _DEADLINE.set(None)
+        self._running_revalidations.add(key)
+        try:
+            with _revalidating(key, cached) as validators:
+                try:
+                    title: Optional[str] = await self._title_outer_uncached(self._title_url(url))
+                except _NotModified:
+                    title = None
+            if key in self._running_revalidations:  # The title cache may have been closed after a cancellation which was ignored.
+                self._cache_revalidated_title(url, key, cached, title, validators)
+        except URLTitleError as exc:
+            log.info("Failed to revalidate stale cached title of URL %s. It is returned until it is revalidated or evicted. %s", url, exc)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Error revalidating stale cached title of URL %s.", url)
+
+    async def _title_outer_uncached(self, url: str) -> str:
+        title = await self._title_inner(url)
+
+        # Retry title if configured blacklisted
+        config_key = "title_search:retry"
+        title_search_pattern = self._overrides(url).get(config_key)
+        if title_search_pattern and title_search_pattern.search(title):
+            netloc = self.netloc(url)
+            original_title = title
+            max_reattempts = config.MAX_TITLE_SEARCH_REATTEMPTS
+            for reattempt in range(1, max_reattempts + 1):
+                await asyncio.sleep(min(0.2 * (reattempt - 1), _request_timeout(url)))
+                log.info("As per %s configuration for %s, retrying title for %s in reattempt %s/%s.", config_key, netloc, url, reattempt, max_reattempts)
+                title = await self._title_inner(url)
+                if original_title != title:
+                    log.info(
+                        'As per %s configuration for %s, substituted title "%s" with "%s" in reattempt %s/%s.', config_key, netloc, original_title, title, reattempt, max_reattempts
+                    )
+                    if not title_search_pattern.search(title):
+                        break
+
+        return self._substitute_title(url, title)
+
+    def close(self) -> None:
+        """Cancel any revalidations, stop watching any override files, terminate the PDF title processes, and close any owned title cache.
+
+        Use `aclose` instead to let any running revalidations finish.
+        """
+        self._closed = True
+        for revalidation in self._revalidations.values():
+            revalidation.cancel()
+        self._running_revalidations.clear()
+        super().close()
+
+    async def aclose(self) -> None:
+        """Cancel any pending revalidations, wait for any running ones, and then close as by `close`."""
+        self._closed = True
+        revalidations = list(self._revalidations.items())
+        for key, revalidation in revalidations:
+            if key not in self._running_revalidations:
+                revalidation.cancel()
+        await asyncio.gather(*(revalidation for _, revalidation in revalidations), return_exceptions=True)  # The running ones use the PDF title processes and the title cache.
+        self.close()
+
+    async def title(self, url: str, *, timeout: Optional[float] = None) -> str:
+        """Return the title for the given URL.
+
+        If a timeout in seconds is given, it bounds the total time of all requests, reads, retries and redirects, and
+        `URLTitleTimeoutError` is raised once it is exceeded.
+        """
+        with self._traced(url) as trace, _deadline(url, timeout):
+            try:
+                title = await asyncio.wait_for(self._title_outer(url), timeout)  # Also bounds any work between reads.
+            except asyncio.TimeoutError as exc:
+                raise URLTitleTimeoutError(f"Failed to read title of URL {url} within the timeout of {timeout}s.") from exc
+            trace.end(title=title)
+        log.info("Returning title %r for URL %s", title, url)
+        return title
+
+    async def titles(self, urls: Iterable[str], *, concurrency: int = config.DEFAULT_CONCURRENCY, timeout: Optional[float] = None) -> List[Union[str, URLTitleError]]:
+        """Return the titles for the given URLs in their order, with an error in place of each title that failed.
+
+        Up to the given number of titles are read concurrently. Duplicate URLs are read only once. Any timeout in seconds
+        applies to each title separately from when its read starts.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        urls = list(urls)
+
+        async def title(url: str) -> Union[str, URLTitleError]:
+            async with semaphore:
+                try:
+                    return await self.title(url, timeout=timeout)
+                except URLTitleError as exc:
+                    return exc
+
+        unique_urls = {self._canonical_url(url): url for url in reversed(urls)}  # Keeps the first of any duplicates.
+        titles = dict(zip(unique_urls, await asyncio.gather(*(title(url) for url in unique_urls.values()))))
+        return [titles[self._canonical_url(url)] for url in urls]
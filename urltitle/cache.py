@@ -0,0 +1,394 @@
+"""Title caches."""
+import abc
+import logging
+import sqlite3
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from pathlib import Path
+from typing import Any, Callable, Generic, NamedTuple, Optional, Tuple, TypeVar, Union
+
+from cachetools import LRUCache
+
+from . import config
+
+log = logging.getLogger(__name__)
+
+_SHARED_TITLE_CACHE_ERRORS = (EOFError, OSError)
+
+_V = TypeVar("_V")
+
+
+class _ExpiringLRUCache(Generic[_V]):
+    """Thread-safe in-memory LRU cache whose entries expire after their own TTL in seconds."""
+
+    def __init__(self, *, max_size: int):
+        self._cache: LRUCache = LRUCache(maxsize=max_size)  # Values are (expiry, value).
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[_V]:
+        """Return the value for the given key if it is cached, otherwise None."""
+        with self._lock:
+            entry: Optional[Tuple[float, _V]] = self._cache.get(key)
+            if entry is None:
+                return None
+            expiry, value = entry
+            if expiry <= time.monotonic():
+                del self._cache[key]
+                return None
+            return value
+
+    def set(self, key: str, value: _V, ttl: float) -> None:
+        """Cache the value for the given key for the given TTL."""
+        expiry = time.monotonic() + ttl
+        with self._lock:
+            self._cache[key] = expiry, value
+
+    def delete(self, key: str) -> None:
+        """Delete the value for the given key if it is cached."""
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def delete_matching(self, predicate: Callable[[str], bool]) -> int:
+        """Delete the values whose keys match the given predicate, returning their number."""
+        with self._lock:
+            keys = [key for key in self._cache if predicate(key)]
+            for key in keys:
+                del self._cache[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        """Delete all values."""
+        with self._lock:
+            self._cache.clear()
+
+
+class TitleValidators(NamedTuple):
+    """Validators of the response from which a title was read, which are used to revalidate the title once it is stale.
+
+    `offset` is the amount of the content of the response which was read to find the title, if known.
+    """
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    offset: Optional[int] = None
+
+
+class CachedTitle(NamedTuple):
+    """Cached title with its validators. It is stale once its TTL has expired."""
+
+    title: str
+    validators: TitleValidators = TitleValidators()
+    is_stale: bool = False
+
+
+class TitleCache(abc.ABC):
+    """Abstract title cache.
+
+    Each entry expires after its TTL in seconds, which defaults to the TTL of the cache. Entries may additionally be
+    evicted at any time, such as to limit the size of the cache. A cache may keep an expired entry as stale for a while,
+    in which case it is returned only by `get_entry`. All methods must be thread-safe.
+    """
+
+    def __init__(self, *, ttl: float):
+        self.ttl = ttl
+
+    @abc.abstractmethod
+    def get(self, url: str) -> Optional[str]:
+        """Return the title for the given URL if it is cached, otherwise None."""
+
+    @abc.abstractmethod
+    def set(self, url: str, title: str, ttl: Optional[float] = None) -> None:
+        """Cache the title for the given URL."""
+
+    @abc.abstractmethod
+    def delete(self, url: str) -> None:
+        """Delete the title for the given URL if it is cached."""
+
+    def get_entry(self, url: str) -> Optional[CachedTitle]:
+        """Return the title for the given URL with its validators if it is cached, including if it is stale, otherwise None.
+
+        This default implementation returns only a title which is not stale, and is to be overridden by a cache that keeps
+        stale titles or validators.
+        """
+        title = self.get(url)
+        return None if title is None else CachedTitle(title)
+
+    def set_entry(self, url: str, title: str, validators: TitleValidators, ttl: Optional[float] = None) -> None:  # pylint: disable=unused-argument
+        """Cache the title for the given URL with its validators.
+
+        This default implementation discards the validators, and is to be overridden by a cache that can store them.
+        """
+        self.set(url, title, ttl)
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        """Delete all titles."""
+
+    def delete_matching(self, predicate: Callable[[str], bool]) -> None:  # pylint: disable=unused-argument
+        """Delete the titles for the URLs which match the given predicate.
+
+        The predicate must be picklable for a cache which is not in the process. This default implementation deletes all
+        titles, and is to be overridden by a cache that can select its titles.
+        """
+        self.clear()
+
+    def close(self) -> None:
+        """Release any resources used by the cache."""
+
+
+class MemoryTitleCache(TitleCache):
+    """In-memory title cache of a process.
+
+    Once there are more than the given max size of entries, the least recently used entries are evicted. An expired entry
+    is kept as stale for a further `stale_ttl` seconds.
+    """
+
+    def __init__(self, *, max_size: int, ttl: float, stale_ttl: float = config.DEFAULT_CACHE_STALE_TTL):
+        super().__init__(ttl=ttl)
+        self.max_size = max_size
+        self.stale_ttl = stale_ttl
+        self._cache: _ExpiringLRUCache[Tuple[float, str, TitleValidators]] = _ExpiringLRUCache(max_size=max_size)  # Values are (expiry, title, validators).
+
+    def get(self, url: str) -> Optional[str]:
+        """Return the title for the given URL if it is cached, otherwise None."""
+        entry = self.get_entry(url)
+        return None if (entry is None) or entry.is_stale else entry.title
+
+    def set(self, url: str, title: str, ttl: Optional[float] = None) -> None:
+        """Cache the title for the given URL."""
+        self.set_entry(url, title, TitleValidators(), ttl)
+
+    def get_entry(self, url: str) -> Optional[CachedTitle]:
+        """Return the title for the given URL with its validators if it is cached, including if it is stale, otherwise None."""
+        value = self._cache.get(url)
+        if value is None:
+            return None
+        expiry, title, validators = value
+        return CachedTitle(title, validators, expiry <= time.monotonic())
+
+    def set_entry(self, url: str, title: str, validators: TitleValidators, ttl: Optional[float] = None) -> None:
+        """Cache the title for the given URL with its validators."""
+        ttl = self.ttl if ttl is None else ttl
+        self._cache.set(url, (time.monotonic() + ttl, title, validators), ttl + self.stale_ttl)
+
+    def delete(self, url: str) -> None:
+        """Delete the title for the given URL if it is cached."""
+        self._cache.delete(url)
+
+    def delete_matching(self, predicate: Callable[[str], bool]) -> None:
+        """Delete the titles for the URLs which match the given predicate."""
+        self._cache.delete_matching(predicate)
+
+    def clear(self) -> None:
+        """Delete all titles."""
+        self._cache.clear()
+
+
+class SQLiteTitleCache(TitleCache):
+    """Persistent title cache stored in a SQLite database file.
+
+    An expired entry is kept as stale for a further `stale_ttl` seconds. Once there are more than the given max size of
+    entries, the entries which are no longer kept as stale are deleted, followed if necessary by the entries closest to
+    expiring. The database uses write-ahead logging so that it can be shared by multiple processes on a host.
+    """
+
+    def __init__(self, path: Union[str, Path], *, max_size: int, ttl: float, stale_ttl: float = config.DEFAULT_CACHE_STALE_TTL):
+        super().__init__(ttl=ttl)
+        self.path = Path(path).expanduser()
+        self.max_size = max_size
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._num_sets_to_eviction = 0
+        self._eviction_interval = max(1, max_size // 16)  # Number of sets between checks of the size.
+        self._connection = sqlite3.connect(str(self.path), timeout=config.SQLITE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS titles (url TEXT PRIMARY KEY, title TEXT NOT NULL, expiry REAL NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS titles_expiry ON titles (expiry)")
+            self._add_validator_columns()
+            self._evict()
+        log.debug("Using title cache %s with max size %s and TTL %ss.", self.path, max_size, ttl)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM titles WHERE expiry > ?", (time.time(),)).fetchone()[0]
+
+    def _add_validator_columns(self) -> None:
+        # Note: The lock must be held by the caller. The columns are missing from a database created by an older version.
+        with self._connection:  # Transaction
+            self._connection.execute("BEGIN IMMEDIATE")
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(titles)")}
+            for column, type_ in (("etag", "TEXT"), ("last_modified", "TEXT"), ("title_offset", "INTEGER")):
+                if column not in columns:
+                    self._connection.execute(f"ALTER TABLE titles ADD COLUMN {column} {type_}")
+
+    def _evict(self) -> None:
+        # Note: The lock must be held by the caller.
+        self._num_sets_to_eviction = self._eviction_interval
+        with self._connection:  # Transaction
+            self._connection.execute("BEGIN IMMEDIATE")
+            num_deleted = self._connection.execute("DELETE FROM titles WHERE expiry <= ?", (time.time() - self.stale_ttl,)).rowcount
+            num_excess = self._connection.execute("SELECT COUNT(*) FROM titles").fetchone()[0] - self.max_size
+            if num_excess > 0:
+                num_deleted += self._connection.execute("DELETE FROM titles WHERE url IN (SELECT url FROM titles ORDER BY expiry LIMIT ?)", (num_excess,)).rowcount
+        if num_deleted:
+            log.debug("Evicted %s entries from title cache %s.", num_deleted, self.path)
+
+    def get(self, url: str) -> Optional[str]:
+        """Return the title for the given URL if it is cached, otherwise None."""
+        with self._lock:
+            row = self._connection.execute("SELECT title FROM titles WHERE url = ? AND expiry > ?", (url, time.time())).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, url: str, title: str, ttl: Optional[float] = None) -> None:
+        """Cache the title for the given URL."""
+        self.set_entry(url, title, TitleValidators(), ttl)
+
+    def get_entry(self, url: str) -> Optional[CachedTitle]:
+        """Return the title for the given URL with its validators if it is cached, including if it is stale, otherwise None."""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT title, expiry, etag, last_modified, title_offset FROM titles WHERE url = ? AND expiry > ?", (url, now - self.stale_ttl)
+            ).fetchone()
+        if row is None:
+            return None
+        title, expiry, *validators = row
+        return CachedTitle(title, TitleValidators(*validators), expiry <= now)
+
+    def set_entry(self, url: str, title: str, validators: TitleValidators, ttl: Optional[float] = None) -> None:
+        """Cache the title for the given URL with its validators."""
+        expiry = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO titles (url, title, expiry, etag, last_modified, title_offset) VALUES (?, ?, ?, ?, ?, ?)", (url, title, expiry, *validators)
+            )
+            self._num_sets_to_eviction -= 1
+            if self._num_sets_to_eviction <= 0:
+                self._evict()
+
+    def delete(self, url: str) -> None:
+        """Delete the title for the given URL if it is cached."""
+        with self._lock:
+            self._connection.execute("DELETE FROM titles WHERE url = ?", (url,))
+
+    def delete_matching(self, predicate: Callable[[str], bool]) -> None:
+        """Delete the titles for the URLs which match the given predicate."""
+        with self._lock:
+            self._connection.create_function("urltitle_matches", 1, lambda url: bool(predicate(url)))
+            num_deleted = self._connection.execute("DELETE FROM titles WHERE urltitle_matches(url)").rowcount
+            self._connection.create_function("urltitle_matches", 1, None)
+        log.debug("Deleted %s matching entries from title cache %s.", num_deleted, self.path)
+
+    def clear(self) -> None:
+        """Delete all titles."""
+        with self._lock:
+            self._connection.execute("DELETE FROM titles")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+_served_title_cache: Optional[MemoryTitleCache] = None  # pylint: disable=invalid-name  # Used only by the server of SharedTitleCache.
+
+
+def _init_served_title_cache(max_size: int, ttl: float, stale_ttl: float) -> None:
+    global _served_title_cache  # pylint: disable=global-statement
+    _served_title_cache = MemoryTitleCache(max_size=max_size, ttl=ttl, stale_ttl=stale_ttl)
+
+
+def _get_served_title_cache() -> MemoryTitleCache:
+    assert _served_title_cache is not None
+    return _served_title_cache
+
+
+class _TitleCacheManager(BaseManager):
+    pass
+
+
+_TitleCacheManager.register("title_cache", callable=_get_served_title_cache, exposed=("get", "set", "get_entry", "set_entry", "delete", "delete_matching", "clear"))
+
+
+class SharedTitleCache(TitleCache):
+    """Title cache shared by multiple processes on a host.
+
+    The cache is held in memory by a server process which is started using `SharedTitleCache.start_server`. Each process
+    then connects to it at the same address, such as a Unix socket path, using the same authentication key. If the server
+    cannot be reached, the error is logged, and the operation is treated as a cache miss.
+    """
+
+    def __init__(self, address: Any, *, authkey: bytes, ttl: float = config.DEFAULT_CACHE_TTL):
+        super().__init__(ttl=ttl)
+        self.address = address
+        manager = _TitleCacheManager(address=address, authkey=authkey)
+        manager.connect()
+        self._proxy: Any = manager.title_cache()  # type: ignore  # pylint: disable=no-member
+        log.debug("Connected to shared title cache at %s.", address)
+
+    @staticmethod
+    def start_server(
+        address: Any, *, authkey: bytes, max_size: int = config.DEFAULT_CACHE_MAX_SIZE, ttl: float = config.DEFAULT_CACHE_TTL, stale_ttl: float = config.DEFAULT_CACHE_STALE_TTL
+    ) -> BaseManager:
+        """Start and return a server process for the cache at the given address.
+
+        The server process can be stopped using the `shutdown` method of the returned manager.
+        """
+        manager = _TitleCacheManager(address=address, authkey=authkey)
+        manager.start(_init_served_title_cache, (max_size, ttl, stale_ttl))  # pylint: disable=consider-using-with
+        log.info("Started shared title cache server at %s with max size %s and TTL %ss.", manager.address, max_size, ttl)
+        return manager
+
+    def get(self, url: str) -> Optional[str]:
+        """Return the title for the given URL if it is cached, otherwise None."""
+        try:
+            return self._proxy.get(url)
+        except _SHARED_TITLE_CACHE_ERRORS as exc:
+            log.warning("Failed to get title for URL %s from shared title cache at %s. %s", url, self.address, exc)
+            return None
+
+    def set(self, url: str, title: str, ttl: Optional[float] = None) -> None:
+        """Cache the title for the given URL."""
+        try:
+            self._proxy.set(url, title, self.ttl if ttl is None else ttl)
+        except _SHARED_TITLE_CACHE_ERRORS as exc:
+            log.warning("Failed to set title for URL %s in shared title cache at %s. %s", url, self.address, exc)
+
+    def get_entry(self, url: str) -> Optional[CachedTitle]:
+        """Return the title for the given URL with its validators if it is cached, including if it is stale, otherwise None."""
+        try:
+            return self._proxy.get_entry(url)
+        except _SHARED_TITLE_CACHE_ERRORS as exc:
+            log.warning("Failed to get title for URL %s from shared title cache at %s. %s", url, self.address, exc)
+            return None
+
+    def set_entry(self, url: str, title: str, validators: TitleValidators, ttl: Optional[float] = None) -> None:
+        """Cache the title for the given URL with its validators."""
+        try:
+            self._proxy.set_entry(url, title, validators, self.ttl if ttl is None else ttl)
+        except _SHARED_TITLE_CACHE_ERRORS as exc:
+            log.warning("Failed to set title for URL %s in shared title cache at %s. %s", url, self.address, exc)
+
+    def delete(self, url: str) -> None:
+        """Delete the title for the given URL if it is cached."""
+        try:
+            self._proxy.delete(url)
+        except _SHARED_TITLE_CACHE_ERRORS as exc:
+            log.warning("Failed to delete title for URL %s from shared title cache at %s. %s", url, self.address, exc)
+
+    def delete_matching(self, predicate: Callable[[str], bool]) -> None:
+        """Delete the titles for the URLs which match the given picklable predicate."""
+        try:
+            self._proxy.delete_matching(predicate)
+        except _SHARED_TITLE_CACHE_ERRORS as exc:
+            log.warning("Failed to delete matching titles from shared title cache at %s. %s", self.address, exc)
+
+    def clear(self) -> None:
+        """Delete all titles."""
+        try:
+            self._proxy.clear()
+        except _SHARED_TITLE_CACHE_ERRORS as exc:
+            log.warning("Failed to clear shared title cache at %s. %s", self.address, exc)
@@ -0,0 +1,64 @@
+"""Canonicalization of URLs into the keys of their cached titles."""
+import re
+from typing import Collection, Iterable, Match
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from . import config
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_PERCENT_ENCODING_PATTERN = re.compile(r"%[0-9A-Fa-f]{2}")
+_UNRESERVED_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+
+def _normalize_percent_encoding(match: Match) -> str:
+    char = chr(int(match[0][1:], 16))
+    return char if char in _UNRESERVED_CHARS else match[0].upper()
+
+
+class URLCanonicalizer:
+    """Canonicalizer of URLs into the keys of their cached titles, such that equivalent URLs have the same key.
+
+    The scheme and host are lowercased, and the host is stripped of any www prefix if `strip_www` is set. A default port,
+    the fragment, and any query parameter which is a tracking parameter are removed. A tracking parameter is one whose
+    name is in `tracking_params`, or which starts with the prefix of a name therein which ends with `*`. The remaining
+    query parameters are sorted by name, and the percent-encoding of the path and query is normalized. An empty path is
+    replaced by `/`. A URL without a scheme remains without one.
+    """
+
+    def __init__(self, *, tracking_params: Iterable[str] = config.TRACKING_QUERY_PARAMS, strip_www: bool = config.URL_CANONICAL_STRIP_WWW):
+        tracking_params = frozenset(tracking_params)
+        self._tracking_names = frozenset(name for name in tracking_params if not name.endswith("*"))
+        self._tracking_prefixes = tuple(name[:-1] for name in tracking_params if name.endswith("*"))
+        self._strip_www = strip_www
+
+    def is_tracking_param(self, name: str) -> bool:
+        """Return whether the query parameter with the given name is a tracking parameter."""
+        return (name in self._tracking_names) or name.startswith(self._tracking_prefixes)
+
+    def __call__(self, url: str, *, kept_params: Collection[str] = ()) -> str:
+        """Return the canonical form of the URL, keeping any of the given query parameters even if they are tracking parameters."""
+        url = url.strip()
+        split_result = urlsplit(url)
+        if not split_result.scheme:
+            split_result = urlsplit(f"//{url}")
+        scheme = split_result.scheme.casefold()
+
+        host = (split_result.hostname or "").rstrip(".")
+        if self._strip_www and host.startswith("www."):
+            host = host[4:]
+        if ":" in host:
+            host = f"[{host}]"  # IPv6
+        try:
+            port = split_result.port
+        except ValueError:  # The port is invalid.
+            return url
+        if (port is not None) and (port != _DEFAULT_PORTS.get(scheme)):
+            host = f"{host}:{port}"
+        userinfo, has_userinfo, _ = split_result.netloc.rpartition("@")
+        netloc = f"{userinfo}@{host}" if has_userinfo else host
+
+        path = _PERCENT_ENCODING_PATTERN.sub(_normalize_percent_encoding, split_result.path) or ("/" if netloc else "")
+        params = [(name, value) for name, value in parse_qsl(split_result.query, keep_blank_values=True) if (name in kept_params) or not self.is_tracking_param(name)]
+        query = urlencode(sorted(params, key=lambda param: param[0]))  # The sort is stable for repeated names.
+        canonical_url = urlunsplit((scheme, netloc, path, query, ""))
+        return canonical_url if scheme else canonical_url[2:]  # Strips the // of a URL without a scheme.
@@ -0,0 +1,131 @@
+"""Circuit breakers of the requests made to each netloc."""
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, NamedTuple, Optional, Tuple, cast
+
+from cachetools import LRUCache
+
+from . import config
+
+log = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitStats(NamedTuple):
+    """Statistics of the circuit of a netloc.
+
+    The error rate and the median latency in seconds are those of the recent requests which are kept for it.
+    """
+
+    state: str
+    num_samples: int
+    error_rate: float
+    latency: Optional[float]
+
+
+class _Circuit:
+    def __init__(self, window: int):
+        self.samples: Deque[Tuple[bool, float]] = deque(maxlen=window)  # Whether each request failed, and its latency.
+        self.state = CLOSED
+        self.open_time = 0.0
+        self.probe_time: Optional[float] = None
+
+    @property
+    def error_rate(self) -> float:
+        """Return the fraction of the samples which are errors."""
+        return (sum(is_error for is_error, _ in self.samples) / len(self.samples)) if self.samples else 0.0
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Return the median latency of the samples."""
+        return statistics.median(latency for _, latency in self.samples) if self.samples else None
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breakers of the requests made to each netloc.
+
+    The circuit of a netloc opens once at least `min_samples` of its most recent `window` requests are kept, and either
+    their error rate reaches `max_error_rate` or their median latency in seconds reaches `max_latency`. Its requests are
+    then rejected for `open_duration` seconds, after which it is half-open and a single probe request is allowed. The
+    circuit closes if the probe succeeds, and opens again otherwise. If the outcome of the probe is not recorded within
+    `open_duration` seconds, another probe is allowed. Up to `max_keys` of the most recently used circuits are kept.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        window: int = config.CIRCUIT_WINDOW,
+        min_samples: int = config.CIRCUIT_MIN_SAMPLES,
+        max_error_rate: float = config.CIRCUIT_MAX_ERROR_RATE,
+        max_latency: float = config.CIRCUIT_MAX_LATENCY,
+        open_duration: float = config.CIRCUIT_OPEN_DURATION,
+        max_keys: int = config.CIRCUIT_MAX_KEYS,
+    ):
+        self._window = window
+        self._min_samples = min_samples
+        self._max_error_rate = max_error_rate
+        self._max_latency = max_latency
+        self._open_duration = open_duration
+        self._circuits: LRUCache[str, _Circuit] = LRUCache(maxsize=max_keys)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._circuits)
+
+    def allow(self, netloc: str) -> bool:
+        """Return whether a request to the netloc is allowed now.
+
+        If its circuit is half-open, the request which is allowed is the probe, and its outcome must be recorded.
+        """
+        with self._lock:
+            circuit = self._circuits.get(netloc)
+            if (circuit is None) or (circuit.state == CLOSED):
+                return True
+            now = time.monotonic()
+            if circuit.state == OPEN:
+                if (now - circuit.open_time) < self._open_duration:
+                    return False
+                circuit.state = HALF_OPEN
+                log.info("Circuit for %s is half-open. A probe request is allowed.", netloc)
+            elif (circuit.probe_time is not None) and ((now - circuit.probe_time) < self._open_duration):
+                return False
+            circuit.probe_time = now
+            return True
+
+    def record(self, netloc: str, *, is_error: bool, latency: float) -> None:
+        """Record the outcome of a request to the netloc with its latency in seconds."""
+        with self._lock:
+            circuit = self._circuits.get(netloc)
+            if circuit is None:
+                circuit = self._circuits[netloc] = _Circuit(self._window)
+            if circuit.state == HALF_OPEN:
+                circuit.probe_time = None
+                if is_error:
+                    self._open(netloc, circuit, "its probe request failed")
+                else:
+                    circuit.state = CLOSED
+                    circuit.samples.clear()
+                    log.info("Circuit for %s is closed because its probe request succeeded.", netloc)
+                return
+            circuit.samples.append((is_error, latency))
+            if (circuit.state == CLOSED) and (len(circuit.samples) >= self._min_samples):
+                error_rate, median_latency = circuit.error_rate, cast(float, circuit.latency)
+                if error_rate >= self._max_error_rate:
+                    self._open(netloc, circuit, f"the error rate of its recent requests is {error_rate:.0%}")
+                elif median_latency >= self._max_latency:
+                    self._open(netloc, circuit, f"the median latency of its recent requests is {median_latency:.1f}s")
+
+    def _open(self, netloc: str, circuit: _Circuit, reason: str) -> None:
+        # Note: The lock must be held by the caller.
+        circuit.state = OPEN
+        circuit.open_time = time.monotonic()
+        log.warning("Circuit for %s is open for %ss because %s.", netloc, self._open_duration, reason)
+
+    def stats(self) -> Dict[str, CircuitStats]:
+        """Return the statistics of each netloc."""
+        with self._lock:
+            return {netloc: CircuitStats(circuit.state, len(circuit.samples), circuit.error_rate, circuit.latency) for netloc, circuit in self._circuits.items()}
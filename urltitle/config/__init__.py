@@ -2,7 +2,7 @@
 import datetime
 import logging.config
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from .overrides import NETLOC_OVERRIDES
 
@@ -18,26 +18,93 @@ KiB = 1024
 MiB = KiB ** 2
 
 DEFAULT_CACHE_TTL = datetime.timedelta(weeks=1).total_seconds()
+DEFAULT_CACHE_STALE_TTL = datetime.timedelta(weeks=1).total_seconds()  # Seconds for which an expired title is kept as stale, and is returned while it is revalidated.
 DEFAULT_CACHE_MAX_SIZE = 4 * KiB
+DEFAULT_CONCURRENCY = 32  # Max number of titles read concurrently in a batch.
+DEFAULT_PER_HOST_CONCURRENCY = 4  # Max number of titles read concurrently per netloc in a batch.
 DEFAULT_REQUEST_SIZE = 16 * KiB  # Note: 8 KiB causes more undesirable matches of og:title over head.title.
+ERROR_CACHE_MAX_SIZE = 4 * KiB
+ERROR_CACHE_TTLS: Dict[str, float] = {  # Keys are URLTitleError categories.
+    "disconnected": datetime.timedelta(minutes=1).total_seconds(),
+    "other": datetime.timedelta(minutes=10).total_seconds(),
+    "timeout": datetime.timedelta(minutes=1).total_seconds(),
+    "unavailable": datetime.timedelta(seconds=10).total_seconds(),
+    "unrecoverable": datetime.timedelta(days=1).total_seconds(),
+}
 GOOGLE_WEBCACHE_URL_PREFIX = "https://webcache.googleusercontent.com/search?q=cache:"
+CIRCUIT_MAX_ERROR_RATE = 0.5  # Error rate of the recent requests to a netloc at which its circuit opens.
+CIRCUIT_MAX_KEYS = 4 * KiB  # Max number of netlocs for which circuits are kept.
+CIRCUIT_MAX_LATENCY = 10  # Seconds of median latency of the recent requests to a netloc at which its circuit opens.
+CIRCUIT_MIN_SAMPLES = 5  # Min number of recent requests to a netloc for its circuit to open.
+CIRCUIT_OPEN_DURATION = 30  # Seconds for which the requests to a netloc are rejected once its circuit opens.
+CIRCUIT_WINDOW = 20  # Max number of the most recent requests to a netloc which are kept for its circuit.
+CONNECTION_POOL_IDLE_TIMEOUT = 30  # Seconds for which an idle persistent connection is kept.
+CONNECTION_POOL_MAX_ACTIVE_PER_HOST = 16  # Further requests to the host wait for a connection to be released.
+#   Note: This is twice MAX_IN_FLIGHT_PER_HOST, as a title can use two connections at once, such as for PDF byte ranges.
+CONNECTION_POOL_MAX_DRAIN_SIZE = 64 * KiB  # An unread response remainder up to this size is read to keep its connection.
+CONNECTION_POOL_MAX_IDLE_PER_HOST = 4
 CONTENT_TYPE_PREFIXES: Dict[str, Any] = {
     "html": ("text/html", "*/*"),  # Nature.com EPDFs are HTML but use */*
     "ipynb": "text/plain",
     "pdf": "application/pdf",
 }  # Values must be lowercase.
+IPYNB_READ_SIZE = 64 * KiB  # Amount of IPYNB content read in each iteration until its title is found.
+MAX_IN_FLIGHT_PER_HOST = 8  # Max number of concurrent requests of a reader per netloc. Further requests wait for a slot.
 MAX_REQUEST_ATTEMPTS = 3
-MAX_REQUEST_SIZES: Dict[str, int] = {"html": MiB, "ipynb": 8 * MiB, "pdf": 8 * MiB}  # Title observed toward the bottom.
+MAX_REQUEST_SIZES: Dict[str, int] = {"html": MiB, "pdf": 8 * MiB}  # Title observed toward the bottom.
 #   Note: Amazon product links, for example, have the title between 512K and 1M in the HTML content.
+MAX_TITLE_SEARCH_REATTEMPTS = 10
+METRICS_DURATION_BUCKETS = 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30  # Seconds.
+METRICS_MAX_NETLOCS = 1000  # Netlocs beyond these many are aggregated as one in the reader metrics.
+OVERRIDES_POLL_INTERVAL = 5  # Seconds between checks of a watched override file or directory for changes.
 PACKAGE_NAME = Path(__file__).parent.parent.stem
+PDF_RANGE_MAX_READS = 16  # Max number of byte ranges read for the title metadata of a PDF.
+PDF_RANGE_MIN_CONTENT_LEN = 256 * KiB  # A PDF at least this large is read using byte ranges if its server supports them.
+PDF_RANGE_READ_SIZE = 16 * KiB  # Min size of each byte range read for the title metadata of a PDF.
+PDF_TITLE_MAX_TASKS_PER_PROCESS = 100  # A PDF title process is replaced after this many tasks.
+PDF_TITLE_PROCESSES = 2
+PDF_TITLE_TIMEOUT = 30  # Seconds after which the PDF title processes are terminated if a task is incomplete.
+READ_SIZE_DECAY = 0.8  # Weight of each observed read size of a netloc relative to the next newer one in its estimate.
+READ_SIZE_MAX_KEYS = 4 * KiB  # Max number of netlocs and path prefixes for which read sizes are estimated.
+READ_SIZE_MAX_SAMPLES = 16  # Max number of the most recent read sizes kept per netloc or path prefix.
+READ_SIZE_MIN_PATH_SAMPLES = 3  # Min number of read sizes of a path prefix for its estimate to be used over that of its netloc.
+READ_SIZE_PERCENTILE = 0.9  # Weighted percentile of the observed read sizes of a netloc which is its estimated read size.
+REDIRECT_CACHE_MAX_SIZE = 4 * KiB  # Max number of redirects of URLs to their targets which are cached.
+REDIRECT_CACHE_TTL = datetime.timedelta(days=1).total_seconds()
+REQUEST_BACKOFF_BASE = 0.5  # Seconds of the upper bound of the jittered delay before the second attempt of a request. It doubles for each further attempt.
+REQUEST_BACKOFF_MAX = 4  # Seconds of the max upper bound of the jittered delay before an attempt of a request.
 REQUEST_TIMEOUT = 15
+REVALIDATION_MAX_WORKERS = 4  # Max number of threads of a reader which revalidate stale titles in the background.
+SQLITE_BUSY_TIMEOUT = 10  # Seconds for which a locked title cache database is waited for.
 STRAINERS: Dict[str, Dict[str, Any]] = {
     "title": {"name": "title", "attr": "text"},
     "og:title": {"name": "meta", "kwargs": {"property": "og:title"}},
     "twitter:title": {"name": "meta", "kwargs": {"attrs": {"name": "twitter:title"}}},
 }
+TRACKING_QUERY_PARAMS = (  # Query parameters which are removed from the cache key of a URL. A trailing * matches any suffix.
+    "_hsenc",
+    "_hsmi",
+    "dclid",
+    "fbclid",
+    "gbraid",
+    "gclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "mkt_tok",
+    "msclkid",
+    "ref_src",
+    "ref_url",
+    "utm_*",
+    "wbraid",
+    "yclid",
+)
 UNRECOVERABLE_HTTP_CODES = 400, 401, 404
+URL_CANONICAL_STRIP_WWW = True  # Whether the www prefix of a host is removed from the cache key of a URL, as it is for its site.
 URL_SCHEME_GUESSES = "https", "http"
+URL_SCHEME_RACE_MAX_WORKERS = 8  # Max number of threads of a reader which read the titles of scheme guesses, including of those which lost their race.
+URL_SCHEME_RACE_GRACE = 0.5  # Seconds for which the title of a scheme guess waits for a pending preferred scheme guess to succeed.
+URL_SCHEME_RACE_STAGGER: Optional[float] = 0.25  # Seconds after which the next scheme guess is started while the previous are pending. None disables the race.
 USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64; rv:89.0) Gecko/20100101 Firefox/89.0"
 
 LOGGING = {  # Ref: https://docs.python.org/3/howto/logging.html#configuring-logging
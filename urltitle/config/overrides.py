@@ -1,6 +1,9 @@
 """Site-specific overrides.
 
-These are keyed without the www prefix. The keyed sites must be in lowercase.
+These are keyed without the www prefix. The keyed sites must be in lowercase. A site prefixed by `*.` is a wildcard which
+matches any subdomain of the rest of it. The overrides of an exact site take precedence over those of any wildcard site, and
+those of a longer wildcard site take precedence over those of a shorter one. The overrides are validated and compiled when a
+reader is created, and again when its `reload_overrides` method is called.
 """
 from typing import Any, Dict
 
@@ -69,4 +72,4 @@ NETLOC_OVERRIDES: Dict[str, Dict[str, Any]] = {
         # "title_search:url_subs": {r"^YouTube$": [(r"^https://(?P<url>.+)$", r"http://\g<url>")]},
     },
 }
-NETLOC_OVERRIDES["m.youtube.com"] = NETLOC_OVERRIDES["youtu.be"] = NETLOC_OVERRIDES["youtube.com"]
+NETLOC_OVERRIDES["*.youtube.com"] = NETLOC_OVERRIDES["youtu.be"] = NETLOC_OVERRIDES["youtube.com"]
@@ -0,0 +1,55 @@
+"""Deadlines of titles."""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from socket import timeout as SocketTimeoutError
+from typing import Iterator, Optional
+
+from . import config
+from .errors import URLTitleError, URLTitleTimeoutError
+
+_DEADLINE: ContextVar[Optional[float]] = ContextVar("_DEADLINE", default=None)  # Monotonic time by which the current title is due.
+
+
+def _remaining_time(url: str) -> Optional[float]:
+    # Returns: Seconds remaining until the deadline of the current title, or otherwise None if it has no deadline.
+    # Can raise: URLTitleTimeoutError
+    deadline = _DEADLINE.get()
+    if deadline is None:
+        return None
+    remaining_time = deadline - time.monotonic()
+    if remaining_time <= 0:
+        raise URLTitleTimeoutError(f"Ran out of time for title of URL {url}.")
+    return remaining_time
+
+
+def _request_timeout(url: str) -> float:
+    # Returns: Socket timeout for the next request or read, which is shortened to the remaining time of any deadline.
+    # Can raise: URLTitleTimeoutError
+    remaining_time = _remaining_time(url)
+    return config.REQUEST_TIMEOUT if (remaining_time is None) else min(config.REQUEST_TIMEOUT, remaining_time)
+
+
+def _is_past_deadline() -> bool:
+    deadline = _DEADLINE.get()
+    return (deadline is not None) and (time.monotonic() >= deadline)
+
+
+@contextmanager
+def _deadline(url: str, timeout: Optional[float]) -> Iterator[None]:
+    # Note: The deadline is current for the duration of the context. A nested deadline cannot extend an outer one.
+    # Can raise: URLTitleTimeoutError
+    if timeout is None:
+        yield
+        return
+    outer_deadline = _DEADLINE.get()
+    deadline = time.monotonic() + timeout
+    token = _DEADLINE.set(deadline if (outer_deadline is None) else min(deadline, outer_deadline))
+    try:
+        yield
+    except (URLTitleError, SocketTimeoutError, TimeoutError) as exc:  # TimeoutError is raised by SingleFlight.
+        if isinstance(exc, URLTitleTimeoutError) or not _is_past_deadline():
+            raise
+        raise URLTitleTimeoutError(f"Failed to read title of URL {url} within the timeout of {timeout}s. {exc}") from exc
+    finally:
+        _DEADLINE.reset(token)
@@ -0,0 +1,39 @@
+"""URL title exceptions."""
+import logging
+from http.client import RemoteDisconnected
+from socket import timeout as SocketTimeoutError
+from urllib.error import URLError
+
+log = logging.getLogger(__name__)
+
+
+class URLTitleError(Exception):
+    """URL title exception.
+
+    Its category is one of the keys of `config.ERROR_CACHE_TTLS`. It determines for how long the error is cached.
+    """
+
+    def __init__(self, msg: str, category: str = "other"):
+        log.error(msg)
+        super().__init__(msg)
+        self.category = category
+
+
+class URLTitleTimeoutError(URLTitleError):
+    """URL title exception for a title which was not read within its timeout.
+
+    It is not cached because the timeout is specific to the call.
+    """
+
+    def __init__(self, msg: str):
+        super().__init__(msg, "timeout")
+
+
+def _error_category(exc: Exception) -> str:
+    if isinstance(exc, URLError) and isinstance(exc.reason, Exception):
+        exc = exc.reason
+    if isinstance(exc, SocketTimeoutError):
+        return "timeout"
+    if isinstance(exc, RemoteDisconnected):
+        return "disconnected"
+    return "other"
@@ -0,0 +1,282 @@
+"""Compiled index of site-specific overrides, and a watcher of override files."""
+import copy
+import json
+import logging
+import re
+import sys
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Pattern, Tuple, Union
+
+from . import config
+from .util.urllib import url_netloc
+
+try:
+    if sys.version_info >= (3, 11):
+        import tomllib
+    else:
+        import tomli as tomllib
+except ImportError:  # Optional
+    TOML_AVAILABLE = False
+else:
+    TOML_AVAILABLE = True
+
+log = logging.getLogger(__name__)
+
+_OVERRIDES_FILE_SUFFIXES = (".json", ".toml")
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+_LABEL_PATTERN = re.compile(r"[a-z0-9_](?:[a-z0-9_\-]*[a-z0-9_])?|xn--[a-z0-9\-]+")
+
+
+def _compile_pattern(pattern: Any) -> Pattern:
+    if not isinstance(pattern, str):
+        raise TypeError(f"The pattern {pattern!r} is not a string.")
+    return re.compile(pattern)
+
+
+def _compile_subs(subs: Any) -> Tuple[Tuple[Pattern, str], ...]:
+    compiled_subs = []
+    for sub in subs:
+        pattern, replacement = sub
+        if not isinstance(replacement, str):
+            raise TypeError(f"The replacement {replacement!r} is not a string.")
+        compiled_subs.append((_compile_pattern(pattern), replacement))
+    return tuple(compiled_subs)
+
+
+def _compile_headers(headers: Any) -> Mapping[str, Union[str, int]]:
+    if not all(isinstance(name, str) and isinstance(value, (str, int)) for name, value in dict(headers).items()):
+        raise TypeError("A header name is not a string or a header value is not a string or an integer.")
+    return MappingProxyType(dict(headers))
+
+
+def _compile_names(names: Any) -> FrozenSet[str]:
+    if isinstance(names, str) or not all(isinstance(name, str) for name in names):
+        raise TypeError(f"The names {names!r} are not a list of strings.")
+    return frozenset(names)
+
+
+def _checked(type_: type) -> Callable[[Any], Any]:
+    def check(value: Any) -> Any:
+        if (not isinstance(value, type_)) or ((type_ is int) and isinstance(value, bool)):
+            raise TypeError(f"The value {value!r} is not of type {type_.__name__}.")
+        return value
+
+    return check
+
+
+def _check_strainer(strainer: Any) -> str:
+    if strainer not in config.STRAINERS:
+        raise ValueError(f"The strainer {strainer!r} is not one of {list(config.STRAINERS)}.")
+    return strainer
+
+
+def _check_request_size(size: Any) -> int:
+    if _checked(int)(size) <= 0:
+        raise ValueError(f"The request size {size} is not positive.")
+    return size
+
+
+_COMPILERS: Dict[str, Callable[[Any], Any]] = {
+    "default_request_size": _check_request_size,
+    "extra_headers": _compile_headers,
+    "google_webcache": _checked(bool),
+    "query_params:keep": _compile_names,
+    "selector": _checked(str),
+    "strainer": _check_strainer,
+    "substitute_url_with_title": _checked(bool),
+    "title_search:retry": _compile_pattern,
+    "title_subs": _compile_subs,
+    "url_subs": _compile_subs,
+    "user_agent": _checked(str),
+}
+
+
+def _compile_overrides(key: str, overrides: Mapping[str, Any]) -> Mapping[str, Any]:
+    # Can raise: ValueError
+    compiled_overrides = {}
+    for name, value in overrides.items():
+        compiler = _COMPILERS.get(name)
+        if compiler is None:
+            raise ValueError(f"The override {name!r} for {key!r} is not one of {sorted(_COMPILERS)}.")
+        try:
+            compiled_overrides[name] = compiler(value)
+        except (TypeError, ValueError, re.error) as exc:
+            raise ValueError(f"The override {name!r} for {key!r} is invalid. {exc.__class__.__qualname__}: {exc}") from None
+    return MappingProxyType(compiled_overrides)
+
+
+def _key_labels(key: str) -> Tuple[Tuple[str, ...], bool]:
+    # Can raise: ValueError
+    # Returns: Labels of the key in reverse order, and whether it is a wildcard key.
+    is_wildcard = key.startswith("*.")
+    labels = tuple(reversed((key[2:] if is_wildcard else key).split(".")))
+    if key.startswith("www.") or not all(_LABEL_PATTERN.fullmatch(label) for label in labels):
+        raise ValueError(f"The site {key!r} is not a lowercase netloc without a www prefix, optionally prefixed by '*.' as a wildcard.")
+    return labels, is_wildcard
+
+
+class _TrieNode:
+    __slots__ = ("children", "exact", "wildcard")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _TrieNode] = {}
+        self.exact: Optional[Mapping[str, Any]] = None  # For the netloc ending at this node.
+        self.wildcard: Optional[Mapping[str, Any]] = None  # For any subdomain of the netloc ending at this node.
+
+
+class NetlocOverrides:
+    """Immutable index of site-specific overrides, as validated and compiled from a mapping of sites to their overrides.
+
+    A site is a netloc as returned by the `netloc` method of a reader, or a netloc prefixed by `*.` which matches any of
+    its subdomains. The overrides of a netloc are those of its exact site if there is one, or otherwise those of its
+    longest matching wildcard site. A lookup takes time proportional to the number of labels of the netloc, regardless
+    of the number of sites. The returned overrides are read-only, with their regular expression patterns compiled.
+    """
+
+    def __init__(self, overrides: Mapping[str, Mapping[str, Any]]):
+        # Can raise: ValueError
+        self._source = copy.deepcopy(dict(overrides))  # Used for pickling.
+        self._root = _TrieNode()
+        self._sites: Dict[str, Mapping[str, Any]] = {}
+        compiled_overrides_by_id: Dict[int, Mapping[str, Any]] = {}  # Shares the compiled overrides of aliased sites.
+        for key, site_overrides in overrides.items():
+            labels, is_wildcard = _key_labels(key)
+            compiled_overrides = compiled_overrides_by_id.get(id(site_overrides))
+            if compiled_overrides is None:
+                compiled_overrides = compiled_overrides_by_id[id(site_overrides)] = _compile_overrides(key, site_overrides)
+            node = self._root
+            for label in labels:
+                node = node.children.setdefault(label, _TrieNode())
+            if is_wildcard:
+                node.wildcard = compiled_overrides
+            else:
+                node.exact = compiled_overrides
+            self._sites[key] = compiled_overrides
+
+    @classmethod
+    def from_path(cls, path: Union[str, Path], *, base: Optional[Mapping[str, Mapping[str, Any]]] = None) -> "NetlocOverrides":
+        """Return the overrides loaded from the given JSON or TOML file, or from the files with these suffixes in the given directory.
+
+        Each file is a mapping of sites to their overrides, with each substitution being a pair of a pattern and its
+        replacement. The sites of the files are merged in the order of their names over those of the optional base.
+        """
+        # Can raise: OSError, ValueError
+        overrides = dict(base or {})
+        for file_path in override_files(path):
+            overrides.update(_read_overrides_file(file_path))
+        return cls(overrides)
+
+    def __len__(self) -> int:
+        return len(self._sites)
+
+    def __reduce__(self) -> Tuple[type, Tuple[Dict[str, Mapping[str, Any]]]]:
+        return self.__class__, (self._source,)
+
+    @property
+    def sites(self) -> Mapping[str, Mapping[str, Any]]:
+        """Return the compiled overrides by site."""
+        return MappingProxyType(self._sites)
+
+    def get(self, netloc: str) -> Mapping[str, Any]:
+        """Return the overrides for the given netloc, which are empty if there are none."""
+        host, _, port = netloc.rpartition(":")
+        if not (host and port.isdigit()):
+            host = netloc
+        node = self._root
+        overrides = _EMPTY
+        labels = host.split(".")
+        for num_remaining_labels in range(len(labels) - 1, -1, -1):
+            if node.wildcard is not None:
+                overrides = node.wildcard  # The longest matching wildcard site so far.
+            next_node = node.children.get(labels[num_remaining_labels])
+            if next_node is None:
+                return overrides
+            node = next_node
+        return node.exact if node.exact is not None else overrides
+
+
+class _AffectedURLs:
+    """Picklable predicate of whether the overrides of a URL differ between two instances of `NetlocOverrides`."""
+
+    def __init__(self, old_overrides: NetlocOverrides, new_overrides: NetlocOverrides):
+        self._old_overrides = old_overrides
+        self._new_overrides = new_overrides
+
+    def __call__(self, url: str) -> bool:
+        netloc = url_netloc(url)
+        return self._old_overrides.get(netloc) != self._new_overrides.get(netloc)
+
+
+def override_files(path: Union[str, Path]) -> List[Path]:
+    """Return the given override file, or the override files in the given directory in the order of their names."""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(file_path for file_path in path.iterdir() if file_path.suffix in _OVERRIDES_FILE_SUFFIXES and file_path.is_file())
+    return [path]
+
+
+def _read_overrides_file(path: Path) -> Dict[str, Any]:
+    # Can raise: OSError, ValueError
+    if path.suffix == ".toml":
+        if not TOML_AVAILABLE:
+            raise ValueError(f"The overrides file {path} cannot be read because TOML requires Python 3.11 or the optional tomli package.")
+        with path.open("rb") as file:
+            overrides = tomllib.load(file)
+    else:
+        overrides = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(overrides, dict) or not all(isinstance(site_overrides, dict) for site_overrides in overrides.values()):
+        raise ValueError(f"The overrides file {path} does not contain a mapping of sites to their overrides.")
+    return overrides
+
+
+class OverridesWatcher:
+    """Watcher of an override file or directory which calls `on_change` with the newly loaded overrides when it changes.
+
+    The files are polled for changes by a daemon thread every `interval` seconds, and are loaded as by
+    `NetlocOverrides.from_path` with the given base. If they are invalid, the error is logged, and they are loaded again
+    only once they change again.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        on_change: Callable[[NetlocOverrides], None],
+        *,
+        base: Optional[Mapping[str, Mapping[str, Any]]] = None,
+        interval: float = config.OVERRIDES_POLL_INTERVAL,
+    ):
+        self.path = Path(path)
+        self._on_change = on_change
+        self._base = base
+        self._interval = interval
+        self._signature = self._read_signature()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name=self.__class__.__qualname__, daemon=True)
+        self._thread.start()
+
+    def _read_signature(self) -> Optional[Tuple[Tuple[str, int, int], ...]]:
+        try:
+            return tuple((str(file_path), stat.st_mtime_ns, stat.st_size) for file_path in override_files(self.path) for stat in (file_path.stat(),))
+        except OSError:
+            return None
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self._interval):
+            signature = self._read_signature()
+            if signature == self._signature:
+                continue
+            self._signature = signature
+            try:
+                overrides = NetlocOverrides.from_path(self.path, base=self._base)
+            except (OSError, ValueError) as exc:
+                log.warning("Unable to reload the changed overrides at %s. The current overrides are kept. %s: %s", self.path, exc.__class__.__qualname__, exc)
+                continue
+            log.info("Reloaded the changed overrides at %s.", self.path)
+            self._on_change(overrides)
+
+    def stop(self) -> None:
+        """Stop watching."""
+        self._stopped.set()
+        self._thread.join()
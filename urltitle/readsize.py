@@ -0,0 +1,177 @@
+"""Adaptive estimates of the amount of HTML content to read for a title."""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from cachetools import LRUCache
+
+from . import config
+from .util.math import ceil_to_kib
+from .util.urllib import url_netloc
+
+log = logging.getLogger(__name__)
+
+
+class ReadSizeStats(NamedTuple):
+    """Statistics of the observed read sizes of a netloc or path prefix.
+
+    An observation is within the estimate if the estimate before it was at least as large, i.e. if its title was found
+    in the first read.
+    """
+
+    estimate: int
+    num_samples: int
+    num_observations: int
+    num_within_estimate: int
+
+
+class _Samples:
+    __slots__ = ("sizes", "num_observations", "num_within_estimate")
+
+    def __init__(self, sizes: List[int], num_observations: int = 0, num_within_estimate: int = 0):
+        self.sizes: Deque[int] = deque(sizes)
+        self.num_observations = num_observations
+        self.num_within_estimate = num_within_estimate
+
+
+class ReadSizeEstimator:
+    """Thread-safe estimator of the amount of HTML content to read to find the title of a URL, by netloc and path prefix.
+
+    The estimate of a key is the given high percentile of its most recent observed read sizes, with the weight of each
+    observation decaying by the given factor with each newer one. It thereby adapts to a changed site within a few
+    observations, and is not raised for long by a single page with an unusually late title. The path prefix of a URL is
+    its netloc and first path segment, and its estimate is used over that of the netloc once it has `min_path_samples`
+    observations. The least recently used keys beyond `max_keys` are evicted.
+
+    If a path is given, the observations are loaded from and persisted to a table of the SQLite database at the path,
+    which can be that of a `SQLiteTitleCache`.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        path: Optional[Union[str, Path]] = None,
+        *,
+        default: int = config.DEFAULT_REQUEST_SIZE,
+        max_size: int = config.MAX_REQUEST_SIZES["html"],
+        max_keys: int = config.READ_SIZE_MAX_KEYS,
+        max_samples: int = config.READ_SIZE_MAX_SAMPLES,
+        min_path_samples: int = config.READ_SIZE_MIN_PATH_SAMPLES,
+        percentile: float = config.READ_SIZE_PERCENTILE,
+        decay: float = config.READ_SIZE_DECAY,
+    ):
+        self.default = default
+        self.max_size = max_size
+        self.max_keys = max_keys
+        self._max_samples = max_samples
+        self._min_path_samples = min_path_samples
+        self._percentile = percentile
+        self._decay = decay
+        self._lock = threading.Lock()
+        self._samples: LRUCache = LRUCache(maxsize=max_keys)  # Values are _Samples.
+        self._connection: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._connection = sqlite3.connect(str(Path(path).expanduser()), timeout=config.SQLITE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+            with self._lock:
+                self._load()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def _load(self) -> None:
+        # Note: The lock must be held by the caller.
+        assert self._connection is not None
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS read_sizes (key TEXT PRIMARY KEY, sizes TEXT NOT NULL, num_observations INTEGER NOT NULL, "
+            "num_within_estimate INTEGER NOT NULL, updated REAL NOT NULL)"
+        )
+        self._connection.execute("DELETE FROM read_sizes WHERE key NOT IN (SELECT key FROM read_sizes ORDER BY updated DESC, rowid DESC LIMIT ?)", (self.max_keys,))
+        rows = self._connection.execute("SELECT key, sizes, num_observations, num_within_estimate FROM read_sizes ORDER BY updated, rowid").fetchall()
+        for key, sizes, num_observations, num_within_estimate in rows:
+            self._samples[key] = _Samples(json.loads(sizes)[-self._max_samples :], num_observations, num_within_estimate)
+        log.debug("Loaded read size observations for %s netlocs and path prefixes.", len(rows))
+
+    def _save(self, key: str, samples: _Samples) -> None:
+        # Note: The lock must be held by the caller.
+        if self._connection is not None:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO read_sizes (key, sizes, num_observations, num_within_estimate, updated) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(list(samples.sizes)), samples.num_observations, samples.num_within_estimate, time.time()),
+            )
+
+    @staticmethod
+    def _keys(url: str) -> Tuple[str, Optional[str]]:
+        # Returns: Netloc, and path prefix if the path has more than one segment.
+        netloc = url_netloc(url)
+        split_result = urlsplit(url)
+        if split_result.scheme == "":
+            split_result = urlsplit(f"https://{url}")
+        segments = split_result.path.split("/", 3)  # e.g. ["", "news", "2021", "title.html"]
+        return netloc, (f"{netloc}/{segments[1]}" if len(segments) > 2 and segments[1] else None)
+
+    def _estimate(self, samples: _Samples) -> int:
+        # Note: The lock must be held by the caller.
+        num_samples = len(samples.sizes)
+        weighted_sizes = sorted((size, self._decay ** (num_samples - 1 - index)) for index, size in enumerate(samples.sizes))
+        min_weight = self._percentile * sum(weight for _, weight in weighted_sizes)
+        cumulative_weight = 0.0
+        estimate = weighted_sizes[-1][0]  # Used only if the cumulative weight falls short due to rounding.
+        for size, weight in weighted_sizes:
+            cumulative_weight += weight
+            if cumulative_weight >= min_weight:
+                estimate = size
+                break
+        return min(ceil_to_kib(estimate), self.max_size)
+
+    def _find(self, url: str) -> Optional[_Samples]:
+        # Note: The lock must be held by the caller.
+        netloc, path_prefix = self._keys(url)
+        if path_prefix is not None:
+            samples = self._samples.get(path_prefix)
+            if (samples is not None) and (len(samples.sizes) >= self._min_path_samples):
+                return samples
+        return self._samples.get(netloc)
+
+    def estimate(self, url: str) -> int:
+        """Return the estimated amount of HTML content to read for the title of the given URL."""
+        with self._lock:
+            samples = self._find(url)
+            return self.default if samples is None else self._estimate(samples)
+
+    def observe(self, url: str, size: int) -> None:
+        """Add an observation of the amount of HTML content which was required for the title of the given URL."""
+        with self._lock:
+            samples = self._find(url)
+            is_within_estimate = size <= (self.default if samples is None else self._estimate(samples))
+            for key in reversed(self._keys(url)):  # The netloc is the most recently used.
+                if key is None:
+                    continue
+                samples = self._samples.get(key)
+                if samples is None:
+                    samples = self._samples[key] = _Samples([])
+                samples.sizes.append(size)
+                if len(samples.sizes) > self._max_samples:
+                    samples.sizes.popleft()
+                samples.num_observations += 1
+                samples.num_within_estimate += is_within_estimate
+                self._save(key, samples)
+
+    def stats(self) -> Dict[str, ReadSizeStats]:
+        """Return the statistics of the read sizes by netloc and path prefix."""
+        with self._lock:
+            return {key: ReadSizeStats(self._estimate(s), len(s.sizes), s.num_observations, s.num_within_estimate) for key, s in self._samples.items()}
+
+    def close(self) -> None:
+        """Close the database connection if there is one."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,51 @@
+"""Cache of the final URLs of redirected URLs."""
+import logging
+from typing import Callable, Optional
+
+from . import config
+from .cache import _ExpiringLRUCache
+
+log = logging.getLogger(__name__)
+
+
+class RedirectCache:
+    """Thread-safe in-memory cache of the URL to which each redirected URL leads.
+
+    A redirect is any hop to an equivalent URL, such as an HTTP redirect or a short link. The final URL of a chain of
+    cached redirects is resolved without any requests. Up to `max_size` redirects are cached, each for `ttl` seconds.
+    The redirects are cached by the optional `key` of each URL, such that equivalent URLs share their redirects.
+    """
+
+    def __init__(self, *, max_size: int = config.REDIRECT_CACHE_MAX_SIZE, ttl: float = config.REDIRECT_CACHE_TTL, key: Optional[Callable[[str], str]] = None):
+        self._redirects: _ExpiringLRUCache[str] = _ExpiringLRUCache(max_size=max_size)
+        self._ttl = ttl
+        self._key = key or (lambda url: url)
+
+    def record(self, url: str, target_url: str) -> None:
+        """Record that the URL redirects to the target URL."""
+        key = self._key(url)
+        if self._key(target_url) != key:
+            log.debug("Caching redirect of URL %s to %s.", url, target_url)
+            self._redirects.set(key, target_url, self._ttl)
+
+    def resolve(self, url: str) -> str:
+        """Return the final URL of any cached redirects of the URL, or otherwise the URL itself."""
+        key = self._key(url)
+        seen = {key}
+        while True:
+            target_url = self._redirects.get(key)
+            if target_url is None:
+                return url
+            key = self._key(target_url)
+            if key in seen:  # Stops at a cycle.
+                return url
+            url = target_url
+            seen.add(key)
+
+    def forget(self, url: str) -> None:
+        """Delete the cached redirect of the URL, if any."""
+        self._redirects.delete(self._key(url))
+
+    def delete_matching(self, predicate: Callable[[str], bool]) -> int:
+        """Delete the cached redirects whose keys match the given predicate, returning their number."""
+        return self._redirects.delete_matching(predicate)
@@ -0,0 +1,64 @@
+"""Revalidation of stale cached titles using conditional requests."""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.message import Message
+from typing import Dict, Iterator, NamedTuple, Optional
+
+from .cache import CachedTitle, TitleValidators
+
+
+class _Revalidation(NamedTuple):
+    """Revalidation of the stale cached title with the given key."""
+
+    key: str
+    cached: CachedTitle
+
+
+_REVALIDATION: ContextVar[Optional[_Revalidation]] = ContextVar("_REVALIDATION", default=None)  # Revalidation which is current.
+_VALIDATORS: ContextVar[Optional[Dict[str, TitleValidators]]] = ContextVar("_VALIDATORS", default=None)  # Validators of the read titles by key.
+
+
+class _NotModified(Exception):
+    """Response of Not Modified (304) to the conditional request of a revalidation."""
+
+
+def conditional_headers(validators: TitleValidators) -> Dict[str, str]:
+    """Return the headers of a conditional request for the content with the given validators."""
+    headers = {}
+    if validators.etag:
+        headers["If-None-Match"] = validators.etag
+    if validators.last_modified:
+        headers["If-Modified-Since"] = validators.last_modified
+    return headers
+
+
+def response_validators(headers: Message, offset: Optional[int]) -> TitleValidators:
+    """Return the validators of a response with the given headers, with the offset up to which its title was read."""
+    return TitleValidators(headers.get("ETag"), headers.get("Last-Modified"), offset)
+
+
+@contextmanager
+def _collected_validators() -> Iterator[Dict[str, TitleValidators]]:
+    # Note: The validators of the titles read in the context are collected, including by any nested context.
+    validators = _VALIDATORS.get()
+    if validators is not None:
+        yield validators
+        return
+    validators = {}
+    token = _VALIDATORS.set(validators)
+    try:
+        yield validators
+    finally:
+        _VALIDATORS.reset(token)
+
+
+@contextmanager
+def _revalidating(key: str, cached: CachedTitle) -> Iterator[Dict[str, TitleValidators]]:
+    # Note: The revalidation is current for the duration of the context, which collects the validators of any new title.
+    validators: Dict[str, TitleValidators] = {}
+    revalidation_token, validators_token = _REVALIDATION.set(_Revalidation(key, cached)), _VALIDATORS.set(validators)
+    try:
+        yield validators
+    finally:
+        _VALIDATORS.reset(validators_token)
+        _REVALIDATION.reset(revalidation_token)
@@ -0,0 +1,269 @@
+"""Incremental searches of response content for a title."""
+import logging
+from email.message import Message
+from typing import Any, Iterator, Mapping, NamedTuple, Optional, Union, cast
+
+from bs4 import BeautifulSoup
+
+from . import config
+from .trace import trace_event
+from .util.html import HTMLTitleScanner
+from .util.humanize import HumanizedBytes, humanize_bytes
+from .util.json import IPYNBTitleScanner
+from .util.zlib import DecompressionError, StreamDecompressor, is_negotiated_content_encoding
+
+log = logging.getLogger(__name__)
+
+
+class _ResponseHeaders(NamedTuple):
+    content_type: Optional[str]
+    content_type_cf: str
+    content_encoding: Optional[str]
+    content_len: Optional[int]
+
+    @classmethod
+    def from_message(cls, headers: Message) -> "_ResponseHeaders":
+        """Return the response headers parsed from the given message."""
+        content_type_header = headers.get("Content-Type")
+        content_type_header_str_cf = content_type_header.casefold() if content_type_header is not None else ""
+        content_encoding_header = headers.get("Content-Encoding")
+        content_len_header = headers.get("Content-Length")
+        content_len_header = cast(Union[int, str, None], content_len_header)
+        content_len_header = int(content_len_header) if content_len_header is not None else None
+        return cls(content_type_header, content_type_header_str_cf, content_encoding_header, content_len_header)
+
+    @property
+    def content_len_humanized(self) -> Optional[str]:
+        """Return the humanized content length."""
+        return humanize_bytes(self.content_len)
+
+    def title(self) -> str:
+        """Return the headers-derived title."""
+        content_encoding = self.content_encoding
+        if content_encoding and is_negotiated_content_encoding(content_encoding):
+            content_encoding = None  # It is a detail of the transfer rather than of the content.
+        title_headers = self.content_type, content_encoding, self.content_len_humanized
+        return " ".join(f"({h})" for h in title_headers if h is not None)
+
+
+def _max_content_size(url: str, headers: _ResponseHeaders, content_type: str) -> Optional[int]:
+    # Returns: Max size of the content to read, or otherwise None if the content is not to be read.
+    max_request_size = config.MAX_REQUEST_SIZES[content_type.casefold()]
+    if (headers.content_len or 0) <= max_request_size:
+        return max_request_size
+    log.debug(
+        "Declared content length of %s for URL %s exceeds the configured %s max of %s for reading it.",
+        HumanizedBytes(headers.content_len),
+        url,
+        content_type,
+        HumanizedBytes(max_request_size),
+    )
+    return None
+
+
+def _complete_content(url: str, content: bytes, headers: _ResponseHeaders, max_request_size: int, content_type: str) -> Optional[bytes]:
+    # Returns: Decompressed content, or otherwise None if the content is incomplete or invalid.
+    trace_event("read", num_bytes=len(content))
+    if len(content) >= max_request_size:  # Is very likely an incomplete file if both sizes are equal.
+        log.debug(
+            "Undeclared and unknown content length for URL %s likely exceeds the configured %s max of %s for reading it fully.",
+            url,
+            content_type,
+            HumanizedBytes(max_request_size),
+        )
+        return None
+    if headers.content_encoding:
+        try:
+            decompressor = StreamDecompressor(headers.content_encoding)
+            decompressed = decompressor.decompress(content, max_request_size)
+            if not decompressor.is_pending:
+                decompressed += decompressor.flush(max_request_size)
+        except DecompressionError as exc:
+            log.warning("Unable to decompress %s content for URL %s. %s", content_type, url, exc)
+            return None
+        if decompressor.is_pending or (len(decompressed) > max_request_size):
+            log.debug("Decompressed content for URL %s exceeds the configured %s max of %s for reading it fully.", url, content_type, HumanizedBytes(max_request_size))
+            return None
+        content = decompressed
+    return content
+
+
+_MAX_CHAR_SIZE = 4  # Max size in bytes of an encoded character.
+
+
+class _HTMLTitleSearch:
+    """Incremental search for a title in HTML content as it is read.
+
+    Each amount of content is read into the buffer returned by `read_buffer`, and is then processed by `feed`. The buffer is
+    grown in place, and so the content read so far is not copied with each read.
+    """
+
+    def __init__(self, headers: Message, overrides: Mapping[str, Any], amount: int):
+        self.content_len_read = 0  # Compressed
+        self.amount = amount  # Amount to read next. It is zero once no more content is to be read.
+        self.title: Optional[str] = None
+        self._content = bytearray()  # Decompressed. Only its first self._content_len bytes are used.
+        self._content_len = 0
+        self._compressed_buffer = bytearray()
+        self._decompressor: Optional[StreamDecompressor] = None
+        content_encoding = headers.get("Content-Encoding")
+        if content_encoding:
+            try:
+                self._decompressor = StreamDecompressor(content_encoding)
+            except DecompressionError as exc:
+                log.warning("Unable to read HTML content. %s", exc)
+                self.amount = 0
+        self._max_size = config.MAX_REQUEST_SIZES["html"]
+        self._selector = overrides.get("selector")
+        strainer = overrides.get("strainer")
+        strainers = {strainer: config.STRAINERS[strainer], **config.STRAINERS} if strainer else config.STRAINERS
+        self._scanner = HTMLTitleScanner(strainers, encoding=headers.get_content_charset())
+
+    @property
+    def content(self) -> bytearray:
+        """Return the decompressed content read so far."""
+        del self._content[self._content_len :]  # Releases the unused part of the buffer.
+        return self._content
+
+    def read_buffer(self) -> memoryview:
+        """Return the buffer to read the next amount of content into.
+
+        The buffer must be released before `feed` is called.
+        """
+        if self._decompressor:
+            if len(self._compressed_buffer) < self.amount:
+                self._compressed_buffer = bytearray(self.amount)
+            return memoryview(self._compressed_buffer)[: self.amount]
+        required_len = self._content_len + self.amount
+        if len(self._content) < required_len:
+            self._content.extend(bytes(required_len - len(self._content)))
+        return memoryview(self._content)[self._content_len : required_len]
+
+    def feed(self, url: str, num_read: int, time_used: float) -> None:
+        """Process the given number of bytes newly read into the buffer, updating the title and the amount to read next."""
+        self.content_len_read += num_read
+        trace_event("read", num_bytes=num_read, seconds=time_used)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Read %s in this iteration in %.1fs with a total of %s read so far.", HumanizedBytes(num_read), time_used, HumanizedBytes(self.content_len_read))
+        if self._decompressor:
+            max_len = self._max_size - self._content_len  # Is positive, as the reading stops once the max size is decompressed.
+            try:
+                with memoryview(self._compressed_buffer)[:num_read] as content_new_compressed:
+                    content_new = self._decompressor.decompress(content_new_compressed, max_len) if num_read else self._decompressor.flush(max_len)
+            except DecompressionError as exc:
+                log.warning("Stopped reading HTML content for URL %s. %s", url, exc)
+                self.amount = 0
+                return
+            self._content += content_new
+            self._content_len += len(content_new)
+            num_new = len(content_new)
+            self._scanner.feed_bytes(content_new)
+        else:
+            with memoryview(self._content)[self._content_len : self._content_len + num_read] as content_new_view:
+                self._scanner.feed_bytes(content_new_view)
+            self._content_len += num_read
+            num_new = num_read
+        if not num_new:
+            self.amount = 0
+            return
+        self.title = self._title_from_partial_html_content()
+        if self.title:
+            self.amount = 0
+        elif self._scanner.head_ended and not self._selector:
+            log.debug("Stopped reading HTML content for URL %s after its head ended without a title.", url)
+            trace_event("html_head_ended")
+            self.amount = 0
+        elif not num_read:
+            self.amount = 0
+        elif self._content_len >= self._max_size:
+            log.debug("Stopped reading HTML content for URL %s after its decompressed content reached the configured max of %s.", url, HumanizedBytes(self._max_size))
+            self.amount = 0
+        else:
+            content_len = self.content_len_read
+            target_content_len = min(self._max_size, content_len * 2)
+            self.amount = max(0, target_content_len - content_len)
+
+    def _title_from_partial_html_content(self) -> Optional[str]:
+        if self._selector:
+            content = bytes(self.content)
+            bsoup = BeautifulSoup(content, features="html.parser", from_encoding=self._scanner.encoding)
+            try:
+                # title_text = eval(selector, {}, {"bs": bsoup})  # pylint: disable=eval-used
+                # Note: eval takes expression, globals, and locals, all as positional args.
+                title_text = bsoup.select_one(self._selector).text  # Ref: https://www.crummy.com/software/BeautifulSoup/bs4/doc/#css-selectors
+            except (AttributeError, KeyError, TypeError):
+                pass  # Falling back to the scanned title.
+            else:
+                # Check for incomplete title (inexactly)
+                tail_start = max(0, len(content) - _MAX_CHAR_SIZE * (len(title_text) + 1)) // _MAX_CHAR_SIZE * _MAX_CHAR_SIZE  # Aligned
+                if content[tail_start:].decode(bsoup.original_encoding, errors="ignore").endswith(title_text):
+                    # Note: The alternative of using title_text.encode() fails for https://www.childstats.gov/americaschildren/tables/pop1.asp
+                    return None
+
+                # Cleanup title
+                title_text = title_text.strip()  # Useful for https://www.ncbi.nlm.nih.gov/pubmed/12542348
+                if title_text:
+                    trace_event("html_title", selector=self._selector)
+                return title_text or None
+
+        title_text, strainer_type = self._scanner.title()
+        if title_text:
+            log.debug("Discovered raw HTML title using strainer %r: %s", strainer_type, title_text)
+            trace_event("html_title", strainer=strainer_type)
+        return title_text
+
+
+class _IPYNBTitleSearch:
+    """Incremental search for a title in IPYNB content as it is read.
+
+    Each amount of content that is read is processed by `feed`. Only the metadata of the notebook is scanned for, and so
+    the content is read only until its title is found, however large the notebook is.
+    """
+
+    def __init__(self, headers: _ResponseHeaders):
+        self.content_len_read = 0  # Compressed
+        self.amount = config.IPYNB_READ_SIZE  # Amount to read next. It is zero once no more content is to be read.
+        self._scanner = IPYNBTitleScanner()
+        self._decompressor: Optional[StreamDecompressor] = None
+        self._is_readable = True
+        if headers.content_encoding:
+            try:
+                self._decompressor = StreamDecompressor(headers.content_encoding)
+            except DecompressionError as exc:
+                log.warning("Unable to read IPYNB content. %s", exc)
+                self._stop_reading(is_readable=False)
+
+    @property
+    def title(self) -> Optional[str]:
+        """Return the title, which is empty if it was not found, or otherwise None if the content could not be read."""
+        return self._scanner.title() if self._is_readable else None
+
+    def _stop_reading(self, *, is_readable: bool = True) -> None:
+        self.amount = 0
+        self._is_readable = is_readable
+
+    def _decompressed(self, content: bytes) -> Iterator[bytes]:
+        # Note: The content is decompressed in bounded chunks, and so a highly compressed notebook is not held in memory.
+        decompressor = cast(StreamDecompressor, self._decompressor)
+        yield decompressor.decompress(content, config.IPYNB_READ_SIZE)
+        while decompressor.is_pending:
+            yield decompressor.decompress(b"", config.IPYNB_READ_SIZE)
+        if not content:
+            yield decompressor.flush(config.IPYNB_READ_SIZE)
+
+    def feed(self, url: str, content: bytes) -> None:
+        """Process the given content newly read, updating the amount to read next."""
+        self.content_len_read += len(content)
+        trace_event("read", num_bytes=len(content))
+        try:
+            for content_new in self._decompressed(content) if self._decompressor else (content,):
+                self._scanner.feed_bytes(content_new)
+                if self._scanner.done:
+                    break
+        except DecompressionError as exc:
+            log.warning("Stopped reading IPYNB content for URL %s. %s", url, exc)
+            self._stop_reading(is_readable=False)
+            return
+        if self._scanner.done or not content:
+            log.debug("Stopped reading IPYNB content for URL %s after reading %s.", url, HumanizedBytes(self.content_len_read))
+            self._stop_reading()
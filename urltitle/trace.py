@@ -0,0 +1,156 @@
+"""Traces and aggregate metrics of title requests."""
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import config
+
+_CURRENT_TRACE: ContextVar[Optional["TitleTrace"]] = ContextVar("urltitle_trace", default=None)
+
+
+class TraceEvent(NamedTuple):
+    """Event in a title request, with its time in seconds since the start of the request."""
+
+    time: float
+    stage: str
+    details: Dict[str, Any]
+
+
+class TitleTrace:
+    """Trace of a title request.
+
+    Its events are in the order of the stages of the request, including those of any URLs it was redirected to. Its
+    summary properties are derived from the events.
+    """
+
+    def __init__(self, url: str, netloc: str):
+        self.url = url
+        self.netloc = netloc
+        self.events: List[TraceEvent] = []
+        self.title: Optional[str] = None
+        self.error: Optional[Exception] = None
+        self.duration: Optional[float] = None  # Seconds. It is set once the request ends.
+        self._start_time = time.monotonic()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__qualname__}(url={self.url!r}, title={self.title!r}, error={self.error!r}, duration={self.duration}, events={len(self.events)})"
+
+    def add(self, stage: str, **details: Any) -> None:
+        """Add an event for the given stage."""
+        self.events.append(TraceEvent(time.monotonic() - self._start_time, stage, details))
+
+    def end(self, *, title: Optional[str] = None, error: Optional[Exception] = None) -> None:
+        """End the trace with the title or the error of the request."""
+        self.duration = time.monotonic() - self._start_time
+        self.title, self.error = title, error
+
+    def stage_events(self, stage: str) -> List[TraceEvent]:
+        """Return the events of the given stage."""
+        return [event for event in self.events if event.stage == stage]
+
+    @property
+    def cache_hit(self) -> bool:
+        """Return whether the title or the error was returned from a cache without a request."""
+        return not (self.stage_events("response") or self.stage_events("request_error")) and bool(self.stage_events("cache"))
+
+    @property
+    def num_attempts(self) -> int:
+        """Return the number of request attempts, including those for redirected URLs."""
+        return len(self.stage_events("response")) + len(self.stage_events("request_error"))
+
+    @property
+    def num_reads(self) -> int:
+        """Return the number of content reads, each of which is followed by a parse pass."""
+        return len(self.stage_events("read"))
+
+    @property
+    def num_bytes_read(self) -> int:
+        """Return the number of content bytes read, before any decompression."""
+        return sum(event.details["num_bytes"] for event in self.stage_events("read"))
+
+    @property
+    def num_hops(self) -> int:
+        """Return the number of URLs which the request was redirected to by a URL substitution, scheme guess, or fallback."""
+        return max(0, len(self.stage_events("cache")) - 1)
+
+
+def trace_event(stage: str, **details: Any) -> None:
+    """Add an event to the trace of the current title request, if any."""
+    trace = _CURRENT_TRACE.get()
+    if trace is not None:
+        trace.add(stage, **details)
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.counts = [0] * (len(buckets) + 1)  # The last count is for the implicit +Inf bucket.
+        self.sum = 0.0
+
+
+class TitleMetrics:
+    """Thread-safe aggregate counters and histograms of the title requests of a reader, by netloc.
+
+    The netlocs beyond the first `max_netlocs` are aggregated under the netloc label `other`. The metrics are exported in
+    the Prometheus text format by `prometheus_text`.
+    """
+
+    _COUNTERS = {
+        "titles_total": "Title requests by outcome, which is one of hit, miss, and error.",
+        "request_attempts_total": "Request attempts, including those for redirected URLs.",
+        "reads_total": "Content reads, each of which is followed by a parse pass.",
+        "read_bytes_total": "Content bytes read, before any decompression.",
+        "hops_total": "Redirections by a URL substitution, scheme guess, or fallback.",
+    }
+
+    def __init__(self, *, duration_buckets: Sequence[float] = config.METRICS_DURATION_BUCKETS, max_netlocs: int = config.METRICS_MAX_NETLOCS):
+        self._duration_buckets = sorted(duration_buckets)
+        self._max_netlocs = max_netlocs
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+        self._durations: Dict[str, _Histogram] = {}
+
+    def observe(self, trace: TitleTrace) -> None:
+        """Add the given ended trace to the metrics."""
+        outcome = "error" if trace.error else ("hit" if trace.cache_hit else "miss")
+        with self._lock:
+            netloc = trace.netloc if (trace.netloc in self._durations) or (len(self._durations) < self._max_netlocs) else "other"
+            labels = (("netloc", netloc),)
+            self._counters["titles_total", (*labels, ("outcome", outcome))] += 1
+            self._counters["request_attempts_total", labels] += trace.num_attempts
+            self._counters["reads_total", labels] += trace.num_reads
+            self._counters["read_bytes_total", labels] += trace.num_bytes_read
+            self._counters["hops_total", labels] += trace.num_hops
+            histogram = self._durations.setdefault(netloc, _Histogram(self._duration_buckets))
+            histogram.counts[bisect.bisect_left(self._duration_buckets, trace.duration or 0.0)] += 1
+            histogram.sum += trace.duration or 0.0
+
+    def prometheus_text(self, prefix: str = config.PACKAGE_NAME) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            durations = sorted((netloc, list(histogram.counts), histogram.sum) for netloc, histogram in self._durations.items())
+        for name, help_text in self._COUNTERS.items():
+            lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} counter"]
+            lines += [f"{prefix}_{name}{_labels(labels)} {_number(value)}" for (counter_name, labels), value in counters if counter_name == name]
+        name = f"{prefix}_title_duration_seconds"
+        lines += [f"# HELP {name} Durations of title requests.", f"# TYPE {name} histogram"]
+        for netloc, counts, duration_sum in durations:
+            cumulative_count = 0
+            for bucket, count in zip([*map(_number, self._duration_buckets), "+Inf"], counts):
+                cumulative_count += count
+                lines.append(f"{name}_bucket{_labels((('netloc', netloc), ('le', bucket)))} {cumulative_count}")
+            lines += [f"{name}_sum{_labels((('netloc', netloc),))} {_number(duration_sum)}", f"{name}_count{_labels((('netloc', netloc),))} {cumulative_count}"]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Sequence[Tuple[str, str]]) -> str:
+    escaped_labels = ((name, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for name, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped_labels) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
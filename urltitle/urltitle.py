@@ -1,61 +1,121 @@
 """URL title reader."""
 import logging
-import re
+import random
 import ssl
+import threading
 import time
-import zlib
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import copy_context
 from datetime import timedelta
+from email.message import Message
 from functools import lru_cache
-from http.client import RemoteDisconnected
+from http.client import HTTPResponse, RemoteDisconnected
+from pathlib import Path
 from socket import timeout as SocketTimeoutError
 from ssl import SSLCertVerificationError
-from statistics import mean
-from typing import Dict, Optional, Tuple, Union, cast
+from typing import Any, Callable, Deque, Dict, Generator, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple, Union, cast
 from urllib.error import HTTPError, URLError
 from urllib.parse import quote, urlparse
-from urllib.request import HTTPCookieProcessor, HTTPSHandler, Request, build_opener
-
-from bs4 import BeautifulSoup, SoupStrainer
-from cachetools.func import LFUCache, ttl_cache  # type: ignore
+from urllib.request import HTTPCookieProcessor, OpenerDirector, Request, build_opener
 
 from . import config
-from .util.humanize import humanize_bytes, humanize_len
-from .util.json import get_ipynb_title
+from .cache import CachedTitle, MemoryTitleCache, SQLiteTitleCache, TitleCache, TitleValidators, _ExpiringLRUCache
+from .canonical import URLCanonicalizer
+from .circuit import CircuitBreaker
+from .deadline import _DEADLINE, _deadline, _is_past_deadline, _remaining_time, _request_timeout
+from .errors import URLTitleError, URLTitleTimeoutError, _error_category
+from .overrides import NetlocOverrides, OverridesWatcher, _AffectedURLs
+from .readsize import ReadSizeEstimator
+from .redirects import RedirectCache
+from .revalidation import _REVALIDATION, _VALIDATORS, _collected_validators, _NotModified, _revalidating, _Revalidation, conditional_headers, response_validators
+from .search import _complete_content, _HTMLTitleSearch, _IPYNBTitleSearch, _max_content_size, _ResponseHeaders
+from .trace import _CURRENT_TRACE, TitleMetrics, TitleTrace, trace_event
+from .util.humanize import HumanizedBytes
 from .util.math import ceil_to_kib
-from .util.pikepdf import get_pdf_title
-from .util.urllib import CustomHTTPRedirectHandler
+from .util.pdf import PDFRangeError, pdf_title_ranges
+from .util.pikepdf import PDFTitlePool
+from .util.race import PreferenceRace
+from .util.threading import KeyedSemaphore, SingleFlight
+from .util.urllib import ConnectionPool, CustomHTTPRedirectHandler, PooledHTTPHandler, PooledHTTPSHandler, url_netloc
+from .util.zlib import SUPPORTED_CONTENT_ENCODINGS
 
 log = logging.getLogger(__name__)
 
+REQUEST_ERRORS = (ValueError, HTTPError, URLError, SocketTimeoutError, RemoteDisconnected)
 
-class URLTitleError(Exception):
-    """URL title exception."""
 
-    def __init__(self, msg: str):
-        log.error(msg)
-        super().__init__(msg)
+class _TitleOutcome(NamedTuple):
+    """Outcome of reading a response.
 
+    If `url` is set, the title is to be read from it instead, with `title` being the fallback if it is set. If
+    `is_redirect` is set, `url` is equivalent to the URL of the response, and so the title of either is that of the other.
+    `offset` is the amount of the content which was read to find the title, if known.
+    """
+
+    title: Optional[str]
+    url: Optional[str] = None
+    is_redirect: bool = False
+    offset: Optional[int] = None
 
-class URLTitleReader:
-    """URL title reader."""
 
-    def __init__(
+class BaseURLTitleReader:
+    """Base URL title reader.
+
+    This holds the state and the logic which are independent of how requests are made.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         *,
         title_cache_max_size: int = config.DEFAULT_CACHE_MAX_SIZE,
         title_cache_ttl: float = config.DEFAULT_CACHE_TTL,
+        title_cache_stale_ttl: float = config.DEFAULT_CACHE_STALE_TTL,
+        title_cache_path: Optional[Union[str, Path]] = None,
+        title_cache: Optional[TitleCache] = None,
         verify_ssl: bool = True,
+        trace_hook: Optional[Callable[[TitleTrace], None]] = None,
+        overrides_path: Optional[Union[str, Path]] = None,
     ):
         log.debug(
-            "Cache parameters: config.DEFAULT_CACHE_MAX_SIZE=%s, title_cache_max_size=%s, title_cache_ttl=%s",
+            "Cache parameters: config.DEFAULT_CACHE_MAX_SIZE=%s, title_cache_max_size=%s, title_cache_ttl=%s, title_cache_path=%s",
             config.DEFAULT_CACHE_MAX_SIZE,
             title_cache_max_size,
             timedelta(seconds=title_cache_ttl),
+            title_cache_path,
         )
 
-        self._content_amount_guesses = LFUCache(maxsize=config.DEFAULT_CACHE_TTL)  # Don't use title_cache_max_size.
-        self._title_outer = ttl_cache(maxsize=title_cache_max_size, ttl=title_cache_ttl)(self._title_outer)  # type: ignore
+        if overrides_path is None:
+            self._netloc_overrides = NetlocOverrides(config.NETLOC_OVERRIDES)
+        else:
+            self._netloc_overrides = NetlocOverrides.from_path(overrides_path, base=config.NETLOC_OVERRIDES)
+
+        self._owns_title_cache = title_cache is None
+        if title_cache is not None:
+            if title_cache_path is not None:
+                raise ValueError("Only one of title_cache_path and title_cache can be provided.")
+            self._title_cache = title_cache
+        elif title_cache_path is None:
+            self._title_cache = MemoryTitleCache(max_size=title_cache_max_size, ttl=title_cache_ttl, stale_ttl=title_cache_stale_ttl)
+        else:
+            self._title_cache = SQLiteTitleCache(title_cache_path, max_size=title_cache_max_size, ttl=title_cache_ttl, stale_ttl=title_cache_stale_ttl)
+        self._error_cache: _ExpiringLRUCache[URLTitleError] = _ExpiringLRUCache(max_size=config.ERROR_CACHE_MAX_SIZE)
+        self.canonicalizer = URLCanonicalizer()
+        self.redirects = RedirectCache(key=self._canonical_url)
+        self._pdf_title_pool = PDFTitlePool(
+            processes=config.PDF_TITLE_PROCESSES,
+            max_tasks_per_process=config.PDF_TITLE_MAX_TASKS_PER_PROCESS,
+            timeout=config.PDF_TITLE_TIMEOUT,
+        )
+        self.read_sizes = ReadSizeEstimator(title_cache_path)  # Persisted alongside a SQLite title cache.
+        self.circuits = CircuitBreaker()
         self.netloc = lru_cache(maxsize=title_cache_max_size)(self.netloc)  # type: ignore
+        self._overrides_watcher: Optional[OverridesWatcher] = None
+        if overrides_path is not None:
+            self._overrides_watcher = OverridesWatcher(overrides_path, self._swap_overrides, base=config.NETLOC_OVERRIDES)
+        self.metrics = TitleMetrics()
+        self._trace_hook = trace_hook
 
         if verify_ssl:
             self._ssl_context = ssl.create_default_context()
@@ -70,45 +130,116 @@ class URLTitleReader:
                 self.__class__.__qualname__,
             )
 
+    def _cache_error(self, url: str, exc: URLTitleError) -> None:
+        if isinstance(exc, URLTitleTimeoutError) or _is_past_deadline():
+            log.debug("Not caching %s error for URL %s because it is due to the deadline of the title.", exc.category, url)
+            return
+        ttl = config.ERROR_CACHE_TTLS[exc.category]
+        log.debug("Caching %s error for URL %s for %s.", exc.category, url, timedelta(seconds=ttl))
+        self._error_cache.set(self._canonical_url(url), exc, ttl)
+
+    def _raise_cached_error(self, url: str) -> None:
+        # Can raise: URLTitleError
+        exc = self._error_cache.get(self._canonical_url(url))
+        if exc is not None:
+            log.info("Raising cached %s error for URL %s.", exc.category, url)
+            trace_event("error_cache", url=url, category=exc.category)
+            raise exc.with_traceback(None)  # Prevents the traceback from growing with each raise.
+
+    @contextmanager
+    def _traced(self, url: str) -> Iterator[TitleTrace]:
+        # Note: The trace is current for the duration of the context, and is ended by the caller if the title is read.
+        trace = TitleTrace(url, self.netloc(url.strip()))
+        token = _CURRENT_TRACE.set(trace)
+        try:
+            yield trace
+        except URLTitleError as exc:
+            trace.end(error=exc)
+            raise
+        finally:
+            _CURRENT_TRACE.reset(token)
+            self.metrics.observe(trace)
+            if self._trace_hook:
+                try:
+                    self._trace_hook(trace)
+                except Exception:  # pylint: disable=broad-except
+                    log.exception("Error in trace hook for URL %s.", url)
+
     def _guess_html_content_amount_for_title(self, url: str) -> int:
-        netloc = self.netloc(url)
-        overrides = config.NETLOC_OVERRIDES.get(netloc, {})
-        guess = overrides.get("default_request_size")
+        guess = self._overrides(url).get("default_request_size")
         if not guess:
-            guess = self._content_amount_guesses.get(netloc, config.DEFAULT_REQUEST_SIZE)
-        log.debug("Returning HTML content amount guess for %s of %s.", netloc, humanize_bytes(guess))
+            guess = self.read_sizes.estimate(url)
+        log.debug("Returning HTML content amount guess for URL %s of %s.", url, HumanizedBytes(guess))
         return guess
 
-    def _title_inner(self, url: str) -> str:  # pylint: disable=too-many-locals,too-many-return-statements,too-many-branches,too-many-statements
-        # Can raise: URLTitleError
-        max_attempts = config.MAX_REQUEST_ATTEMPTS
-        url = url.strip()
-        request_desc = f"request for title of URL {url}"
-        log.debug("Received %s with up to %s attempts.", request_desc, max_attempts)
-        netloc = self.netloc(url)
-        overrides = config.NETLOC_OVERRIDES.get(netloc, {})
-        overrides = cast(Dict, overrides)
+    def _overrides(self, url: str) -> Mapping[str, Any]:
+        return self._netloc_overrides.get(self.netloc(url))
 
-        # Add scheme if missing
-        if urlparse(url).scheme == "":
-            for scheme_guess in config.URL_SCHEME_GUESSES:
-                log.info("The scheme %s will be attempted for URL %s", scheme_guess, url)
-                fixed_url = f"{scheme_guess}://{url}"
-                try:
-                    return self._title_outer(fixed_url)
-                except URLTitleError as exc:
-                    log.warning("The scheme %s failed for URL %s. %s", scheme_guess, url, exc)
-            url_scheme_guesses_str = ", ".join(config.URL_SCHEME_GUESSES)
-            msg = f"Exhausted all scheme guesses ({url_scheme_guesses_str}) for URL {url} with a missing scheme."
-            raise URLTitleError(msg)
+    def reload_overrides(self, overrides: Optional[Union[Mapping[str, Mapping[str, Any]], str, Path]] = None) -> None:
+        """Replace the site-specific overrides with those of the given mapping, or otherwise of `config.NETLOC_OVERRIDES`.
 
+        If a path to a JSON or TOML file or to a directory of such files is given instead, the sites of its files are merged
+        over those of `config.NETLOC_OVERRIDES`. The overrides are validated before they replace the current ones, which are
+        kept if there is an error. The cached titles and errors of the sites whose overrides changed are deleted.
+        """
+        # Can raise: OSError, ValueError
+        if isinstance(overrides, (str, Path)):
+            netloc_overrides = NetlocOverrides.from_path(overrides, base=config.NETLOC_OVERRIDES)
+        else:
+            netloc_overrides = NetlocOverrides(config.NETLOC_OVERRIDES if overrides is None else overrides)
+        self._swap_overrides(netloc_overrides)
+
+    def _swap_overrides(self, netloc_overrides: NetlocOverrides) -> None:
+        old_netloc_overrides, self._netloc_overrides = self._netloc_overrides, netloc_overrides
+        log.info("Loaded site-specific overrides for %s sites.", len(netloc_overrides))
+        if old_netloc_overrides.sites != netloc_overrides.sites:
+            is_affected = _AffectedURLs(old_netloc_overrides, netloc_overrides)
+            self._title_cache.delete_matching(is_affected)
+            self._error_cache.delete_matching(is_affected)
+            self.redirects.delete_matching(is_affected)
+
+    @staticmethod
+    def _scheme_guesses(url: str) -> Iterator[Tuple[str, str]]:
+        for scheme_guess in config.URL_SCHEME_GUESSES:
+            log.info("The scheme %s will be attempted for URL %s", scheme_guess, url)
+            trace_event("scheme_guess", url=url, scheme=scheme_guess)
+            yield scheme_guess, f"{scheme_guess}://{url}"
+
+    def _scheme_race(self, url: str) -> PreferenceRace[Tuple[str, str], str]:
+        return PreferenceRace(self._scheme_guesses(url), stagger=config.URL_SCHEME_RACE_STAGGER, grace=config.URL_SCHEME_RACE_GRACE)
+
+    def _scheme_race_title(self, url: str, race: PreferenceRace[Tuple[str, str], str]) -> Optional[str]:
+        # Can raise: URLTitleError
+        winner = race.winner()
+        if winner is not None:
+            scheme = race.candidate(winner[0])[0]
+            log.debug("The scheme %s won the race for URL %s.", scheme, url)
+            trace_event("scheme_winner", url=url, scheme=scheme)
+            return winner[1]
+        if race.is_lost:
+            raise self._scheme_guesses_error(url, cast(List[URLTitleError], race.errors))
+        return None
+
+    @staticmethod
+    def _fail_scheme_guess(url: str, race: PreferenceRace[Tuple[str, str], str], index: int, exc: URLTitleError) -> None:
+        log.warning("The scheme %s failed for URL %s. %s", race.candidate(index)[0], url, exc)
+        race.fail(index, exc)
+
+    @staticmethod
+    def _scheme_guesses_error(url: str, errors: List[URLTitleError]) -> URLTitleError:
+        url_scheme_guesses_str = ", ".join(config.URL_SCHEME_GUESSES)
+        msg = f"Exhausted all scheme guesses ({url_scheme_guesses_str}) for URL {url} with a missing scheme."
+        category = min(errors, key=lambda exc: config.ERROR_CACHE_TTLS[exc.category]).category  # Shortest-lived
+        return URLTitleError(msg, category)
+
+    def _substitute_url(self, url: str, overrides: Mapping[str, Any]) -> Optional[str]:
         # Substitute path as configured
         for pattern, replacement in overrides.get("url_subs", []):
             original_url = url
-            url = re.sub(pattern, replacement, url)
+            url = pattern.sub(replacement, url)
             if original_url != url:
                 log.info("Substituted URL %s with %s", original_url, url)
-                return self._title_outer(url)
+                return url
 
         # Percent-encode Unicode to ASCII, preventing UnicodeEncodeError
         if not url.isascii():
@@ -116,220 +247,270 @@ class URLTitleReader:
             url = quote(url, safe=":/")  # Approximation.
             if original_url != url:
                 log.info("ASCII encoded URL %s as %s", original_url, url)
-                return self._title_outer(url)
+                return url
 
         # Use Google web cache as configured
         if overrides.get("google_webcache") and not url.startswith(config.GOOGLE_WEBCACHE_URL_PREFIX):
-            log.info("%s is configured to use Google web cache.", netloc)
-            url = f"{config.GOOGLE_WEBCACHE_URL_PREFIX}{url}"
-            return self._title_outer(url)
+            log.info("%s is configured to use Google web cache.", self.netloc(url))
+            return f"{config.GOOGLE_WEBCACHE_URL_PREFIX}{url}"
+
+        return None
 
+    def _request(self, url: str, overrides: Mapping[str, Any]) -> Request:
         # Set user agent as configured
         user_agent = overrides.get("user_agent", config.USER_AGENT)
         if user_agent != config.USER_AGENT:
-            log.info("Using custom user agent for %s: %s", netloc, user_agent)
-
-        # Read headers
-        for num_attempt in range(1, max_attempts + 1):
-            # Request
-            log.debug("Starting attempt %s processing %s", num_attempt, request_desc)
-            try:
-                opener = build_opener(
-                    CustomHTTPRedirectHandler(),  # Required for annemergmed.com
-                    HTTPCookieProcessor(),  # Required for cell.com, tandfonline.com, etc.
-                    HTTPSHandler(context=self._ssl_context),  # Required for https://verizon.net, etc.
-                )
-                request = Request(url, headers={"Accept": "*/*", "User-Agent": user_agent, **overrides.get("extra_headers", {})})
-                start_time = time.monotonic()
-                response = opener.open(request, timeout=config.REQUEST_TIMEOUT)
-                time_used = time.monotonic() - start_time
-            except (ValueError, HTTPError, URLError, SocketTimeoutError, RemoteDisconnected) as exc:
-                if isinstance(exc, HTTPError) and (exc.code == 308):  # Permanent Redirect
-                    original_url = url
-                    url = exc.headers["Location"]
-                    if url and (original_url != url):
-                        log.info("Due to a permanent direct (code 308), substituted URL %s with %s", original_url, url)
-                        return self._title_outer(url)
-                exception_desc = f"The error is: {exc.__class__.__qualname__}: {exc}"
-                log.warning("Error in attempt %s processing %s. %s", num_attempt, request_desc, exception_desc)
-                if (
-                    isinstance(exc, ValueError)
-                    or (isinstance(exc, URLError) and isinstance(exc.reason, SSLCertVerificationError))
-                    or (isinstance(exc, HTTPError) and (exc.code in config.UNRECOVERABLE_HTTP_CODES))
-                ):
-                    msg = f"Unrecoverable error processing {request_desc}. The request will not be reattempted. " f"{exception_desc}"
-                    raise URLTitleError(msg) from None
-                if num_attempt == max_attempts:
-                    msg = f"Exhausted all {max_attempts} attempts for {request_desc}. {exception_desc}"
-                    raise URLTitleError(msg) from None
-                continue
-            else:
-                break
+            log.info("Using custom user agent for %s: %s", self.netloc(url), user_agent)
+        headers = {"Accept": "*/*", "Accept-Encoding": ", ".join(SUPPORTED_CONTENT_ENCODINGS), "User-Agent": user_agent}
+        return Request(url, headers={**headers, **overrides.get("extra_headers", {})})
+
+    def _revalidation(self, url: str) -> Optional[_Revalidation]:
+        # Returns: Current revalidation if it is of the cached title of the URL, otherwise None.
+        revalidation = _REVALIDATION.get()
+        return revalidation if (revalidation is not None) and (revalidation.key == self._canonical_url(url)) else None
+
+    def _title_request(self, url: str, overrides: Mapping[str, Any]) -> Request:
+        # Note: The request is conditional if the stale cached title of the URL is being revalidated.
+        request = self._request(url, overrides)
+        revalidation = self._revalidation(url)
+        if revalidation is not None:
+            for name, value in conditional_headers(revalidation.cached.validators).items():
+                request.add_header(name, value)
+        return request
+
+    def _check_not_modified(self, url: str, exc: Exception) -> None:
+        # Can raise: _NotModified
+        if isinstance(exc, HTTPError) and (exc.code == 304) and self._revalidation(url):
+            exc.close()  # Releases the connection.
+            log.debug("Content of URL %s is not modified since its stale cached title was read.", url)
+            raise _NotModified(url)
+
+    def _observe_validators(self, response_url: str, headers: Message, outcome: _TitleOutcome) -> None:
+        validators = _VALIDATORS.get()
+        if (validators is not None) and outcome.title and not outcome.url:
+            validators[self._canonical_url(response_url)] = response_validators(headers, outcome.offset)
+
+    def _cache_title(self, url: str, title: str, validators: Mapping[str, TitleValidators]) -> None:
+        key = self._title_key(url)  # The URL may have just been found to redirect.
+        self._title_cache.set_entry(key, title, validators.get(key, TitleValidators()))
+
+    def _cache_revalidated_title(self, url: str, key: str, cached: CachedTitle, title: Optional[str], validators: Mapping[str, TitleValidators]) -> None:
+        # Note: A title of None is one whose content is not modified.
+        if title is None:
+            log.info("Extending TTL of stale cached title %r of URL %s because its content is not modified.", cached.title, url)
+            self._title_cache.set_entry(key, cached.title, cached.validators)
+            return
+        log.info("Replacing stale cached title %r of URL %s with revalidated title %r.", cached.title, url, title)
+        self._cache_title(url, title, validators)
+
+    def _pdf_range_request(self, url: str, overrides: Mapping[str, Any], byte_range: Tuple[int, int]) -> Request:
+        start, end = byte_range
+        log.debug("Requesting byte range %s-%s of PDF URL %s.", start, end - 1, url)
+        request = self._request(url, overrides)
+        request.add_header("Accept-Encoding", "identity")  # The byte ranges are of the unencoded content.
+        request.add_header("Range", f"bytes={start}-{end - 1}")
+        return request
+
+    def _redirected_title(self, url: str, response_url: str) -> Optional[str]:
+        # Returns: Cached title of the URL to which the URL was redirected by its response, if any.
+        if response_url == url:
+            return None
+        self.redirects.record(url, response_url)
+        if not self._shares_title(url, response_url):
+            return None
+        title = self._title_cache.get(self._title_key(response_url))
+        if title is not None:
+            log.info("Returning cached title %r of %s to which URL %s was redirected.", title, response_url, url)
+            trace_event("cache", url=response_url, hit=True)
+        return title
 
-        # Log headers
-        content_type_header = response.headers.get("Content-Type")
-        content_type_header = cast(Optional[str], content_type_header)
-        content_type_header_str_cf = content_type_header.casefold() if content_type_header is not None else ""
-        content_encoding_header = response.headers.get("Content-Encoding")
-        content_len_header = response.headers.get("Content-Length")
-        content_len_header = cast(Union[int, str, None], content_len_header)
-        content_len_header = int(content_len_header) if content_len_header is not None else None
-        content_len_humanized = humanize_bytes(content_len_header)
+    def _check_circuit(self, url: str) -> None:
+        # Can raise: URLTitleError
+        netloc = self.netloc(url)
+        if not self.circuits.allow(netloc):
+            trace_event("circuit_open", netloc=netloc)
+            msg = f"Failing fast for title of URL {url} because the circuit for {netloc} is open due to the errors or latency of its recent requests."
+            raise URLTitleError(msg, "unavailable")
+
+    def _record_request(self, url: str, exc: Optional[Exception], latency: float) -> None:
+        # Note: Only the errors which indicate that the server is failing or overloaded count against its circuit.
+        if isinstance(exc, HTTPError):
+            is_error = (exc.code >= 500) or (exc.code == 429)
+        elif isinstance(exc, ValueError):
+            return
+        else:
+            is_error = exc is not None
+        self.circuits.record(self.netloc(url), is_error=is_error, latency=latency)
+
+    @staticmethod
+    def _retry_delay(url: str, num_attempt: int) -> float:
+        # Returns: Jittered exponential backoff in seconds before the given reattempt, which is shortened to any remaining time.
+        # Can raise: URLTitleTimeoutError
+        max_delay = min(config.REQUEST_BACKOFF_BASE * 2 ** (num_attempt - 2), config.REQUEST_BACKOFF_MAX)
+        delay = min(random.uniform(0, max_delay), _request_timeout(url))
+        trace_event("backoff", attempt=num_attempt, delay=delay)
+        return delay
+
+    @staticmethod
+    def _handle_request_error(exc: Exception, num_attempt: int, request_desc: str) -> Optional[str]:
+        # Can raise: URLTitleError
+        # Returns: URL to redirect to, if any, or otherwise None if the request is to be reattempted.
+        max_attempts = config.MAX_REQUEST_ATTEMPTS
+        if isinstance(exc, HTTPError):
+            exc.close()  # Releases the connection.
+            if exc.code == 308:  # Permanent Redirect
+                url = exc.headers["Location"]
+                if url and (exc.url != url):
+                    log.info("Due to a permanent direct (code 308), substituted URL %s with %s", exc.url, url)
+                    return url
+        exception_desc = f"The error is: {exc.__class__.__qualname__}: {exc}"
+        log.warning("Error in attempt %s processing %s. %s", num_attempt, request_desc, exception_desc)
+        trace_event("request_error", attempt=num_attempt, error=f"{exc.__class__.__qualname__}: {exc}")
+        if (
+            isinstance(exc, ValueError)
+            or (isinstance(exc, URLError) and isinstance(exc.reason, SSLCertVerificationError))
+            or (isinstance(exc, HTTPError) and (exc.code in config.UNRECOVERABLE_HTTP_CODES))
+        ):
+            msg = f"Unrecoverable error processing {request_desc}. The request will not be reattempted. " f"{exception_desc}"
+            raise URLTitleError(msg, "unrecoverable") from None
+        if num_attempt == max_attempts:
+            msg = f"Exhausted all {max_attempts} attempts for {request_desc}. {exception_desc}"
+            raise URLTitleError(msg, _error_category(exc)) from None
+        return None
+
+    @staticmethod
+    def _shrink_read_timeout(url: str, response: Any) -> None:
+        # Note: The socket timeout of a response is shortened to the remaining time before each read if there is a deadline.
+        # Can raise: URLTitleTimeoutError
+        settimeout = getattr(response, "settimeout", None)  # Not all responses support it, e.g. if they are not pooled.
+        if (settimeout is not None) and (_DEADLINE.get() is not None):
+            settimeout(_request_timeout(url))
+
+    @staticmethod
+    def _response_headers(headers: Message, num_attempt: int, time_used: float) -> _ResponseHeaders:
+        response_headers = _ResponseHeaders.from_message(headers)
         log.debug(
-            "Received response in attempt %s with declared content type %s, encoding %s, and content length %s in %.1fs.",
+            "Received response in attempt %s with declared content type %r, encoding %s, and content length %s in %.1fs.",
             num_attempt,
-            repr(content_type_header),
-            content_encoding_header,
-            content_len_humanized,
+            response_headers.content_type,
+            response_headers.content_encoding,
+            HumanizedBytes(response_headers.content_len),
             time_used,
         )
+        trace_event(
+            "response",
+            attempt=num_attempt,
+            seconds=time_used,
+            content_type=response_headers.content_type,
+            content_encoding=response_headers.content_encoding,
+            content_len=response_headers.content_len,
+        )
+        return response_headers
+
+    @staticmethod
+    def _is_html(headers: _ResponseHeaders) -> bool:
+        return headers.content_type_cf.startswith(cast(Tuple[str], config.CONTENT_TYPE_PREFIXES["html"]))
+
+    @staticmethod
+    def _is_pdf(headers: _ResponseHeaders) -> bool:
+        return headers.content_type_cf.startswith(cast(str, config.CONTENT_TYPE_PREFIXES["pdf"]))
+
+    @staticmethod
+    def _is_ipynb(url: str, headers: _ResponseHeaders) -> bool:
+        return url.endswith(".ipynb") and headers.content_type_cf.startswith(cast(str, config.CONTENT_TYPE_PREFIXES["ipynb"]))
+
+    @staticmethod
+    def _is_pdf_range_readable(response_headers: Message, headers: _ResponseHeaders) -> bool:
+        return (
+            (response_headers.get("Accept-Ranges", "").casefold() == "bytes")
+            and ((headers.content_len or 0) >= config.PDF_RANGE_MIN_CONTENT_LEN)
+            and not headers.content_encoding
+        )
 
-        # Return title from HTML
-        if content_type_header_str_cf.startswith(cast(Tuple[str], config.CONTENT_TYPE_PREFIXES["html"])):
-            # Iterate over content
-            content = b""
-            amt = self._guess_html_content_amount_for_title(url)
-            read = True
-            max_request_size = config.MAX_REQUEST_SIZES["html"]
-            try:
-                while read:
-                    log.debug(
-                        "Reading %s in this iteration with a total of %s read so far.",
-                        humanize_bytes(amt),
-                        humanize_len(content),
-                    )
-                    start_time = time.monotonic()
-                    content_new = response.read(amt)
-                    time_used = time.monotonic() - start_time
-                    read &= bool(content_new)
-                    content += content_new
-                    content_len = len(content)
-                    read &= content_len <= max_request_size
-                    log.debug(
-                        "Read %s in this iteration in %.1fs with a total of %s read so far.",
-                        humanize_len(content_new),
-                        time_used,
-                        humanize_bytes(content_len),
-                    )
-                    if not content_new:
-                        break
-                    content_decoded = (
-                        zlib.decompressobj(wbits=zlib.MAX_WBITS | 16).decompress(content) if (content_encoding_header == "gzip") else content
-                    )  # https://stackoverflow.com/a/56719274/
-                    title = self._title_from_partial_html_content(content_decoded, selector=overrides.get("selector"), strainer=overrides.get("strainer"))
-                    if not title:
-                        target_content_len = min(max_request_size, content_len * 2)
-                        amt = max(0, target_content_len - content_len)
-                        read &= bool(amt)
-                        continue
-                    self._update_html_content_amount_guess_for_title(url, content, title)  # Don't use content_decoded.
-
-                    if overrides.get("substitute_url_with_title"):
-                        log.info("Substituted URL %s with %s", url, title)
-                        return self._title_outer(title)
-                    log.debug(
-                        "Returning HTML title %s for URL %s after reading %s.",
-                        repr(title),
-                        url,
-                        humanize_bytes(content_len),
-                    )
-                    return title
-            finally:
-                response.close()
-            # Handle Distil captcha using Google web cache
-            if not (url.startswith(config.GOOGLE_WEBCACHE_URL_PREFIX)) and (b"distil_r_captcha.html" in content):
-                log.info("Content of URL %s has a Distil captcha. A Google cache version will be attempted.", url)
-                url = f"{config.GOOGLE_WEBCACHE_URL_PREFIX}{url}"
-                return self._title_outer(url)
-            log.warning("Unable to find title in HTML content of length %s for URL %s", humanize_bytes(content_len), url)
-
-        # Return title from PDF
-        elif content_type_header_str_cf.startswith(cast(str, config.CONTENT_TYPE_PREFIXES["pdf"])):
-            max_request_size = config.MAX_REQUEST_SIZES["pdf"]
-            if (content_len_header or 0) <= max_request_size:
-                content = response.read(max_request_size)
-                if len(content) < max_request_size:  # Is very likely an incomplete file if both sizes are equal.
-                    title = get_pdf_title(content)
-                    if title:  # pylint: disable=no-else-return
-                        log.debug("Returning PDF title %s for URL %s", repr(title), url)
-                        return title
-                    else:
-                        log.debug("Unable to find title in PDF content for URL %s", url)  # Quite common.
-                else:
-                    log.debug(
-                        "Undeclared and unknown content length for URL %s likely exceeds the configured PDF max of %s for reading it fully.",
-                        url,
-                        humanize_bytes(max_request_size),
-                    )
-            else:
-                log.debug(
-                    "Declared content length of %s for URL %s exceeds the configured PDF max of %s for reading " "it.",
-                    content_len_humanized,
-                    url,
-                    humanize_bytes(max_request_size),
-                )
-            # Try using Google web cache
-            log.debug("A Google cache version of the PDF URL %s will be attempted.", url)
-            try:
-                return self._title_outer(f"{config.GOOGLE_WEBCACHE_URL_PREFIX}{url}")
-            except URLTitleError as exc:
-                log.debug("The Google cache version failed for the PDF URL %s. %s", url, exc)
+    @staticmethod
+    def _pdf_title_ranges(url: str, headers: _ResponseHeaders) -> Generator[Tuple[int, int], bytes, str]:
+        log.debug("Reading title metadata of PDF URL %s of length %s using byte ranges.", url, HumanizedBytes(headers.content_len))
+        return pdf_title_ranges(
+            cast(int, headers.content_len), read_size=config.PDF_RANGE_READ_SIZE, max_reads=config.PDF_RANGE_MAX_READS, max_stream_size=config.MAX_REQUEST_SIZES["pdf"]
+        )
 
-        # Return title from IPYNB
-        elif url.endswith(".ipynb") and content_type_header_str_cf.startswith(cast(str, config.CONTENT_TYPE_PREFIXES["ipynb"])):
-            max_request_size = config.MAX_REQUEST_SIZES["ipynb"]
-            if (content_len_header or 0) <= max_request_size:
-                content = response.read(max_request_size)
-                if len(content) < max_request_size:  # Is very likely an incomplete file if both sizes are equal.
-                    title = get_ipynb_title(content)
-                    if title:  # pylint: disable=no-else-return
-                        log.debug("Returning IPYNB title %s for URL %s", repr(title), url)
-                        return title
-                    else:
-                        log.warning("Unable to find an IPYNB title for URL %s", url)
-                else:
-                    log.debug(
-                        "Undeclared and unknown content length for URL %s likely exceeds the configured IPYNB max of %s for reading it fully.",
-                        url,
-                        humanize_bytes(max_request_size),
-                    )
-            else:
-                log.debug(
-                    "Declared content length of %s for URL %s exceeds the configured IPYNB max of %s for reading it.",
-                    content_len_humanized,
-                    url,
-                    humanize_bytes(max_request_size),
-                )
+    @staticmethod
+    def _check_pdf_range_response(status: int, headers: Message, byte_range: Tuple[int, int]) -> None:
+        # Can raise: PDFRangeError
+        start, end = byte_range
+        content_range = headers.get("Content-Range", "")
+        if (status != 206) or not content_range.startswith(f"bytes {start}-{end - 1}/"):
+            raise PDFRangeError(f"Received status {status} with Content-Range {content_range!r} for requested byte range {start}-{end - 1}.")
+
+    @staticmethod
+    def _handle_pdf_range_error(url: str, exc: Exception) -> None:
+        if isinstance(exc, HTTPError):
+            exc.close()  # Releases the connection.
+        log.info(
+            "Unable to read title metadata of PDF URL %s using byte ranges. Its full content will be read if it is not too large. The error is: %s: %s",
+            url,
+            exc.__class__.__qualname__,
+            exc,
+        )
 
+    def _html_title_search(self, url: str, headers: Message, overrides: Mapping[str, Any]) -> _HTMLTitleSearch:
+        revalidation = self._revalidation(url)
+        offset = revalidation.cached.validators.offset if revalidation else None  # The title is likeliest to have stayed there.
+        return _HTMLTitleSearch(headers, overrides, offset or self._guess_html_content_amount_for_title(url))
+
+    def _html_outcome(self, url: str, search: _HTMLTitleSearch, headers: _ResponseHeaders, overrides: Mapping[str, Any]) -> _TitleOutcome:
+        content = search.content
+        content_len = search.content_len_read
+        title = search.title
+        if title:
+            offset = self._update_html_content_amount_guess_for_title(url, content, title, content_len)
+
+            if overrides.get("substitute_url_with_title"):
+                log.info("Substituted URL %s with %s", url, title)
+                return _TitleOutcome(None, title, is_redirect=True)
+            log.debug(
+                "Returning HTML title %r for URL %s after reading %s.",
+                title,
+                url,
+                HumanizedBytes(content_len),
+            )
+            return _TitleOutcome(title, offset=offset)
+
+        # Handle Distil captcha using Google web cache
+        if not (url.startswith(config.GOOGLE_WEBCACHE_URL_PREFIX)) and (b"distil_r_captcha.html" in content):
+            log.info("Content of URL %s has a Distil captcha. A Google cache version will be attempted.", url)
+            return _TitleOutcome(None, f"{config.GOOGLE_WEBCACHE_URL_PREFIX}{url}")
+        log.warning("Unable to find title in HTML content of length %s for URL %s", HumanizedBytes(content_len), url)
+        return self._headers_outcome(url, headers)
+
+    def _pdf_outcome(self, url: str, title: Optional[str], headers: _ResponseHeaders) -> _TitleOutcome:
+        if title:
+            log.debug("Returning PDF title %r for URL %s", title, url)
+            return _TitleOutcome(title)
+        if title is not None:
+            log.debug("Unable to find title in PDF content for URL %s", url)  # Quite common.
+        # Try using Google web cache
+        log.debug("A Google cache version of the PDF URL %s will be attempted.", url)
+        return _TitleOutcome(self._headers_outcome(url, headers).title, f"{config.GOOGLE_WEBCACHE_URL_PREFIX}{url}")
+
+    def _ipynb_outcome(self, url: str, title: Optional[str], headers: _ResponseHeaders) -> _TitleOutcome:
+        if title:
+            log.debug("Returning IPYNB title %r for URL %s", title, url)
+            return _TitleOutcome(title)
+        if title is not None:
+            log.warning("Unable to find an IPYNB title for URL %s", url)
+        return self._headers_outcome(url, headers)
+
+    @staticmethod
+    def _headers_outcome(url: str, headers: _ResponseHeaders) -> _TitleOutcome:
         # Fallback to return headers-based title
-        title_headers = content_type_header, content_encoding_header, content_len_humanized
-        title = " ".join(f"({h})" for h in title_headers if h is not None)
-        log.debug("Returning headers-derived title %s for URL %s", repr(title), url)
-        return title
+        title = headers.title()
+        log.debug("Returning headers-derived title %r for URL %s", title, url)
+        return _TitleOutcome(title)
 
-    def _title_outer(self, url: str) -> str:  # pylint: disable=method-hidden
+    def _substitute_title(self, url: str, title: str) -> str:
         netloc = self.netloc(url)
-        overrides = config.NETLOC_OVERRIDES.get(netloc, {})
-        overrides = cast(Dict, overrides)
-        title = self._title_inner(url)
-
-        # Note: This method is separate from self._title_inner because the actions below would have to otherwise be
-        # performed at multiple locations in self._title_inner.
-
-        # Retry title if configured blacklisted
-        config_key = "title_search:retry"
-        title_search_pattern = overrides.get(config_key)
-        if title_search_pattern and re.search(title_search_pattern, title):
-            original_title = title
-            max_reattempts = 10
-            for reattempt in range(1, max_reattempts + 1):
-                time.sleep(0.2 * (reattempt - 1))
-                log.info(f"As per {config_key} configuration for {netloc}, retrying title for {url} in reattempt {reattempt}/{max_reattempts}.")
-                title = self._title_inner(url)
-                if original_title != title:
-                    log.info(f'As per {config_key} configuration for {netloc}, substituted title "{original_title}" with "{title}" in reattempt {reattempt}/{max_reattempts}.')
-                    if not re.search(title_search_pattern, title):
-                        break
+        overrides = self._overrides(url)
 
         # Replace consecutive whitespaces
         title = " ".join(title.split())  # e.g. for https://t.co/wyGR7438TH
@@ -338,62 +519,25 @@ class URLTitleReader:
         config_key = "title_subs"
         for pattern, replacement in overrides.get(config_key, []):
             original_title = title
-            title = re.sub(pattern, replacement, title)
+            title = pattern.sub(replacement, title)
             if original_title != title:
-                log.info(f'As per by {config_key} configuration for {netloc}, substituted title "{original_title}" with "{title}".')
+                log.info('As per by %s configuration for %s, substituted title "%s" with "%s".', config_key, netloc, original_title, title)
 
         # # Substitute blacklisted title as configured
         # for title_pattern, url_subs in overrides.get("title_search:url_subs", {}).items():
         #     if re.search(title_pattern, title):
         #         for pattern, replacement in url_subs:
         #             original_url = url
-        #             url = re.sub(pattern, replacement, url)
+        #             url = pattern.sub(replacement, url)
         #             if original_url != url:
         #                 log.info("Substituted URL %s with %s", original_url, url)
         #                 return self._title_outer(url)
 
         return title
 
-    def _title_from_partial_html_content(self, content: bytes, *, selector: Optional[str] = None, strainer: Optional[str] = None) -> Optional[str]:
-        if selector:
-            bsoup = BeautifulSoup(content, features="html.parser")
-            try:
-                # title_text = eval(selector, {}, {"bs": bsoup})  # pylint: disable=eval-used
-                # Note: eval takes expression, globals, and locals, all as positional args.
-                title_text = bsoup.select_one(selector).text  # Ref: https://www.crummy.com/software/BeautifulSoup/bs4/doc/#css-selectors
-            except (AttributeError, KeyError, TypeError):
-                return self._title_from_partial_html_content(content, strainer=strainer)  # Retrying without custom selector.
-        else:
-            strainers = {strainer: config.STRAINERS[strainer]} if strainer else config.STRAINERS
-            for strainer_type, strainer_config in strainers.items():
-                bsoup = BeautifulSoup(content, features="html.parser", parse_only=SoupStrainer(strainer_config["name"], **strainer_config.get("kwargs", {})))
-                tag = getattr(bsoup, strainer_config["name"])
-                if tag:
-                    if "attr" in strainer_config:
-                        title_text = getattr(tag, strainer_config["attr"])
-                    else:
-                        title_text = tag["content"]
-                    if title_text:
-                        log.debug("Discovered raw HTML title using strainer %s: %s", repr(strainer_type), title_text)
-                        break
-            else:
-                if strainer:
-                    return self._title_from_partial_html_content(content)  # Retrying without custom strainer.
-                return None
-
-        # Check for incomplete title (inexactly)
-        if content.decode(bsoup.original_encoding, errors="ignore").endswith(title_text):
-            # Note: The alternative of using title_text.encode() fails for https://www.childstats.gov/americaschildren/tables/pop1.asp
-            return None
-
-        # Cleanup title
-        title_text = title_text.strip()  # Useful for https://www.ncbi.nlm.nih.gov/pubmed/12542348
-        if not title_text:
-            return None
-
-        return title_text
-
-    def _update_html_content_amount_guess_for_title(self, url: str, content: bytes, title: str) -> None:
+    def _update_html_content_amount_guess_for_title(self, url: str, content: Union[bytes, bytearray], title: str, content_len_read: int) -> int:
+        # Returns: Observed amount of the content to read for the title.
+        # Note: The content is decompressed, whereas the guess is of the amount to read before decompression.
         content_len = len(content)
         title = title.encode()
 
@@ -401,45 +545,428 @@ class URLTitleReader:
         padding = config.KiB  # For whitespace, closing title tag, and any minor randomness leading up to the title.
         observation = (observation + len(title) + padding) if (observation != -1) else content_len
         observation = min(observation, content_len + padding)
+        if content_len and (content_len != content_len_read):
+            observation = int(observation * content_len_read / content_len)  # Approximates the compressed position.
         observation = ceil_to_kib(observation)
 
-        netloc = self.netloc(url)
-        # This section is not thread safe, but that's okay as these are just estimates, and it won't crash.
-        old_guess = self._content_amount_guesses.get(netloc)
-        if old_guess is None:
-            new_guess = min(observation, config.MAX_REQUEST_SIZES["html"])
-            self._content_amount_guesses[netloc] = new_guess
-            log.info("Set HTML content amount guess for %s to %s.", netloc, humanize_bytes(new_guess))
-        elif old_guess != observation:
-            new_guess = int(mean((old_guess, observation)))  # May need a better technique.
-            new_guess = ceil_to_kib(new_guess)
-            new_guess = min(new_guess, config.MAX_REQUEST_SIZES["html"])
-            if old_guess != new_guess:
-                self._content_amount_guesses[netloc] = new_guess
-                log.info(
-                    "Updated HTML content amount guess for %s with observation %s from %s to %s.",
-                    netloc,
-                    humanize_bytes(observation),
-                    humanize_bytes(old_guess),
-                    humanize_bytes(new_guess),
-                )
-            else:
-                log.debug("HTML content amount guess for %s of %s is unchanged.", netloc, humanize_bytes(old_guess))
-        else:
-            log.debug("HTML content amount guess for %s of %s remains unchanged.", netloc, humanize_bytes(old_guess))
+        self.read_sizes.observe(url, observation)
+        log.debug("Observed HTML content amount for title of URL %s of %s.", url, HumanizedBytes(observation))
+        return observation
+
+    def close(self) -> None:
+        """Stop watching any override files, terminate the PDF title processes, and close the read sizes, and the title cache if it was created by this instance."""
+        if self._overrides_watcher:
+            self._overrides_watcher.stop()
+        self._pdf_title_pool.close()
+        self.read_sizes.close()
+        if self._owns_title_cache:
+            self._title_cache.close()
+
+    def _canonical_url(self, url: str) -> str:
+        # Note: This is the key of the cached redirect and error of the URL, and is used to deduplicate URLs in a batch.
+        return self.canonicalizer(url, kept_params=self._overrides(url).get("query_params:keep", ()))
+
+    def _title_key(self, url: str) -> str:
+        # Note: Equivalent URLs share the cached title of their final URL if they share its overrides.
+        return self._canonical_url(self._title_url(url))
+
+    def _title_url(self, url: str) -> str:
+        # Returns: Final URL of any cached redirect of the URL if the URL shares its title, otherwise the URL.
+        resolved_url = self.redirects.resolve(url)
+        return resolved_url if self._shares_title(url, resolved_url) else url
+
+    def _shares_title(self, url: str, resolved_url: str) -> bool:
+        # Note: The title of a URL is read and substituted using its own overrides, and so differs from that of its final URL if they differ.
+        return self._overrides(url) == self._overrides(resolved_url)
 
     def netloc(self, url: str) -> str:  # pylint: disable=method-hidden
         """Return the netloc for the given URL."""
-        parse_result = urlparse(url)
-        if parse_result.scheme == "":
-            return self.netloc(f"https://{url}")  # Without this, the returned netloc is erroneous.
-        netloc = parse_result.netloc.casefold()
-        if netloc.startswith("www."):
-            netloc = netloc[4:]
-        return netloc
-
-    def title(self, url: str) -> str:
-        """Return the title for the given URL."""
-        title = self._title_outer(url)
-        log.info("Returning title %s for URL %s", repr(title), url)
+        return url_netloc(url)
+
+
+class URLTitleReader(BaseURLTitleReader):
+    """URL title reader."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        title_cache_max_size: int = config.DEFAULT_CACHE_MAX_SIZE,
+        title_cache_ttl: float = config.DEFAULT_CACHE_TTL,
+        title_cache_stale_ttl: float = config.DEFAULT_CACHE_STALE_TTL,
+        title_cache_path: Optional[Union[str, Path]] = None,
+        title_cache: Optional[TitleCache] = None,
+        verify_ssl: bool = True,
+        trace_hook: Optional[Callable[[TitleTrace], None]] = None,
+        overrides_path: Optional[Union[str, Path]] = None,
+    ):
+        super().__init__(
+            title_cache_max_size=title_cache_max_size,
+            title_cache_ttl=title_cache_ttl,
+            title_cache_stale_ttl=title_cache_stale_ttl,
+            title_cache_path=title_cache_path,
+            title_cache=title_cache,
+            verify_ssl=verify_ssl,
+            trace_hook=trace_hook,
+            overrides_path=overrides_path,
+        )
+        self._title_flights: SingleFlight[str] = SingleFlight()
+        self._revalidation_executor = ThreadPoolExecutor(max_workers=config.REVALIDATION_MAX_WORKERS, thread_name_prefix=f"{self.__class__.__qualname__}.revalidation")
+        self._scheme_guess_executor = ThreadPoolExecutor(max_workers=config.URL_SCHEME_RACE_MAX_WORKERS, thread_name_prefix=f"{self.__class__.__qualname__}.scheme")
+        self._revalidations: Dict[str, "Future[None]"] = {}  # Keys of the stale cached titles being revalidated.
+        self._revalidations_lock = threading.Lock()
+        self._closed = False
+        self._netloc_slots = KeyedSemaphore(config.MAX_IN_FLIGHT_PER_HOST)
+        self._connection_pool = ConnectionPool(
+            max_idle_per_host=config.CONNECTION_POOL_MAX_IDLE_PER_HOST,
+            idle_timeout=config.CONNECTION_POOL_IDLE_TIMEOUT,
+            max_drain_size=config.CONNECTION_POOL_MAX_DRAIN_SIZE,
+            max_active_per_host=config.CONNECTION_POOL_MAX_ACTIVE_PER_HOST,
+        )
+
+    def _title_inner(self, url: str) -> str:
+        # Can raise: URLTitleError
+        max_attempts = config.MAX_REQUEST_ATTEMPTS
+        url = url.strip()
+        request_desc = f"request for title of URL {url}"
+        log.debug("Received %s with up to %s attempts.", request_desc, max_attempts)
+        overrides = self._overrides(url)
+
+        # Add scheme if missing
+        if urlparse(url).scheme == "":
+            return self._race_scheme_guesses(url)
+
+        # Substitute URL as configured
+        substituted_url = self._substitute_url(url, overrides)
+        if substituted_url:
+            trace_event("substitute_url", url=url, substituted_url=substituted_url)
+            return self._title_outer(substituted_url)
+
+        # Read title of any cached redirect which shares the title
+        resolved_url = self._title_url(url)
+        if resolved_url != url:
+            trace_event("redirect_cache", url=url, resolved_url=resolved_url)
+            try:
+                return self._title_outer(resolved_url)
+            except URLTitleError as exc:
+                log.info("Failed to read title of %s to which URL %s was previously redirected. The URL will be read instead. %s", resolved_url, url, exc)
+                self.redirects.forget(url)
+
+        # Read title
+        self._check_circuit(url)
+        with self._netloc_slot(url):  # Released before reading any other title because it may be for the same netloc.
+            outcome = self._title_outcome(url, overrides, request_desc)
+        if outcome.is_redirect:
+            self.redirects.record(url, cast(str, outcome.url))
+        if outcome.url:
+            if outcome.title is None:
+                return self._title_outer(outcome.url)
+            try:
+                return self._title_outer(outcome.url)
+            except URLTitleError as exc:
+                log.debug("The Google cache version failed for the PDF URL %s. %s", url, exc)
+        return cast(str, outcome.title)
+
+    def _title_outcome(self, url: str, overrides: Mapping[str, Any], request_desc: str) -> _TitleOutcome:
+        # Returns: Outcome of the response, or otherwise the URL of a permanent redirect.
+        # Can raise: URLTitleError
+        for num_attempt in range(1, config.MAX_REQUEST_ATTEMPTS + 1):
+            # Request
+            log.debug("Starting attempt %s processing %s", num_attempt, request_desc)
+            if num_attempt > 1:
+                time.sleep(self._retry_delay(url, num_attempt))
+                self._check_circuit(url)
+            start_time = time.monotonic()
+            try:
+                request = self._title_request(url, overrides)
+                response = self._opener().open(request, timeout=_request_timeout(url))
+                time_used = time.monotonic() - start_time
+            except REQUEST_ERRORS as exc:
+                self._record_request(url, exc, time.monotonic() - start_time)
+                self._check_not_modified(url, exc)
+                redirect_url = self._handle_request_error(exc, num_attempt, request_desc)
+                if redirect_url:
+                    return _TitleOutcome(None, redirect_url, is_redirect=True)
+                continue
+            else:
+                self._record_request(url, None, time_used)
+                break
+
+        title = self._redirected_title(url, response.url)
+        if title is not None:
+            response.close()
+            return _TitleOutcome(title)
+        try:
+            outcome = self._title_from_response(url, response, overrides, num_attempt, time_used)
+        finally:
+            response.close()
+        self._observe_validators(response.url, response.headers, outcome)
+        trace_event("outcome", url=url, title=outcome.title, fallback_url=outcome.url)
+        return outcome
+
+    @contextmanager
+    def _netloc_slot(self, url: str) -> Iterator[None]:
+        # Note: A slot is held for the duration of the context, limiting the number of concurrent requests to the netloc.
+        # Can raise: URLTitleError
+        netloc = self.netloc(url)
+        timeout = _request_timeout(url)
+        if not self._netloc_slots.acquire(netloc, timeout):
+            raise URLTitleError(f"Timed out after {timeout:.1f}s waiting for one of {config.MAX_IN_FLIGHT_PER_HOST} concurrent requests to {netloc} for URL {url}.", "timeout")
+        try:
+            yield
+        finally:
+            self._netloc_slots.release(netloc)
+
+    def _opener(self) -> OpenerDirector:
+        return build_opener(
+            CustomHTTPRedirectHandler(),  # Required for annemergmed.com
+            HTTPCookieProcessor(),  # Required for cell.com, tandfonline.com, etc.
+            PooledHTTPHandler(self._connection_pool),
+            PooledHTTPSHandler(self._connection_pool, context=self._ssl_context),  # Context is required for https://verizon.net, etc.
+        )
+
+    def _pdf_title_from_ranges(self, url: str, overrides: Mapping[str, Any], headers: _ResponseHeaders) -> Optional[str]:
+        # Returns: PDF title, or otherwise None if it could not be read using byte ranges.
+        ranges = self._pdf_title_ranges(url, headers)
+        opener = self._opener()
+        try:
+            byte_range = next(ranges)
+            while True:
+                with opener.open(self._pdf_range_request(url, overrides, byte_range), timeout=_request_timeout(url)) as response:
+                    self._check_pdf_range_response(response.status, response.headers, byte_range)
+                    self._shrink_read_timeout(url, response)
+                    content = response.read(byte_range[1] - byte_range[0])
+                trace_event("read", num_bytes=len(content), byte_range=byte_range)
+                byte_range = ranges.send(content)
+        except StopIteration as stop:
+            return stop.value
+        except (PDFRangeError, *REQUEST_ERRORS) as exc:
+            self._handle_pdf_range_error(url, exc)
+            return None
+
+    def _pdf_title_from_response(self, url: str, response: HTTPResponse, overrides: Mapping[str, Any], headers: _ResponseHeaders) -> Optional[str]:
+        # Note: The title is read from byte ranges if possible, and otherwise from the complete content if it is not too large.
+        title = self._pdf_title_from_ranges(response.url, overrides, headers) if self._is_pdf_range_readable(response.headers, headers) else None
+        max_request_size = _max_content_size(url, headers, "PDF") if (title is None) else None
+        if max_request_size:
+            self._shrink_read_timeout(url, response)
+            complete_content = _complete_content(url, response.read(max_request_size), headers, max_request_size, "PDF")
+            if complete_content is not None:
+                title = self._pdf_title_pool.title(complete_content, timeout=_remaining_time(url))
+        return title
+
+    def _title_from_response(self, url: str, response: HTTPResponse, overrides: Mapping[str, Any], num_attempt: int, time_used: float) -> _TitleOutcome:
+        headers = self._response_headers(response.headers, num_attempt, time_used)
+
+        # Return title from HTML
+        if self._is_html(headers):
+            search = self._html_title_search(url, response.headers, overrides)
+            while search.amount:
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Reading %s in this iteration with a total of %s read so far.", HumanizedBytes(search.amount), HumanizedBytes(search.content_len_read))
+                self._shrink_read_timeout(url, response)
+                start_time = time.monotonic()
+                with search.read_buffer() as buffer:
+                    num_read = response.readinto(buffer)
+                search.feed(url, num_read, time.monotonic() - start_time)
+            return self._html_outcome(url, search, headers, overrides)
+
+        # Return title from PDF
+        if self._is_pdf(headers):
+            return self._pdf_outcome(url, self._pdf_title_from_response(url, response, overrides, headers), headers)
+
+        # Return title from IPYNB
+        if self._is_ipynb(url, headers):
+            ipynb_search = _IPYNBTitleSearch(headers)
+            while ipynb_search.amount:
+                self._shrink_read_timeout(url, response)
+                ipynb_search.feed(url, response.read(ipynb_search.amount))
+            return self._ipynb_outcome(url, ipynb_search.title, headers)
+
+        return self._headers_outcome(url, headers)
+
+    def _race_scheme_guesses(self, url: str) -> str:
+        # Can raise: URLTitleError
+        # Note: A guess which is already running when the race is decided cannot be cancelled, and so it runs to completion in a bounded thread of the reader.
+        race = self._scheme_race(url)
+        futures: Dict[Future, int] = {}
+        try:
+            while True:
+                for index, (_, fixed_url) in race.due():
+                    futures[self._scheme_guess_executor.submit(copy_context().run, self._title_outer, fixed_url)] = index  # Keeps the trace current.
+                title = self._scheme_race_title(url, race)
+                if title is not None:
+                    return title
+                done, _ = wait(futures, timeout=race.timeout(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = futures.pop(future)
+                    try:
+                        race.succeed(index, future.result())
+                    except URLTitleError as exc:
+                        self._fail_scheme_guess(url, race, index, exc)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _title_outer(self, url: str) -> str:
+        key = self._title_key(url)
+        cached = self._title_cache.get_entry(key)
+        trace_event("cache", url=url, hit=cached is not None, stale=(cached is not None) and cached.is_stale)
+        if cached is not None:
+            if cached.is_stale:
+                self._revalidate_in_background(url, key, cached)
+            return cached.title
+        self._raise_cached_error(url)
+        try:
+            return self._title_flights.call(key, self._title_outer_missed, url, timeout=_remaining_time(url))  # Coalesces concurrent misses.
+        except URLTitleTimeoutError:
+            if _is_past_deadline():
+                raise
+            return self._title_outer_missed(url)  # The concurrent call ran out of its shorter time.
+
+    def _title_outer_missed(self, url: str) -> str:
+        title = self._title_cache.get(self._title_key(url))  # The title may have just been cached by a concurrent call.
+        if title is None:
+            self._raise_cached_error(url)
+            try:
+                with _collected_validators() as validators:
+                    title = self._title_outer_uncached(url)
+            except URLTitleError as exc:
+                self._cache_error(url, exc)
+                raise
+            self._cache_title(url, title, validators)
         return title
+
+    def _revalidate_in_background(self, url: str, key: str, cached: CachedTitle) -> None:
+        with self._revalidations_lock:
+            if self._closed or (key in self._revalidations):
+                return
+            log.debug("Revalidating stale cached title %r of URL %s in the background.", cached.title, url)
+            self._revalidations[key] = self._revalidation_executor.submit(self._revalidate, url, key, cached)
+
+    def _revalidate(self, url: str, key: str, cached: CachedTitle) -> None:
+        # Note: This runs in a thread of its own context, and so without the trace or the deadline of the title.
+        try:
+            with _revalidating(key, cached) as validators:
+                try:
+                    title: Optional[str] = self._title_outer_uncached(self._title_url(url))
+                except _NotModified:
+                    title = None
+            self._cache_revalidated_title(url, key, cached, title, validators)
+        except URLTitleError as exc:
+            log.info("Failed to revalidate stale cached title of URL %s. It is returned until it is revalidated or evicted. %s", url, exc)
+        finally:
+            with self._revalidations_lock:
+                self._revalidations.pop(key, None)
+
+    def _title_outer_uncached(self, url: str) -> str:
+        title = self._title_inner(url)
+
+        # Note: This method is separate from self._title_inner because the actions below would have to otherwise be
+        # performed at multiple locations in self._title_inner.
+
+        # Retry title if configured blacklisted
+        config_key = "title_search:retry"
+        title_search_pattern = self._overrides(url).get(config_key)
+        if title_search_pattern and title_search_pattern.search(title):
+            netloc = self.netloc(url)
+            original_title = title
+            max_reattempts = config.MAX_TITLE_SEARCH_REATTEMPTS
+            for reattempt in range(1, max_reattempts + 1):
+                time.sleep(min(0.2 * (reattempt - 1), _request_timeout(url)))
+                log.info("As per %s configuration for %s, retrying title for %s in reattempt %s/%s.", config_key, netloc, url, reattempt, max_reattempts)
+                title = self._title_inner(url)
+                if original_title != title:
+                    log.info(
+                        'As per %s configuration for %s, substituted title "%s" with "%s" in reattempt %s/%s.', config_key, netloc, original_title, title, reattempt, max_reattempts
+                    )
+                    if not title_search_pattern.search(title):
+                        break
+
+        return self._substitute_title(url, title)
+
+    def _title_or_error(self, url: str, timeout: Optional[float]) -> Union[str, URLTitleError]:
+        try:
+            return self.title(url, timeout=timeout)
+        except URLTitleError as exc:
+            return exc
+
+    def close(self) -> None:
+        """Cancel any pending revalidations, close any idle connections, stop watching any override files, terminate the PDF title processes, and close any owned title cache."""
+        with self._revalidations_lock:
+            self._closed = True
+            revalidations = list(self._revalidations.values())
+        for revalidation in revalidations:
+            revalidation.cancel()
+        wait(revalidations)  # The running ones use the connection pool, the PDF title processes, and the title cache.
+        self._revalidation_executor.shutdown(wait=False)
+        self._scheme_guess_executor.shutdown(wait=False)
+        self._connection_pool.close()
+        super().close()
+
+    def title(self, url: str, *, timeout: Optional[float] = None) -> str:
+        """Return the title for the given URL.
+
+        If a timeout in seconds is given, it bounds the total time of all requests, reads, retries and redirects, and
+        `URLTitleTimeoutError` is raised once it is exceeded.
+        """
+        with self._traced(url) as trace, _deadline(url, timeout):
+            title = self._title_outer(url)
+            trace.end(title=title)
+        log.info("Returning title %r for URL %s", title, url)
+        return title
+
+    def titles(  # pylint: disable=too-many-locals
+        self,
+        urls: Iterable[str],
+        *,
+        max_workers: int = config.DEFAULT_CONCURRENCY,
+        per_host_limit: int = config.DEFAULT_PER_HOST_CONCURRENCY,
+        timeout: Optional[float] = None,
+    ) -> Iterator[Tuple[str, Union[str, URLTitleError]]]:
+        """Yield each of the given URLs with its title, or otherwise with its error, as soon as it is read.
+
+        The titles are read in parallel by up to `max_workers` threads with up to `per_host_limit` concurrent reads per
+        netloc. Duplicate URLs are read only once. The URLs are yielded in the order in which their titles are read. Any
+        timeout in seconds applies to each title separately from when its read starts.
+        """
+        urls = iter(urls)
+        max_pending = max_workers * 4  # Limits how far ahead the input is consumed.
+        pending_urls: Dict[str, List[str]] = {}  # Normalized URL to its input URLs.
+        queued: Dict[str, Deque[str]] = defaultdict(deque)  # Netloc to its normalized URLs that are not yet submitted.
+        num_running: Dict[str, int] = defaultdict(int)  # Netloc to its number of submitted normalized URLs.
+        futures: Dict[Future, Tuple[str, str]] = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=self.__class__.__qualname__) as executor:
+
+            def submit(netloc: str) -> None:
+                netloc_queue = queued[netloc]
+                while netloc_queue and (num_running[netloc] < per_host_limit):
+                    key = netloc_queue.popleft()
+                    num_running[netloc] += 1
+                    futures[executor.submit(self._title_or_error, pending_urls[key][0], timeout)] = key, netloc
+                if not netloc_queue:
+                    del queued[netloc]
+
+            while True:
+                while len(pending_urls) < max_pending:
+                    url = next(urls, None)
+                    if url is None:
+                        break
+                    key = self._canonical_url(url)
+                    if key in pending_urls:
+                        pending_urls[key].append(url)
+                        continue
+                    pending_urls[key] = [url]
+                    netloc = self.netloc(url)
+                    queued[netloc].append(key)
+                    submit(netloc)
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, netloc = futures.pop(future)
+                    num_running[netloc] -= 1
+                    result = future.result()
+                    for url in pending_urls.pop(key):
+                        yield url, result
+                    submit(netloc)
@@ -0,0 +1,244 @@
+"""asyncio utilities."""
+import asyncio
+import io
+import ssl
+from collections import deque
+from http.client import HTTPMessage, RemoteDisconnected, parse_headers
+from http.cookiejar import CookieJar
+from socket import timeout as SocketTimeoutError
+from typing import Awaitable, Deque, Dict, Hashable, List, NamedTuple, Optional, Tuple, TypeVar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request
+
+_CONTENT_HEADERS = ("content-length", "content-type")
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_REDIRECT_CODES = (301, 302, 303, 307, 308)
+_READ_SIZE = 64 * 1024
+
+_T = TypeVar("_T")
+
+
+async def _wait_for(awaitable: Awaitable[_T], timeout: float) -> _T:
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise SocketTimeoutError("timed out") from None
+
+
+class _ResponseHead(NamedTuple):
+    """Status line and headers of a response."""
+
+    status: int
+    reason: str
+    headers: HTTPMessage
+
+
+class AsyncHTTPResponse:
+    """HTTP/1.1 response whose body is read using asyncio streams.
+
+    Similar to `http.client.HTTPResponse`, a read of a given amount returns less than it only at the end of the body.
+    """
+
+    def __init__(self, url: str, head: _ResponseHead, streams: Tuple[asyncio.StreamReader, asyncio.StreamWriter], timeout: float):
+        self.url = url
+        self.status, self.reason, self.headers = head
+        self._reader, self._writer = streams
+        self._timeout = timeout
+        self._chunked = "chunked" in self.headers.get("Transfer-Encoding", "").casefold()
+        content_len = self.headers.get("Content-Length")
+        self._length = int(content_len) if (content_len is not None) and not self._chunked else None  # Remaining length.
+        self._chunk_left = 0
+        self._eof = (self.status in (204, 304)) or (100 <= self.status < 200)
+
+    def info(self) -> HTTPMessage:
+        """Return the headers, as is required by `http.cookiejar.CookieJar`."""
+        return self.headers
+
+    def settimeout(self, timeout: float) -> None:
+        """Set the timeout in seconds of each further read of the response."""
+        self._timeout = timeout
+
+    def close(self) -> None:
+        """Close the connection."""
+        self._eof = True
+        self._writer.close()
+
+    async def read(self, amt: int = -1) -> bytes:
+        """Return the given amount of the body, or otherwise all of its remainder if the amount is negative."""
+        parts: List[bytes] = []
+        remaining = amt
+        while remaining:
+            part = await _wait_for(self._read_part(remaining if (remaining > 0) else _READ_SIZE), self._timeout)
+            if not part:
+                break
+            parts.append(part)
+            if remaining > 0:
+                remaining -= len(part)
+        return b"".join(parts)
+
+    async def readinto(self, buffer: memoryview) -> int:
+        """Read into the given buffer until it is full or the body ends, and return the number of bytes read."""
+        size = len(buffer)
+        num_read = 0
+        while num_read < size:
+            part = await _wait_for(self._read_part(size - num_read), self._timeout)
+            if not part:
+                break
+            buffer[num_read : num_read + len(part)] = part
+            num_read += len(part)
+        return num_read
+
+    async def _read_part(self, amt: int) -> bytes:
+        if self._eof:
+            return b""
+        if self._chunked:
+            if not self._chunk_left:
+                line = await self._reader.readline()
+                self._chunk_left = int(line.split(b";", 1)[0].strip() or b"0", 16)
+                if not self._chunk_left:
+                    while (await self._reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass  # Discarding trailers.
+                    self._eof = True
+                    return b""
+            data = await self._reader.read(min(amt, self._chunk_left))
+            self._chunk_left -= len(data)
+            if not self._chunk_left:
+                await self._reader.readline()
+        else:
+            if self._length is not None:
+                amt = min(amt, self._length)
+            data = await self._reader.read(amt) if amt else b""
+            if self._length is not None:
+                self._length -= len(data)
+        if not data:
+            self._eof = True
+        return data
+
+
+async def _read_head(reader: asyncio.StreamReader) -> _ResponseHead:
+    while True:
+        status_line = await reader.readline()
+        if not status_line:
+            raise RemoteDisconnected("Remote end closed connection without response")
+        try:
+            version, status_str, *reason = status_line.decode("iso-8859-1").split(None, 2)
+            status = int(status_str)
+        except ValueError:
+            raise URLError(f"Bad status line: {status_line!r}") from None
+        if not version.startswith("HTTP/"):
+            raise URLError(f"Bad status line: {status_line!r}")
+        header_lines = []
+        while True:
+            line = await reader.readline()
+            header_lines.append(line)
+            if line in (b"\r\n", b"\n", b""):
+                break
+        if status != 100:
+            headers = parse_headers(io.BytesIO(b"".join(header_lines)))
+            return _ResponseHead(status, (reason[0].strip() if reason else ""), headers)
+
+
+async def _open(request: Request, *, timeout: float, ssl_context: ssl.SSLContext) -> AsyncHTTPResponse:  # pylint: disable=too-many-locals
+    url = request.full_url
+    parse_result = urlsplit(url)
+    scheme = parse_result.scheme
+    if scheme not in _DEFAULT_PORTS:
+        raise URLError(f"unknown url type: {scheme}")
+    host = parse_result.hostname
+    if not host:
+        raise URLError("no host given")
+    is_https = scheme == "https"
+    try:
+        connection = asyncio.open_connection(host, parse_result.port or _DEFAULT_PORTS[scheme], ssl=ssl_context if is_https else None, server_hostname=host if is_https else None)
+        reader, writer = await _wait_for(connection, timeout)
+    except OSError as exc:
+        if isinstance(exc, SocketTimeoutError):
+            raise
+        raise URLError(exc) from None
+
+    headers = {"Host": request.host, **{name.title(): str(val) for name, val in request.header_items()}, "Connection": "close"}
+    head = f"{request.get_method()} {request.selector} HTTP/1.1\r\n" + "".join(f"{name}: {val}\r\n" for name, val in headers.items()) + "\r\n"
+    try:
+        writer.write(head.encode("iso-8859-1"))
+        await _wait_for(writer.drain(), timeout)
+        response_head = await _wait_for(_read_head(reader), timeout)
+    except BaseException:
+        writer.close()
+        raise
+    return AsyncHTTPResponse(url, response_head, (reader, writer), timeout)
+
+
+async def open_url(request: Request, *, timeout: float, ssl_context: ssl.SSLContext, cookie_jar: Optional[CookieJar] = None, max_redirections: int = 10) -> AsyncHTTPResponse:
+    """Return the response for the request after following any redirections.
+
+    Errors are raised using the same exception types as `urllib.request.urlopen`.
+    """
+    for _ in range(max_redirections + 1):
+        if cookie_jar is not None:
+            cookie_jar.add_cookie_header(request)
+        response = await _open(request, timeout=timeout, ssl_context=ssl_context)
+        if cookie_jar is not None:
+            cookie_jar.extract_cookies(response, request)  # type: ignore
+        location = response.headers.get("Location") or response.headers.get("URI")
+        if (response.status in _REDIRECT_CODES) and location:
+            response.close()
+            new_url = urljoin(request.full_url, location)
+            if urlsplit(new_url).scheme not in _DEFAULT_PORTS:
+                raise HTTPError(new_url, response.status, f"Redirection to url '{new_url}' is not allowed", response.headers, io.BytesIO())
+            headers = {name: val for name, val in request.headers.items() if name.casefold() not in _CONTENT_HEADERS}
+            request = Request(new_url, headers=headers, origin_req_host=request.origin_req_host, unverifiable=True)
+            continue
+        if not 200 <= response.status < 300:
+            response.close()
+            raise HTTPError(response.url, response.status, response.reason, response.headers, io.BytesIO())
+        return response
+    msg = f"The HTTP server returned a redirect error that would lead to an infinite loop.\nThe last 30x error message was:\n{response.reason}"
+    raise HTTPError(response.url, response.status, msg, response.headers, io.BytesIO())
+
+
+class AsyncKeyedSemaphore:
+    """Semaphore with the given value for each key, with state kept only for the keys which are acquired.
+
+    It must be used in a single event loop. A released slot is handed over to the longest waiting acquirer of its key.
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._counts: Dict[Hashable, int] = {}
+        self._waiters: Dict[Hashable, Deque["asyncio.Future[None]"]] = {}
+
+    async def acquire(self, key: Hashable) -> None:
+        """Acquire the semaphore of the key, waiting for it as necessary."""
+        count = self._counts.get(key, 0)
+        if count < self._value:
+            self._counts[key] = count + 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(key)  # The slot was handed over before the cancellation.
+            else:
+                waiters = self._waiters.get(key)
+                if waiters and (waiter in waiters):  # It may have been skipped by a release.
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._waiters[key]
+            raise
+
+    def release(self, key: Hashable) -> None:
+        """Release the semaphore of the key."""
+        waiters = self._waiters.get(key)
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiters:
+                del self._waiters[key]
+            if not waiter.done():
+                waiter.set_result(None)  # The slot is handed over without changing the count.
+                return
+        count = self._counts.pop(key) - 1
+        if count:
+            self._counts[key] = count
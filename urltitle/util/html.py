@@ -0,0 +1,113 @@
+"""html utilities."""
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+_DECLARED_ENCODING_PATTERN = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*(?P<encoding>[\w:.\-]+)""", re.IGNORECASE)
+_DECLARED_ENCODING_SEARCH_SIZE = 4096
+
+_Bytes = Union[bytes, bytearray, memoryview]
+
+
+def _lookup_encoding(encoding: Optional[str]) -> Optional[str]:
+    if not encoding:
+        return None
+    try:
+        return codecs.lookup(encoding.strip()).name
+    except LookupError:
+        return None
+
+
+class HTMLTitleScanner(HTMLParser):
+    """Incremental scanner of HTML content for a title.
+
+    The content is fed in chunks as it is read. The parser state is kept across chunks, and so each chunk is parsed only
+    once. The strainers are in the order of their priority.
+    """
+
+    def __init__(self, strainers: Dict[str, Dict[str, Any]], *, encoding: Optional[str] = None):
+        super().__init__(convert_charrefs=True)
+        self._strainers: List[Tuple[str, str, Dict[str, str], bool]] = []
+        for strainer_type, strainer_config in strainers.items():
+            kwargs = strainer_config.get("kwargs", {})
+            attrs = {**kwargs.get("attrs", {}), **{k: v for k, v in kwargs.items() if k != "attrs"}}
+            self._strainers.append((strainer_type, strainer_config["name"], attrs, strainer_config.get("attr") == "text"))
+        self._encoding = _lookup_encoding(encoding)
+        self._decoder: Optional[codecs.IncrementalDecoder] = None
+        self._titles: Dict[str, str] = {}
+        self._open_strainer: Optional[str] = None
+        self._open_text: List[str] = []
+        self.head_ended = False
+
+    def _init_decoder(self, data: _Bytes) -> None:
+        data_start = bytes(data[:4])
+        encoding = next((e for bom, e in _BOMS if data_start.startswith(bom)), None) or self._encoding
+        if not encoding:
+            match = _DECLARED_ENCODING_PATTERN.search(data, 0, _DECLARED_ENCODING_SEARCH_SIZE)
+            encoding = _lookup_encoding(match["encoding"].decode("ascii")) if match else None
+        if not encoding:
+            try:
+                codecs.getincrementaldecoder("utf-8")().decode(data)
+            except UnicodeDecodeError:
+                encoding = "windows-1252"
+            else:
+                encoding = "utf-8"
+        self._encoding = encoding
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    @property
+    def encoding(self) -> Optional[str]:
+        """Return the encoding used to decode the content, if yet known."""
+        return self._encoding if self._decoder else None
+
+    def feed_bytes(self, data: _Bytes) -> None:
+        """Decode and feed the next chunk of content."""
+        if self._decoder is None:
+            self._init_decoder(data)
+        self.feed(self._decoder.decode(data))  # type: ignore
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self._open_strainer:
+            return
+        attrs_dict = None
+        for strainer_type, name, strainer_attrs, is_text in self._strainers:
+            if (tag != name) or (strainer_type in self._titles):
+                continue
+            if attrs_dict is None:
+                attrs_dict = dict(attrs)
+            if any(attrs_dict.get(k) != v for k, v in strainer_attrs.items()):
+                continue
+            if is_text:
+                self._open_strainer = strainer_type
+                self._open_text = []
+            else:
+                self._titles[strainer_type] = attrs_dict.get("content") or ""
+            return
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._open_strainer:
+            if tag == next(name for strainer_type, name, _, _ in self._strainers if strainer_type == self._open_strainer):
+                self._titles[self._open_strainer] = "".join(self._open_text)
+                self._open_strainer = None
+                self._open_text = []
+        elif tag == "head":
+            self.head_ended = True
+
+    def handle_data(self, data: str) -> None:
+        if self._open_strainer:
+            self._open_text.append(data)
+
+    def title(self) -> Tuple[Optional[str], Optional[str]]:
+        """Return the highest priority complete title found so far along with its strainer type.
+
+        A title is not returned while a higher priority title is still incomplete.
+        """
+        for strainer_type, _, _, _ in self._strainers:
+            if strainer_type == self._open_strainer:
+                break
+            title = self._titles.get(strainer_type, "").strip()
+            if title:
+                return title, strainer_type
+        return None, None
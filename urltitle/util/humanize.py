@@ -13,6 +13,21 @@ def humanize_bytes(num_bytes: Optional[int]) -> Optional[str]:
     return _humanize_bytes(num_bytes) if num_bytes is not None else None
 
 
+class HumanizedBytes:
+    """Optional number of bytes which is humanized only when it is formatted as a string.
+
+    It is for use as a logging argument, so that it is humanized only if its log record is emitted.
+    """
+
+    __slots__ = ("num_bytes",)
+
+    def __init__(self, num_bytes: Optional[int]):
+        self.num_bytes = num_bytes
+
+    def __str__(self) -> str:
+        return str(humanize_bytes(self.num_bytes))
+
+
 def humanize_len(text: bytes) -> str:
     """Return the length of a bytes object as a humanized string."""
     return _humanize_bytes(len(text))
@@ -1,14 +1,220 @@
 """json utilities."""
 import json
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 
+_Bytes = Union[bytes, bytearray, memoryview]
+_Path = Tuple[str, ...]
 
-def get_ipynb_title(json_bytes: bytes) -> str:
-    """Return the title from the bytes representing a JSON representation of an IPYNB notebook."""
-    obj = json.loads(json_bytes)
-    metadata = obj.get("metadata", {})
-    title = metadata.get("colab", {}).get("name", "").strip()
-    if title:
-        kernel = metadata.get("kernelspec", {}).get("display_name")
-        if kernel:
-            title += f" ({kernel})"
-    return title
+_MAX_TOKEN_SIZE = 64 * 1024  # Max size of a tracked key or value.
+_WHITESPACE_PATTERN = re.compile(rb"[ \t\n\r]*")
+_STRING_END_PATTERN = re.compile(rb'[\\"]')
+_SKIPPED_VALUE_PATTERN = re.compile(rb'[{}\[\]"]')
+_PRIMITIVE_PATTERN = re.compile(rb"[^,}\] \t\n\r]*")
+
+
+class JSONPathScanner:  # pylint: disable=too-many-instance-attributes
+    """Incremental scanner of JSON content for the string values at the given paths of object keys.
+
+    The content is fed in chunks as it is read. Only the objects leading to the paths are tracked. Any other values, however
+    large, are skipped over without being decoded or kept, and so memory use is bounded regardless of the content size.
+    Scanning is done once each path has been found or has ended, or if the content is found to be invalid.
+    """
+
+    def __init__(self, paths: Iterable[_Path]):
+        self._pending: Set[_Path] = set(paths)
+        self._prefixes = {path[:i] for path in self._pending for i in range(1, len(path))}
+        self.values: Dict[_Path, str] = {}
+        self.done = not self._pending
+        self._state = "root"
+        self._path: List[str] = []  # Keys of the tracked objects leading to the current one.
+        self._key = ""
+        self._token = bytearray()  # Tracked key or value being read.
+        self._is_key = False
+        self._skip_depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def _stop(self) -> None:
+        self.done = True
+        self._state = "done"
+
+    def _skip_whitespace(self, data: bytes, pos: int) -> int:
+        return _WHITESPACE_PATTERN.match(data, pos).end()  # type: ignore  # The pattern always matches.
+
+    def _string_end(self, data: bytes, pos: int) -> Tuple[int, bool]:
+        # Returns: Position after the string or the data, and whether the string ended.
+        if self._escaped:
+            self._escaped = False
+            pos += 1
+        while True:
+            match = _STRING_END_PATTERN.search(data, pos)
+            if match is None:
+                return len(data), False
+            if match.group() == b'"':
+                return match.end(), True
+            if match.end() == len(data):
+                self._escaped = True
+                return len(data), False
+            pos = match.end() + 1
+
+    def _close_object(self) -> None:
+        if not self._path:
+            self._stop()  # The root object ended.
+            return
+        path = tuple(self._path)
+        self._path.pop()
+        self._pending = {pending for pending in self._pending if pending[: len(path)] != path}
+        if not self._pending:
+            self._stop()
+        self._state = "after_value"
+
+    def _feed_root(self, data: bytes, pos: int) -> int:
+        pos = self._skip_whitespace(data, pos)
+        if pos < len(data):
+            if data[pos : pos + 1] != b"{":
+                self._stop()
+                return pos
+            self._state = "key"
+            pos += 1
+        return pos
+
+    def _feed_key(self, data: bytes, pos: int) -> int:
+        pos = self._skip_whitespace(data, pos)
+        char = data[pos : pos + 1]
+        if char == b'"':
+            self._state, self._is_key = "string", True
+            return pos + 1
+        if char == b"}":
+            self._close_object()
+            return pos + 1
+        if char:
+            self._stop()
+        return pos
+
+    def _feed_colon(self, data: bytes, pos: int) -> int:
+        pos = self._skip_whitespace(data, pos)
+        char = data[pos : pos + 1]
+        if char == b":":
+            self._state = "value"
+            return pos + 1
+        if char:
+            self._stop()
+        return pos
+
+    def _feed_value(self, data: bytes, pos: int) -> int:
+        pos = self._skip_whitespace(data, pos)
+        char = data[pos : pos + 1]
+        path = (*self._path, self._key)
+        if not char:
+            return pos
+        if char == b'"':
+            if path in self._pending:
+                self._state, self._is_key = "string", False
+            else:
+                self._state, self._skip_depth, self._in_string = "skip", 0, True
+            return pos + 1
+        if (char == b"{") and (path in self._prefixes):
+            self._path.append(self._key)
+            self._state = "key"
+            return pos + 1
+        if char in (b"{", b"["):
+            self._state, self._skip_depth = "skip", 1
+            return pos + 1
+        self._state = "primitive"
+        return pos
+
+    def _feed_after_value(self, data: bytes, pos: int) -> int:
+        pos = self._skip_whitespace(data, pos)
+        char = data[pos : pos + 1]
+        if char == b",":
+            self._state = "key"
+            return pos + 1
+        if char == b"}":
+            self._close_object()
+            return pos + 1
+        if char:
+            self._stop()
+        return pos
+
+    def _feed_string(self, data: bytes, pos: int) -> int:
+        end, is_ended = self._string_end(data, pos)
+        self._token += data[pos : (end - 1) if is_ended else end]
+        if len(self._token) > _MAX_TOKEN_SIZE:
+            self._stop()
+            return end
+        if is_ended:
+            try:
+                string = json.loads(b'"' + self._token + b'"')
+            except ValueError:
+                self._stop()
+                return end
+            self._token.clear()
+            if self._is_key:
+                self._key = string
+                self._state = "colon"
+            else:
+                path = (*self._path, self._key)
+                self.values[path] = string
+                self._pending.discard(path)
+                self._state = "after_value"
+                if not self._pending:
+                    self._stop()
+        return end
+
+    def _feed_skip(self, data: bytes, pos: int) -> int:
+        while pos < len(data):
+            if self._in_string:
+                pos, is_ended = self._string_end(data, pos)
+                if not is_ended:
+                    break
+                self._in_string = False
+            elif self._skip_depth:
+                match = _SKIPPED_VALUE_PATTERN.search(data, pos)
+                if match is None:
+                    return len(data)
+                char, pos = match.group(), match.end()
+                if char == b'"':
+                    self._in_string = True
+                else:
+                    self._skip_depth += 1 if char in b"{[" else -1
+            if not (self._in_string or self._skip_depth):
+                self._state = "after_value"
+                break
+        return pos
+
+    def _feed_primitive(self, data: bytes, pos: int) -> int:
+        pos = _PRIMITIVE_PATTERN.match(data, pos).end()  # type: ignore  # The pattern always matches.
+        if pos < len(data):
+            self._state = "after_value"
+        return pos
+
+    def feed_bytes(self, data: _Bytes) -> None:
+        """Scan the given chunk of content."""
+        data = bytes(data)
+        pos = 0
+        while (pos < len(data)) and not self.done:
+            pos = getattr(self, f"_feed_{self._state}")(data, pos)
+
+
+IPYNB_TITLE_PATHS = ("metadata", "colab", "name"), ("metadata", "kernelspec", "display_name")
+
+
+class IPYNBTitleScanner(JSONPathScanner):
+    """Incremental scanner of the JSON content of an IPYNB notebook for its title.
+
+    The cells of the notebook, which usually precede its metadata, are skipped over.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(IPYNB_TITLE_PATHS)
+
+    def title(self) -> str:
+        """Return the title, which is empty if it was not found."""
+        name_path, kernel_path = IPYNB_TITLE_PATHS
+        title = self.values.get(name_path, "").strip()
+        if title:
+            kernel: Optional[str] = self.values.get(kernel_path)
+            if kernel:
+                title += f" ({kernel})"
+        return title
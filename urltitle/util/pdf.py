@@ -0,0 +1,506 @@
+"""PDF utilities."""
+import html
+import re
+import zlib
+from typing import Any, Callable, Dict, Generator, List, Match, NamedTuple, Optional, Set, Tuple, TypeVar, Union
+
+_T = TypeVar("_T")
+_Reads = Generator[Tuple[int, int], bytes, _T]  # Yields byte ranges, is sent their content, and returns a result.
+
+_WHITESPACE_RE = re.compile(rb"[\x00\t\n\x0c\r ]*")
+_REGULAR_RE = re.compile(rb"[^\x00\t\n\x0c\r ()<>\[\]{}/%]*")
+_NUMBER_RE = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+_EOL_RE = re.compile(rb"[\r\n]")
+_LITERAL_STRING_RE = re.compile(rb"[()\\\r]")
+_OCTAL_RE = re.compile(rb"[0-7]{1,3}")
+_NAME_ESCAPE_RE = re.compile(rb"#([0-9A-Fa-f]{2})")
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)")
+_XMP_TITLE_RE = re.compile(r"<dc:title\b[^>]*>(.*?)</dc:title>", re.DOTALL)
+_XMP_ITEM_RE = re.compile(r"<rdf:li\b[^>]*>(.*?)</rdf:li>", re.DOTALL)
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f", b"(": b"(", b")": b")", b"\\": b"\\"}
+_KEYWORD_VALUES = {b"true": True, b"false": False, b"null": None}
+_XREF_ENTRY_SIZE = 20
+_MAX_XREF_SECTIONS = 32
+_MAX_REFERENCE_DEPTH = 8
+_MAX_NESTING_DEPTH = 64  # Of arrays and dictionaries.
+
+
+class PDFRangeError(ValueError):
+    """Error in locating the title metadata of a PDF using byte ranges."""
+
+
+class _Incomplete(Exception):
+    """The content ended before the object being parsed."""
+
+
+class _Ref(NamedTuple):
+    num: int
+    gen: int
+
+
+class _Stream(NamedTuple):
+    dict: Dict[str, Any]
+    data: bytes  # Decoded
+
+
+class _XRefTable(NamedTuple):
+    subsections: List[Tuple[int, int, int]]  # First object number, number of entries, and offset of entries.
+    trailer: Dict[str, Any]
+
+
+class _XRefStream(NamedTuple):
+    entries: Dict[int, Tuple[int, int, int]]  # Object number to entry type and its two fields.
+    trailer: Dict[str, Any]
+
+
+_XRefSection = Union[_XRefTable, _XRefStream]
+
+
+def _matched(match: Optional[Match[bytes]]) -> Match[bytes]:
+    assert match is not None  # The pattern always matches.
+    return match
+
+
+class _Parser:
+    """Parser of PDF objects in partial content.
+
+    Names are returned as `str` without their leading slash, and strings as `bytes`. `_Incomplete` is raised if the content
+    ends before the object being parsed.
+    """
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def skip_whitespace(self) -> None:
+        """Skip any whitespace and comments."""
+        data = self.data
+        while True:
+            self.pos = _matched(_WHITESPACE_RE.match(data, self.pos)).end()
+            if self.pos >= len(data):
+                raise _Incomplete
+            if data[self.pos] != ord("%"):
+                return
+            eol = _EOL_RE.search(data, self.pos)
+            if eol is None:
+                raise _Incomplete
+            self.pos = eol.end()
+
+    def _regular(self) -> bytes:
+        match = _matched(_REGULAR_RE.match(self.data, self.pos))
+        if match.end() >= len(self.data):
+            raise _Incomplete  # The token may continue.
+        self.pos = match.end()
+        return match.group()
+
+    def keyword(self) -> bytes:
+        """Return the next token of regular characters, which is empty if the next character is a delimiter."""
+        self.skip_whitespace()
+        return self._regular()
+
+    def stream_start(self) -> Optional[int]:
+        """Return the position of the stream data if a stream follows the parsed dictionary, otherwise None."""
+        if self.keyword() != b"stream":
+            return None
+        data, pos = self.data, self.pos
+        if pos + 1 >= len(data):
+            raise _Incomplete
+        if data[pos : pos + 2] == b"\r\n":
+            return pos + 2
+        return pos + 1 if data[pos : pos + 1] in (b"\n", b"\r") else pos
+
+    def parse(self, depth: int = 0) -> Any:
+        """Return the next object, which is nested in the given number of arrays and dictionaries."""
+        if depth > _MAX_NESTING_DEPTH:
+            raise PDFRangeError(f"Exceeded the max nesting depth of {_MAX_NESTING_DEPTH} at position {self.pos}.")
+        self.skip_whitespace()
+        data, pos = self.data, self.pos
+        char = data[pos : pos + 1]
+        if char == b"/":
+            self.pos += 1
+            return _NAME_ESCAPE_RE.sub(lambda match: bytes.fromhex(match.group(1).decode()), self._regular()).decode("latin-1")
+        if char == b"(":
+            return self._literal_string()
+        if char == b"<":
+            if pos + 1 >= len(data):
+                raise _Incomplete
+            return self._dict(depth) if data[pos + 1] == ord("<") else self._hex_string()
+        if char == b"[":
+            self.pos += 1
+            array: List[Any] = []
+            while True:
+                self.skip_whitespace()
+                if self.data[self.pos] == ord("]"):
+                    self.pos += 1
+                    return array
+                array.append(self.parse(depth + 1))
+        token = self._regular()
+        if _NUMBER_RE.fullmatch(token):
+            return float(token) if b"." in token else self._int_or_ref(int(token))
+        if token in _KEYWORD_VALUES:
+            return _KEYWORD_VALUES[token]
+        raise PDFRangeError(f"Unexpected token {(token or char)!r} at position {pos}.")
+
+    def _int_or_ref(self, num: int) -> Union[int, _Ref]:
+        pos = self.pos
+        try:
+            gen = self.keyword()
+            if gen.isdigit() and (self.keyword() == b"R"):
+                return _Ref(num, int(gen))
+        except _Incomplete:
+            pass  # An integer at the end of the content is not a reference.
+        self.pos = pos
+        return num
+
+    def _dict(self, depth: int) -> Dict[str, Any]:
+        self.pos += 2
+        dict_: Dict[str, Any] = {}
+        while True:
+            self.skip_whitespace()
+            if self.pos + 1 >= len(self.data):
+                raise _Incomplete
+            if self.data[self.pos : self.pos + 2] == b">>":
+                self.pos += 2
+                return dict_
+            key = self.parse(depth + 1)
+            if not isinstance(key, str):
+                raise PDFRangeError(f"Invalid dictionary key {key!r} at position {self.pos}.")
+            dict_[key] = self.parse(depth + 1)
+
+    def _hex_string(self) -> bytes:
+        end = self.data.find(b">", self.pos)
+        if end == -1:
+            raise _Incomplete
+        hex_ = re.sub(rb"\s", b"", self.data[self.pos + 1 : end])
+        self.pos = end + 1
+        try:
+            return bytes.fromhex((hex_ + b"0" * (len(hex_) % 2)).decode())
+        except ValueError:
+            raise PDFRangeError(f"Invalid hexadecimal string {hex_!r}.") from None
+
+    def _literal_string(self) -> bytes:
+        data = self.data
+        pos = self.pos + 1
+        depth = 1
+        string = bytearray()
+        while True:
+            match = _LITERAL_STRING_RE.search(data, pos)
+            if match is None:
+                raise _Incomplete
+            string += data[pos : match.start()]
+            char, pos = match.group(), match.end()
+            if char == b"\\":
+                if pos >= len(data):
+                    raise _Incomplete
+                escaped = data[pos : pos + 1]
+                if escaped in _ESCAPES:
+                    string += _ESCAPES[escaped]
+                    pos += 1
+                elif escaped.isdigit() and (escaped not in b"89"):
+                    octal = _matched(_OCTAL_RE.match(data, pos))
+                    string.append(int(octal.group(), 8) & 0xFF)
+                    pos = octal.end()
+                elif escaped in b"\r\n":  # Line continuation
+                    pos += 2 if (data[pos : pos + 2] == b"\r\n") else 1
+                else:
+                    string += escaped
+                    pos += 1
+            elif char == b"\r":
+                string += b"\n"
+                pos += 1 if (data[pos : pos + 1] == b"\n") else 0
+            elif char == b"(":
+                depth += 1
+                string += char
+            else:
+                depth -= 1
+                if not depth:
+                    self.pos = pos
+                    return bytes(string)
+                string += char
+
+
+def _png_unpredict(data: bytes, columns: int, bytes_per_pixel: int) -> bytes:
+    row_len = columns * bytes_per_pixel
+    prev = bytearray(row_len)
+    rows = bytearray()
+    for start in range(0, len(data) - row_len, row_len + 1):
+        filter_type, row = data[start], bytearray(data[start + 1 : start + 1 + row_len])
+        for i in range(row_len):
+            left = row[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+            up_left = prev[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+            if filter_type == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif filter_type == 2:
+                row[i] = (row[i] + prev[i]) & 0xFF
+            elif filter_type == 3:
+                row[i] = (row[i] + (left + prev[i]) // 2) & 0xFF
+            elif filter_type == 4:
+                estimate = left + prev[i] - up_left
+                distances = abs(estimate - left), abs(estimate - prev[i]), abs(estimate - up_left)
+                row[i] = (row[i] + (left, prev[i], up_left)[distances.index(min(distances))]) & 0xFF
+        rows += row
+        prev = row
+    return bytes(rows)
+
+
+def _decode_stream(stream_dict: Dict[str, Any], data: bytes, max_size: int) -> bytes:
+    filters = stream_dict.get("Filter") or []
+    filters = filters if isinstance(filters, list) else [filters]
+    params = stream_dict.get("DecodeParms") or [None] * len(filters)
+    params = params if isinstance(params, list) else [params]
+    for filter_, filter_params in zip(filters, params):
+        if filter_ not in ("FlateDecode", "Fl"):
+            raise PDFRangeError(f"Unsupported stream filter {filter_}.")
+        decompressor = zlib.decompressobj()
+        data = decompressor.decompress(data, max_size)
+        if decompressor.unconsumed_tail:
+            raise PDFRangeError(f"Decoded stream exceeds the max size of {max_size} bytes.")
+        predictor = (filter_params or {}).get("Predictor", 1)
+        if predictor >= 10:
+            bytes_per_pixel = max(1, filter_params.get("Colors", 1) * filter_params.get("BitsPerComponent", 8) // 8)
+            data = _png_unpredict(data, filter_params.get("Columns", 1), bytes_per_pixel)
+        elif predictor != 1:
+            raise PDFRangeError(f"Unsupported stream predictor {predictor}.")
+    return data
+
+
+def _decode_text(string: bytes) -> str:
+    if string.startswith(b"\xfe\xff"):
+        return string[2:].decode("utf-16-be", errors="replace")
+    if string.startswith(b"\xef\xbb\xbf"):
+        return string[3:].decode("utf-8", errors="replace")
+    return string.decode("latin-1")  # Approximates PDFDocEncoding.
+
+
+def _xmp_title(xmp: bytes) -> str:
+    title = _XMP_TITLE_RE.search(xmp.decode("utf-8", errors="replace"))
+    if title is None:
+        return ""
+    item = _XMP_ITEM_RE.search(title.group(1))
+    return html.unescape(re.sub(r"<[^>]*>", "", item.group(1) if item else title.group(1)))
+
+
+class _PDFTitleLocator:  # pylint: disable=too-few-public-methods
+    def __init__(self, size: int, *, read_size: int, max_reads: int, max_stream_size: int):
+        self._size = size
+        self._read_size = read_size
+        self._max_reads = max_reads
+        self._max_stream_size = max_stream_size
+        self._num_reads = 0
+        self._spans: List[Tuple[int, bytes]] = []  # Start and content of each range read so far.
+        self._sections: List[_XRefSection] = []  # Newest first.
+        self._pending_section_offsets: List[int] = []
+        self._visited_section_offsets: Set[int] = set()
+        self._objects: Dict[int, Any] = {}
+
+    def _read(self, start: int, end: int) -> _Reads[bytes]:
+        if not 0 <= start < end <= self._size:
+            raise PDFRangeError(f"Invalid byte range {start}-{end} for a PDF of size {self._size}.")
+        for span_start, span in self._spans:
+            if span_start <= start and end <= span_start + len(span):
+                return span[start - span_start : end - span_start]
+        self._num_reads += 1
+        if self._num_reads > self._max_reads:
+            raise PDFRangeError(f"Exceeded the max of {self._max_reads} byte ranges.")
+        read_end = min(self._size, max(end, start + self._read_size))
+        content = yield start, read_end
+        if len(content) != read_end - start:
+            raise PDFRangeError(f"Received {len(content)} bytes instead of {read_end - start} for byte range {start}-{read_end}.")
+        self._spans.append((start, content))
+        return content[: end - start]
+
+    def _cached(self, start: int) -> bytes:
+        return max((span[start - span_start :] for span_start, span in self._spans if span_start <= start < span_start + len(span)), key=len, default=b"")
+
+    def _parse_at(self, offset: int, parse: Callable[[_Parser], _T]) -> _Reads[_T]:
+        data = self._cached(offset)
+        while True:
+            if data:
+                try:
+                    return parse(_Parser(data))
+                except _Incomplete:
+                    if offset + len(data) >= self._size:
+                        raise PDFRangeError(f"Truncated PDF content at offset {offset}.") from None
+            data = yield from self._read(offset, min(self._size, offset + max(self._read_size, len(data) * 4)))
+
+    def _object_at(self, offset: int, num: Optional[int] = None) -> _Reads[Any]:
+        def parse(parser: _Parser) -> Tuple[Any, Optional[int]]:
+            obj_num, _gen, keyword = parser.keyword(), parser.keyword(), parser.keyword()
+            if (keyword != b"obj") or ((num is not None) and (obj_num != str(num).encode())):
+                raise PDFRangeError(f"Expected object {num} at offset {offset}.")
+            value = parser.parse()
+            return value, (parser.stream_start() if isinstance(value, dict) else None)
+
+        value, stream_start = yield from self._parse_at(offset, parse)
+        if stream_start is None:
+            return value
+        length = yield from self._resolve(value.get("Length"))
+        if not isinstance(length, int):
+            raise PDFRangeError(f"Invalid stream length {length!r} at offset {offset}.")
+        if length > self._max_stream_size:
+            raise PDFRangeError(f"Stream length {length} at offset {offset} exceeds the max size of {self._max_stream_size} bytes.")
+        data = yield from self._read(offset + stream_start, offset + stream_start + length)
+        return _Stream(value, _decode_stream(value, data, self._max_stream_size))
+
+    def _load_xref_table(self, pos: int) -> _Reads[_XRefTable]:
+        def parse_header(parser: _Parser) -> Tuple[Optional[Tuple[int, int]], Any, int]:
+            token = parser.keyword()
+            if token == b"trailer":
+                return None, parser.parse(), parser.pos
+            count = int(parser.keyword())
+            parser.skip_whitespace()
+            return (int(token), count), None, parser.pos
+
+        subsections: List[Tuple[int, int, int]] = []
+        while True:
+            subsection, trailer, num_parsed = yield from self._parse_at(pos, parse_header)
+            if subsection is None:
+                return _XRefTable(subsections, trailer)
+            first, count = subsection
+            subsections.append((first, count, pos + num_parsed))
+            pos += num_parsed + count * _XREF_ENTRY_SIZE
+
+    def _load_xref_stream(self, offset: int) -> _Reads[_XRefStream]:
+        stream = yield from self._object_at(offset)
+        if not (isinstance(stream, _Stream) and stream.dict.get("Type") == "XRef"):
+            raise PDFRangeError(f"Expected a cross-reference section at offset {offset}.")
+        widths = stream.dict["W"]
+        index = stream.dict.get("Index", [0, stream.dict["Size"]])
+        row_len = sum(widths)
+        entries: Dict[int, Tuple[int, int, int]] = {}
+        pos = 0
+        for first, count in zip(index[::2], index[1::2]):
+            for num in range(first, first + count):
+                row = stream.data[pos : pos + row_len]
+                if len(row) < row_len:
+                    raise PDFRangeError(f"Truncated cross-reference stream at offset {offset}.")
+                fields = []
+                for width in widths:
+                    fields.append(int.from_bytes(row[:width], "big"))
+                    row = row[width:]
+                entries.setdefault(num, (fields[0] if widths[0] else 1, fields[1], fields[2]))
+                pos += row_len
+        return _XRefStream(entries, stream.dict)
+
+    def _load_section(self, offset: int) -> _Reads[_XRefSection]:
+        def parse_keyword(parser: _Parser) -> Tuple[bytes, int]:
+            return parser.keyword(), parser.pos
+
+        keyword, num_parsed = yield from self._parse_at(offset, parse_keyword)
+        if keyword == b"xref":
+            return (yield from self._load_xref_table(offset + num_parsed))
+        return (yield from self._load_xref_stream(offset))
+
+    def _load_next_section(self) -> _Reads[bool]:
+        while self._pending_section_offsets:
+            offset = self._pending_section_offsets.pop(0)
+            if (offset in self._visited_section_offsets) or (len(self._sections) >= _MAX_XREF_SECTIONS):
+                continue
+            self._visited_section_offsets.add(offset)
+            section = yield from self._load_section(offset)
+            self._sections.append(section)
+            next_offsets = (section.trailer.get("XRefStm"), section.trailer.get("Prev"))  # A hybrid section precedes any previous one.
+            self._pending_section_offsets[:0] = [offset for offset in next_offsets if isinstance(offset, int)]
+            return True
+        return False
+
+    def _entry(self, num: int) -> _Reads[Optional[Tuple[int, int, int]]]:
+        index = 0
+        while True:
+            while index < len(self._sections):
+                section = self._sections[index]
+                if isinstance(section, _XRefStream):
+                    if num in section.entries:
+                        return section.entries[num]
+                else:
+                    for first, count, entries_offset in section.subsections:
+                        if first <= num < first + count:
+                            entry_offset = entries_offset + (num - first) * _XREF_ENTRY_SIZE
+                            fields = (yield from self._read(entry_offset, entry_offset + _XREF_ENTRY_SIZE)).split()
+                            return (1, int(fields[0]), int(fields[1])) if (fields[2:3] == [b"n"]) else (0, 0, 0)
+                index += 1
+            if not (yield from self._load_next_section()):
+                return None
+
+    def _trailer_value(self, key: str) -> _Reads[Any]:
+        index = 0
+        while (index < len(self._sections)) or (yield from self._load_next_section()):
+            value = self._sections[index].trailer.get(key)
+            if value is not None:
+                return value
+            index += 1
+        return None
+
+    def _object(self, num: int) -> _Reads[Any]:
+        if num in self._objects:
+            return self._objects[num]
+        entry = yield from self._entry(num)
+        value = None
+        if entry and (entry[0] == 1):
+            value = yield from self._object_at(entry[1], num)
+        elif entry and (entry[0] == 2):
+            object_stream = yield from self._object(entry[1])
+            if not isinstance(object_stream, _Stream):
+                raise PDFRangeError(f"Expected object stream {entry[1]} for object {num}.")
+            data = object_stream.data + b" "  # Terminates any final token.
+            parser = _Parser(data)
+            try:
+                offsets = {int(parser.keyword()): int(parser.keyword()) for _ in range(object_stream.dict["N"])}
+                value = _Parser(data, object_stream.dict["First"] + offsets[num]).parse()
+            except (_Incomplete, KeyError):
+                raise PDFRangeError(f"Object {num} is not in object stream {entry[1]}.") from None
+        self._objects[num] = value
+        return value
+
+    def _resolve(self, value: Any) -> _Reads[Any]:
+        for _ in range(_MAX_REFERENCE_DEPTH):
+            if not isinstance(value, _Ref):
+                return value
+            value = yield from self._object(value.num)
+        raise PDFRangeError("Exceeded the max depth of indirect references.")
+
+    def title(self) -> _Reads[str]:
+        """Return the title from the document information dictionary, or otherwise from the XMP metadata."""
+        tail_start = max(0, self._size - self._read_size)
+        tail = yield from self._read(tail_start, self._size)
+        startxrefs = _STARTXREF_RE.findall(tail)
+        if not startxrefs:
+            raise PDFRangeError("Unable to find startxref in the tail of the PDF.")
+        self._pending_section_offsets.append(int(startxrefs[-1]))
+        if not (yield from self._load_next_section()):
+            raise PDFRangeError("Unable to load the cross-reference section of the PDF.")
+        if "Encrypt" in self._sections[0].trailer:
+            raise PDFRangeError("The PDF is encrypted.")
+
+        title = ""
+        info = yield from self._resolve((yield from self._trailer_value("Info")))
+        if isinstance(info, dict):
+            title_string = yield from self._resolve(info.get("Title"))
+            if isinstance(title_string, bytes):
+                title = _decode_text(title_string).strip()
+        if not title:
+            root = yield from self._resolve((yield from self._trailer_value("Root")))
+            metadata = (yield from self._resolve(root.get("Metadata"))) if isinstance(root, dict) else None
+            if isinstance(metadata, _Stream):
+                title = _xmp_title(metadata.data).strip()
+        return " ".join(title.split())
+
+
+def pdf_title_ranges(size: int, *, read_size: int, max_reads: int, max_stream_size: int) -> _Reads[str]:
+    """Return a generator which locates the title metadata of a PDF of the given size by reading only some byte ranges.
+
+    Each yielded byte range is a tuple of its start and exclusive end. Its content must be sent to the generator, which
+    eventually returns the title, which is empty if the PDF has no title. Each range is at least `read_size` bytes unless
+    it ends the PDF, and no more than `max_reads` ranges are yielded. No stream is read or decoded to more than
+    `max_stream_size` bytes. The trailer is read from the end of the PDF, and the cross-reference sections are followed
+    to the document information dictionary and to the XMP metadata stream. This works for linearized and incrementally
+    updated PDFs, and for compressed cross-reference and object streams.
+    `PDFRangeError` is raised if the title cannot be located in this way, such as for an encrypted or a malformed PDF.
+    """
+    locator = _PDFTitleLocator(size, read_size=read_size, max_reads=max_reads, max_stream_size=max_stream_size)
+    try:
+        return (yield from locator.title())
+    except PDFRangeError:
+        raise
+    except (IndexError, KeyError, TypeError, ValueError, AttributeError, zlib.error) as exc:
+        raise PDFRangeError(f"Invalid PDF structure. {exc.__class__.__qualname__}: {exc}") from None
@@ -1,31 +1,160 @@
 """pikepdf utilities."""
-from concurrent.futures import ProcessPoolExecutor
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
+from typing import Any, Callable, Optional, Tuple, cast
 
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # Python 3.7
+    SHARED_MEMORY_AVAILABLE = False
+else:
+    SHARED_MEMORY_AVAILABLE = True
 
-def _get_pdf_title(pdf_bytes: bytes) -> str:
+log = logging.getLogger(__name__)
+
+
+def _init_worker() -> None:
+    import pikepdf  # pylint: disable=import-outside-toplevel,unused-import
+
+    # Note: pikepdf is imported in advance so that each task does not have to import it.
+
+
+def _get_pdf_title(pdf_stream: BytesIO) -> str:
     import pikepdf  # pylint: disable=import-outside-toplevel
 
     # Note: pikepdf must be imported only here. This is a workaround for https://github.com/pikepdf/pikepdf/issues/27
 
-    pdf = pikepdf.open(BytesIO(pdf_bytes))
+    pdf = pikepdf.open(pdf_stream)
 
     title = str(pdf.docinfo.get("/Title", "")).strip()
     if not title:
         metadata = pdf.open_metadata()
         try:
-            title = metadata.get("dc:title")
+            metadata_title = metadata.get("dc:title")
         except AttributeError:  # Workaround for https://github.com/pikepdf/pikepdf/issues/23
             pass
         else:
-            title = str(title or "").strip()  # Workaround for https://github.com/pikepdf/pikepdf/issues/28
+            title = str(metadata_title or "").strip()  # Workaround for https://github.com/pikepdf/pikepdf/issues/28
     title = " ".join(title.split())
     # Note: The above is a workaround for consecutive whitespace characters,
     # e.g. https://pdfs.semanticscholar.org/1d76/d4561b594b5c5b5250edb43122d85db07262.pdf
     return title
 
 
-def get_pdf_title(pdf_bytes: bytes) -> str:
-    """Return the PDF title using pikepdf in a separate process."""
-    with ProcessPoolExecutor(max_workers=1) as executor:
-        return next(executor.map(_get_pdf_title, [pdf_bytes]))
+def _get_pdf_title_from_bytes(pdf_bytes: bytes) -> str:
+    return _get_pdf_title(BytesIO(pdf_bytes))
+
+
+def _get_pdf_title_from_shared_memory(name: str, size: int) -> str:
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        with cast(memoryview, shm.buf)[:size] as pdf_view:
+            pdf_stream = BytesIO(pdf_view)  # Copies the content.
+    finally:
+        shm.close()
+    return _get_pdf_title(pdf_stream)
+
+
+class PDFTitlePool:
+    """Pool of worker processes which return PDF titles using pikepdf.
+
+    The processes are started when the first title is requested, and are replaced after a number of tasks per process. If
+    a process crashes, the processes are replaced and the task is retried once. If a task exceeds the timeout, all
+    processes are terminated and are started again when needed. The content is handed to a process using shared memory
+    where available.
+    """
+
+    def __init__(self, *, processes: int, max_tasks_per_process: int, timeout: float):
+        self._processes = processes
+        self._max_tasks_per_process = max_tasks_per_process
+        self._timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._num_pool_tasks = 0  # Number of tasks submitted to the current pool.
+        self._lock = threading.Lock()
+
+    def _started_pool(self) -> ProcessPoolExecutor:
+        # Note: This is called with the lock held.
+        if self._pool is None:
+            if SHARED_MEMORY_AVAILABLE:
+                resource_tracker.ensure_running()  # Shares it with the processes so that they don't track the shared memory.
+            self._pool = ProcessPoolExecutor(self._processes, initializer=_init_worker)
+            self._num_pool_tasks = 0
+            log.debug("Started %s PDF title processes.", self._processes)
+        return self._pool
+
+    def _submit(self, fn: Callable[..., str], *args: Any) -> Tuple[ProcessPoolExecutor, "Future[str]"]:
+        # Note: The pool is got and used with the lock held, and so it cannot be replaced by another thread in between.
+        with self._lock:
+            if (self._pool is not None) and (self._num_pool_tasks >= self._processes * self._max_tasks_per_process):
+                self._pool.shutdown(wait=False)  # Its processes exit once its submitted tasks are done.
+                self._pool = None
+            pool = self._started_pool()
+            try:
+                future = pool.submit(fn, *args)
+            except BrokenProcessPool:  # A process of it crashed during a task of another thread.
+                pool.shutdown(wait=False)
+                self._pool = None
+                pool = self._started_pool()
+                future = pool.submit(fn, *args)
+            self._num_pool_tasks += 1
+            return pool, future
+
+    def _discard(self, pool: ProcessPoolExecutor, *, terminate: bool = False) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        if terminate:
+            # Note: ProcessPoolExecutor has no public way to terminate its processes before Python 3.14.
+            for process in list((pool._processes or {}).values()):  # pylint: disable=protected-access
+                process.terminate()
+        pool.shutdown(wait=False)
+
+    def title(self, pdf_bytes: bytes, *, timeout: Optional[float] = None) -> Optional[str]:
+        """Return the PDF title, or otherwise None if it could not be read in time or if its process crashed twice.
+
+        If a timeout in seconds shorter than that of the pool is given and exceeded, the task is abandoned without
+        terminating the processes.
+        """
+        is_abandonable = (timeout is not None) and (timeout < self._timeout)
+        shm: Any = None
+        try:
+            if SHARED_MEMORY_AVAILABLE:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, len(pdf_bytes)))
+                shm.buf[: len(pdf_bytes)] = pdf_bytes
+                fn, args = _get_pdf_title_from_shared_memory, (shm.name, len(pdf_bytes))
+            else:
+                fn, args = _get_pdf_title_from_bytes, (pdf_bytes,)
+            for is_retry in (False, True):
+                pool, future = self._submit(fn, *args)
+                try:
+                    return future.result(timeout if is_abandonable else self._timeout)
+                except BrokenProcessPool:
+                    self._discard(pool)
+                    if is_retry:
+                        log.warning("PDF title process crashed again for the same PDF. Its title is unavailable.")
+                        return None
+                    log.warning("Restarting PDF title processes after one crashed. The task is retried.")
+                except FutureTimeoutError:
+                    if is_abandonable:
+                        log.info("Abandoned PDF title task after the given timeout of %ss.", timeout)
+                        return None
+                    log.warning("Terminating PDF title processes after a task exceeded the timeout of %ss.", self._timeout)
+                    self._discard(pool, terminate=True)
+                    return None
+            return None
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+    def close(self) -> None:
+        """Terminate the processes."""
+        with self._lock:
+            pool = self._pool
+        if pool is not None:
+            self._discard(pool, terminate=True)
+            pool.shutdown(wait=True)
@@ -0,0 +1,78 @@
+"""race utilities."""
+import time
+from typing import Dict, Generic, Iterator, List, Optional, Set, Tuple, TypeVar
+
+_C = TypeVar("_C")
+_T = TypeVar("_T")
+
+
+class PreferenceRace(Generic[_C, _T]):
+    """State of a staggered race of candidates in their order of preference, which is driven by the caller.
+
+    The next candidate is due once the pending ones have failed, or once the stagger has elapsed since the previous one was
+    started. Once a candidate succeeds, no more are started, and it wins once no preferred candidate is pending or once the
+    grace window has elapsed. A stagger of None starts the candidates in turn.
+    """
+
+    def __init__(self, candidates: Iterator[_C], *, stagger: Optional[float], grace: float):
+        self.errors: List[Exception] = []
+        self._candidates = candidates
+        self._stagger = stagger
+        self._grace = grace
+        self._started: List[_C] = []
+        self._pending: Set[int] = set()
+        self._results: Dict[int, _T] = {}
+        self._is_exhausted = False
+        self._next_start_time = time.monotonic()
+        self._grace_end_time = float("inf")
+
+    @property
+    def is_lost(self) -> bool:
+        """Return whether all candidates failed."""
+        return self._is_exhausted and not (self._pending or self._results)
+
+    def candidate(self, index: int) -> _C:
+        """Return the started candidate with the given index."""
+        return self._started[index]
+
+    def due(self) -> List[Tuple[int, _C]]:
+        """Return the indexes and candidates to start now."""
+        due = []
+        now = time.monotonic()
+        while not (self._results or self._is_exhausted) and (not self._pending or now >= self._next_start_time):
+            candidate = next(self._candidates, None)
+            if candidate is None:
+                self._is_exhausted = True
+                break
+            index = len(self._started)
+            self._started.append(candidate)
+            self._pending.add(index)
+            self._next_start_time = float("inf") if self._stagger is None else now + self._stagger
+            due.append((index, candidate))
+        return due
+
+    def timeout(self) -> Optional[float]:
+        """Return the seconds after which the race is to be checked again unless a pending candidate finishes earlier."""
+        end_time = self._grace_end_time if self._results else self._next_start_time
+        return None if end_time == float("inf") else max(0.0, end_time - time.monotonic())
+
+    def succeed(self, index: int, result: _T) -> None:
+        """Record the result of the candidate."""
+        self._pending.discard(index)
+        self._results[index] = result
+        if self._grace_end_time == float("inf"):
+            self._grace_end_time = time.monotonic() + self._grace
+
+    def fail(self, index: int, exc: Exception) -> None:
+        """Record the error of the candidate."""
+        self._pending.discard(index)
+        self.errors.append(exc)
+
+    def winner(self) -> Optional[Tuple[int, _T]]:
+        """Return the index and result of the winning candidate if there is one yet."""
+        if not self._results:
+            return None
+        index = min(self._results)
+        if any(pending_index < index for pending_index in self._pending) and (time.monotonic() < self._grace_end_time):
+            return None
+        return index, self._results[index]
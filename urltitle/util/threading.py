@@ -0,0 +1,99 @@
+"""threading utilities."""
+import threading
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, TypeVar, cast
+
+_T = TypeVar("_T")
+
+
+class _Flight(Generic[_T]):
+    def __init__(self, owner: int):
+        self.owner = owner
+        self.done = threading.Event()
+        self.result: Optional[_T] = None
+        self.exception: Optional[BaseException] = None
+
+
+class SingleFlight(Generic[_T]):
+    """Coalescer of concurrent calls for the same key so that only the first of them is executed.
+
+    The other concurrent callers wait for the result of the first call, or for its exception which is then raised in each
+    of them. A call which would wait on itself, directly or through other waiting threads, is instead executed on its own.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight[_T]] = {}
+        self._waits: Dict[int, _Flight[_T]] = {}  # Thread ID to flight waited for.
+
+    def _is_waited_by(self, flight: _Flight[_T], thread_id: int) -> bool:
+        # Note: The lock must be held by the caller.
+        owner: Optional[int] = flight.owner
+        while owner is not None:
+            if owner == thread_id:
+                return True
+            owner_wait = self._waits.get(owner)
+            owner = owner_wait.owner if owner_wait else None
+        return False
+
+    def call(self, key: Hashable, func: Callable[..., _T], *args: Any, timeout: Optional[float] = None) -> _T:
+        """Return the result of the function for the given arguments, sharing it with any concurrent calls for the key.
+
+        If a concurrent call is not done within the given timeout in seconds, `TimeoutError` is raised.
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(thread_id)
+                is_owner = True
+            elif self._is_waited_by(flight, thread_id):
+                return func(*args)  # Waiting would deadlock.
+            else:
+                self._waits[thread_id] = flight
+                is_owner = False
+
+        if not is_owner:
+            is_done = flight.done.wait(timeout)
+            with self._lock:
+                del self._waits[thread_id]
+            if not is_done:
+                raise TimeoutError(f"The concurrent call for {key!r} was not done within {timeout}s.")
+            if flight.exception is not None:
+                raise flight.exception
+            return cast(_T, flight.result)
+
+        try:
+            flight.result = result = func(*args)
+        except BaseException as exc:
+            flight.exception = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return result
+
+
+class KeyedSemaphore:
+    """Semaphore with the given value for each key, with state kept only for the keys which are acquired."""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._counts: Dict[Hashable, int] = {}
+        self._condition = threading.Condition()
+
+    def acquire(self, key: Hashable, timeout: Optional[float] = None) -> bool:
+        """Acquire the semaphore of the key, waiting up to the given timeout in seconds, and return whether it was acquired."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._counts.get(key, 0) < self._value, timeout):
+                return False
+            self._counts[key] = self._counts.get(key, 0) + 1
+            return True
+
+    def release(self, key: Hashable) -> None:
+        """Release the semaphore of the key."""
+        with self._condition:
+            count = self._counts.pop(key) - 1
+            if count:
+                self._counts[key] = count
+            self._condition.notify_all()
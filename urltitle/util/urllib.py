@@ -1,8 +1,232 @@
 """urllib utilities."""
-from urllib.request import HTTPRedirectHandler
+import functools
+import logging
+import socket
+import ssl
+import threading
+import time
+from collections import defaultdict, deque
+from http.client import HTTPConnection, HTTPException, HTTPResponse, HTTPSConnection
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, Type
+from urllib.error import URLError
+from urllib.parse import urlsplit
+from urllib.request import HTTPHandler, HTTPRedirectHandler, HTTPSHandler, Request
+
+from .threading import KeyedSemaphore
+
+log = logging.getLogger(__name__)
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_PoolKey = Tuple[str, str, int]
+
+
+def url_netloc(url: str) -> str:
+    """Return the netloc for the given URL, casefolded and without any www prefix."""
+    split_result = urlsplit(url)
+    if split_result.scheme == "":
+        return url_netloc(f"https://{url}")  # Without this, the returned netloc is erroneous.
+    netloc = split_result.netloc.casefold()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+    return netloc
 
 
 class CustomHTTPRedirectHandler(HTTPRedirectHandler):
     """Custom HTTPRedirectHandler with a greater number of max allowable redirections."""
 
     max_redirections = 20
+
+
+class _PooledHTTPResponse(HTTPResponse):
+    """HTTP response which releases its connection to its pool when it is closed."""
+
+    release_connection: Optional[Callable[[bool], None]] = None
+    max_drain_size = 0
+    sock: Optional[socket.socket] = None  # It is unset once the response is closed.
+
+    def settimeout(self, timeout: float) -> None:
+        """Set the timeout in seconds of each further socket operation of reading the response."""
+        if self.sock is not None:
+            self.sock.settimeout(timeout)
+
+    def close(self) -> None:
+        if (not self.isclosed()) and (not self.will_close) and (self.length is not None) and (self.length <= self.max_drain_size):
+            try:
+                self.read()  # Draining a small remainder is cheaper than a new connection.
+            except (OSError, HTTPException):
+                pass
+        reusable = self.isclosed() and not self.will_close  # The body was fully read if it is closed before closing.
+        super().close()
+        self.sock = None
+        release_connection, self.release_connection = self.release_connection, None
+        if release_connection:
+            release_connection(reusable)
+
+
+class _PooledHTTPConnection(HTTPConnection):
+    response_class = _PooledHTTPResponse
+
+
+class _PooledHTTPSConnection(HTTPSConnection):
+    response_class = _PooledHTTPResponse
+    tls_session: Optional[ssl.SSLSession] = None  # Session to resume when connecting, which is then that of the connection.
+
+    def connect(self) -> None:
+        HTTPConnection.connect(self)
+        server_hostname = self._tunnel_host or self.host  # type: ignore
+        self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname, session=self.tls_session)  # type: ignore
+
+    def getresponse(self) -> HTTPResponse:
+        sock = self.sock  # Note: It is unset if the response closes the connection.
+        response = super().getresponse()
+        self.tls_session = getattr(sock, "session", None) or self.tls_session  # Is available once a response is read.
+        return response
+
+
+class ConnectionPool:
+    """Thread-safe pool of persistent HTTP/1.1 connections keyed by scheme, host, and port.
+
+    A connection is returned to the pool only if its response was fully read, if necessary by draining a small remainder. TLS sessions are remembered per key so that
+    new connections to the same host can resume them. If a max number of active connections per host is given, a request
+    waits up to its timeout for one of them to be released, which is when its response is closed.
+    """
+
+    def __init__(self, *, max_idle_per_host: int, idle_timeout: float, max_drain_size: int = 0, max_active_per_host: Optional[int] = None):
+        self._max_idle_per_host = max_idle_per_host
+        self._max_active_per_host = max_active_per_host
+        self._active = KeyedSemaphore(max_active_per_host) if max_active_per_host else None
+        self._max_drain_size = max_drain_size
+        self._idle_timeout = idle_timeout
+        self._idle: Dict[_PoolKey, Deque[Tuple[float, HTTPConnection]]] = defaultdict(deque)
+        self._tls_sessions: Dict[_PoolKey, ssl.SSLSession] = {}
+        self._lock = threading.Lock()
+        self._last_sweep_time = time.monotonic()
+
+    def _acquire(self, key: _PoolKey) -> Optional[HTTPConnection]:
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                release_time, conn = idle.pop()  # The most recently released connection is the likeliest to still be open.
+                if (now - release_time) < self._idle_timeout:
+                    return conn
+                conn.close()
+        return None
+
+    def _release(self, key: _PoolKey, conn: HTTPConnection, reusable: bool) -> None:
+        if self._active:
+            self._active.release(key)
+        now = time.monotonic()
+        with self._lock:
+            if (now - self._last_sweep_time) >= self._idle_timeout:
+                self._sweep(now)
+            idle = self._idle[key]
+            if reusable and conn.sock and (len(idle) < self._max_idle_per_host):
+                idle.append((now, conn))
+                return
+        conn.close()
+
+    def _sweep(self, now: float) -> None:
+        # Note: The lock must be held by the caller.
+        for key, idle in list(self._idle.items()):
+            while idle and ((now - idle[0][0]) >= self._idle_timeout):
+                idle.popleft()[1].close()
+            if not idle:
+                del self._idle[key]
+        self._last_sweep_time = now
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            for idle in self._idle.values():
+                for _, conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def open(self, connection_class: Type[HTTPConnection], req: Request, **connection_kwargs: Any) -> HTTPResponse:
+        """Return the response for the request using a pooled connection if available.
+
+        This is equivalent to `AbstractHTTPHandler.do_open` except that the connection is kept alive.
+        """
+        host = req.host
+        if not host:
+            raise URLError("no host given")
+        parse_result = urlsplit(f"//{host}")
+        key = (req.type, (parse_result.hostname or "").casefold(), parse_result.port or _DEFAULT_PORTS.get(req.type, 0))
+
+        timeout = req.timeout if isinstance(req.timeout, (int, float)) else None  # It is otherwise the global default.
+        if self._active and not self._active.acquire(key, timeout):
+            raise URLError(socket.timeout(f"Timed out after {timeout}s waiting for one of {self._max_active_per_host} active connections to {host}."))
+        try:
+            conn, response = self._response(key, connection_class, req, **connection_kwargs)
+        except BaseException:
+            if self._active:
+                self._active.release(key)
+            raise
+        if isinstance(conn, _PooledHTTPSConnection) and conn.tls_session:
+            with self._lock:
+                self._tls_sessions[key] = conn.tls_session  # Is remembered even if the connection is not reusable.
+        response.release_connection = functools.partial(self._release, key, conn)
+        response.max_drain_size = self._max_drain_size
+        response.sock = conn.sock
+        response.url = req.get_full_url()
+        response.msg = response.reason  # type: ignore
+        return response
+
+    def _response(self, key: _PoolKey, connection_class: Type[HTTPConnection], req: Request, **connection_kwargs: Any) -> Tuple[HTTPConnection, _PooledHTTPResponse]:
+        # Note: A reused connection which fails is replaced, as it was likely closed by the server while it was idle.
+        headers = dict(req.unredirected_hdrs)
+        headers.update({k: v for k, v in req.headers.items() if k not in headers})
+        headers["Connection"] = "keep-alive"
+        headers = {name.title(): val for name, val in headers.items()}
+        while True:
+            conn = self._acquire(key)
+            is_reused = conn is not None
+            if conn is None:
+                conn = connection_class(req.host, timeout=req.timeout, **connection_kwargs)
+                if isinstance(conn, _PooledHTTPSConnection):
+                    conn.tls_session = self._tls_sessions.get(key)
+            else:
+                conn.timeout = req.timeout
+                conn.sock.settimeout(req.timeout)
+            try:
+                try:
+                    conn.request(req.get_method(), req.selector, req.data, headers, encode_chunked=req.has_header("Transfer-encoding"))
+                except OSError as exc:
+                    raise URLError(exc) from exc
+                response = conn.getresponse()
+            except (OSError, HTTPException) as exc:
+                conn.close()
+                if is_reused and (req.get_method() in ("GET", "HEAD")):
+                    log.debug("Reused connection for %s://%s:%s failed. A new connection will be attempted. %s", *key, exc)
+                    continue
+                raise
+            break
+
+        assert isinstance(response, _PooledHTTPResponse)
+        return conn, response
+
+
+class PooledHTTPHandler(HTTPHandler):
+    """HTTPHandler which uses a connection pool."""
+
+    def __init__(self, pool: ConnectionPool):
+        super().__init__()
+        self._pool = pool
+
+    def http_open(self, req: Request) -> HTTPResponse:
+        return self._pool.open(_PooledHTTPConnection, req)
+
+
+class PooledHTTPSHandler(HTTPSHandler):
+    """HTTPSHandler which uses a connection pool."""
+
+    def __init__(self, pool: ConnectionPool, *, context: ssl.SSLContext):
+        super().__init__(context=context)
+        self._pool = pool
+        self._pool_context = context
+
+    def https_open(self, req: Request) -> HTTPResponse:
+        if req._tunnel_host:  # type: ignore  # pylint: disable=protected-access
+            return super().https_open(req)  # Proxy tunnels are not pooled.
+        return self._pool.open(_PooledHTTPSConnection, req, context=self._pool_context)
@@ -0,0 +1,139 @@
+"""zlib utilities."""
+import zlib
+from typing import Any, Callable, List, Optional, Union
+
+try:
+    import brotli
+except ImportError:  # Optional
+    BROTLI_AVAILABLE = False
+else:
+    BROTLI_AVAILABLE = True
+
+SUPPORTED_CONTENT_ENCODINGS = ("gzip", "deflate", "br") if BROTLI_AVAILABLE else ("gzip", "deflate")
+
+
+class DecompressionError(ValueError):
+    """Decompression error."""
+
+
+class _DeflateDecompressor:
+    """Decompressor for the deflate content encoding, which is zlib-wrapped but is sometimes sent raw."""
+
+    def __init__(self) -> None:
+        self._decompressor: Any = None
+
+    @property
+    def unconsumed_tail(self) -> bytes:
+        """Return the data that was not decompressed due to the max length."""
+        return self._decompressor.unconsumed_tail if self._decompressor else b""
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        """Return the decompressed data, of at most max_length bytes if it is positive."""
+        if self._decompressor is None:
+            if not data:
+                return b""
+            self._decompressor = zlib.decompressobj()
+            try:
+                return self._decompressor.decompress(data, max_length)
+            except zlib.error:
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)  # Raw
+        return self._decompressor.decompress(data, max_length)
+
+    def flush(self) -> bytes:
+        """Return any remaining decompressed data."""
+        return self._decompressor.flush() if self._decompressor else b""
+
+
+class _BrotliDecompressor:
+    """Decompressor for the br content encoding, with the data processed in slices to approximate the max length."""
+
+    _SLICE_SIZE = 1024
+
+    def __init__(self) -> None:
+        self._decompressor = brotli.Decompressor()
+        self.unconsumed_tail = b""
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        """Return the decompressed data, of approximately at most max_length bytes if it is positive."""
+        if max_length <= 0:
+            self.unconsumed_tail = b""
+            return self._decompressor.process(data) if data else b""
+        decompressed = bytearray()
+        offset = 0
+        while (offset < len(data)) and (len(decompressed) < max_length):
+            decompressed += self._decompressor.process(data[offset : offset + self._SLICE_SIZE])
+            offset += self._SLICE_SIZE
+        self.unconsumed_tail = bytes(data[offset:])
+        return bytes(decompressed)
+
+    @staticmethod
+    def flush() -> bytes:
+        """Return any remaining decompressed data."""
+        return b""
+
+
+_DECOMPRESSORS: Any = {
+    "gzip": lambda: zlib.decompressobj(zlib.MAX_WBITS | 16),
+    "x-gzip": lambda: zlib.decompressobj(zlib.MAX_WBITS | 16),
+    "deflate": _DeflateDecompressor,
+}
+if BROTLI_AVAILABLE:
+    _DECOMPRESSORS["br"] = _BrotliDecompressor
+_DECOMPRESSION_ERRORS = (zlib.error, brotli.error) if BROTLI_AVAILABLE else (zlib.error,)
+
+
+class StreamDecompressor:
+    """Incremental decompressor for the content of a HTTP response with the given Content-Encoding header.
+
+    Each chunk of content that is read is to be decompressed as it is read. Multiple encodings are decompressed in the
+    reverse of their listed order. `DecompressionError` is raised if an encoding is unsupported or if the content is invalid.
+
+    A max length bounds the decompressed data that is returned for a chunk, and so a highly compressed chunk does not
+    exhaust memory. Any data that is not yet decompressed due to it is kept, and is decompressed first by the next call.
+    """
+
+    def __init__(self, content_encoding: str):
+        self._decompressors: List[Any] = []
+        for encoding in reversed(content_encoding.casefold().split(",")):
+            encoding = encoding.strip()
+            if encoding in ("", "identity"):
+                continue
+            decompressor: Optional[Callable] = _DECOMPRESSORS.get(encoding)
+            if decompressor is None:
+                raise DecompressionError(f"Unsupported content encoding: {encoding}")
+            self._decompressors.append(decompressor())
+
+    @property
+    def is_pending(self) -> bool:
+        """Return whether any data that was read is not yet decompressed due to the max length."""
+        return any(decompressor.unconsumed_tail for decompressor in self._decompressors)
+
+    def decompress(self, data: Union[bytes, bytearray, memoryview], max_length: int = 0) -> bytes:
+        """Return the decompressed data for the newly read data, of at most max_length bytes if it is positive."""
+        try:
+            for decompressor in self._decompressors:
+                data = decompressor.decompress(decompressor.unconsumed_tail + data, max_length)
+        except _DECOMPRESSION_ERRORS as exc:
+            raise DecompressionError(f"Invalid compressed content: {exc}") from None
+        return bytes(data)  # Note: This is not a copy if data is already bytes.
+
+    def flush(self, max_length: int = 0) -> bytes:
+        """Return any remaining decompressed data after the end of the content, of at most max_length bytes if it is positive.
+
+        The remaining data is flushed only once no data is pending due to the max length.
+        """
+        data = b""
+        try:
+            for decompressor in self._decompressors:
+                data = decompressor.decompress(decompressor.unconsumed_tail + data, max_length)
+                if not decompressor.unconsumed_tail:
+                    data += decompressor.flush()
+        except _DECOMPRESSION_ERRORS as exc:
+            raise DecompressionError(f"Invalid compressed content: {exc}") from None
+        return data
+
+
+def is_negotiated_content_encoding(content_encoding: str) -> bool:
+    """Return whether all of the encodings in the given Content-Encoding header are ones that are requested by default."""
+    encodings = (encoding.strip() for encoding in content_encoding.casefold().split(","))
+    return all((encoding in SUPPORTED_CONTENT_ENCODINGS) or (encoding in ("x-gzip", "identity", "")) for encoding in encodings)